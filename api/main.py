@@ -1,32 +1,248 @@
 # api/main.py
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, PlainTextResponse, Response
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+import asyncio
+import io
+import json
+import logging
+import numpy as np
 import pandas as pd
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Optional, Union
 import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.predict import load_model, make_prediction
+from src.predict import make_prediction, make_batch_prediction, explain
+from src.micro_batching import MicroBatcher
+from src.prediction_cache import PredictionCache
+from src.drift_monitoring import DriftMonitor
+from src.prediction_jobs import FINISHED_STATUSES, JobStore, JobWorkerPool
+from src.traffic_capture import TrafficRecorder
+from src.model_registry import ModelServer
+from src.columnar_io import (ARROW_STREAM_CONTENT_TYPE, MSGPACK_CONTENT_TYPES, read_arrow_stream,
+                             arrow_table_to_columns, write_arrow_predictions, unpack_msgpack, pack_msgpack)
+from src.metrics import (REGISTRY, REQUESTS, REQUEST_SECONDS, STAGE_SECONDS, CACHE_STATS, SHADOW_RELATIVE_DIFF,
+                         SHADOW_ERRORS, timed_stage)
 from src import config as config 
 
 
-try:
-    model = load_model()
-except FileNotFoundError as e:
-    print(f"Error loading model: {e}. Please ensure the model is trained by running 'python -m src.model'.")
-    model = None
-except Exception as e:
-    print(f"An unexpected error occurred while loading the model: {e}")
-    model = None
+MODEL_PATH = config.LEAN_MODEL_DIR if config.USE_LEAN_MODEL else config.MODEL_SAVE_PATH
+
+# Version active du registre (models/registry), ou MODEL_PATH si le registre est vide.
+# Le modèle est rechargé à chaud par la tâche de surveillance démarrée dans lifespan.
+model_server = ModelServer(fallback_model_path=MODEL_PATH)
+model_server.refresh()
+if model_server.current is None:
+    print(f"Error loading model: {model_server.last_error}. Please ensure the model is trained by running 'python -m src.model'.")
+
+micro_batcher = None
+
+prediction_cache = None
+if config.PREDICTION_CACHE_ENABLED:
+    prediction_cache = PredictionCache(MODEL_PATH,
+                                       max_size=config.PREDICTION_CACHE_SIZE,
+                                       ttl_seconds=config.PREDICTION_CACHE_TTL_SECONDS,
+                                       disk_path=config.PREDICTION_CACHE_DISK_PATH,
+                                       version_fn=lambda: model_server.version)
+
+
+# Surveillance de la dérive du trafic pour la version servie (None si désactivée ou sans profil de référence)
+drift_monitor = None
+
+
+def _drift_monitor_for(served):
+    global drift_monitor
+    if not config.DRIFT_MONITORING_ENABLED or served is None or served.reference_profile is None:
+        return None
+    monitor = drift_monitor
+    if monitor is None or monitor.version != served.version:
+        if monitor is not None:
+            monitor.flush() # Le trafic vu par l'ancienne version reste consultable dans son répertoire
+        monitor = drift_monitor = DriftMonitor(served.version, served.reference_profile)
+    return monitor
+
+
+def _record_traffic(served, record=None, predicted_price=None, columns=None, predicted_prices=None):
+    """
+    Adds the houses of a request (one record, or columns) and their predicted prices to the drift sketches.
+    Never fails the request.
+    """
+    try:
+        monitor = _drift_monitor_for(served)
+        if monitor is None:
+            return
+        if record is not None:
+            monitor.record(record, predicted_price)
+        else:
+            monitor.record_batch(columns, predicted_prices)
+    except Exception as e:
+        logging.warning(f"Échec de la mise à jour des esquisses de dérive : {e}")
+
+
+# Capture échantillonnée du trafic /predict/ (désactivée par défaut)
+traffic_recorder = TrafficRecorder() if config.TRAFFIC_CAPTURE_ENABLED else None
+
+
+def _capture_request(served, features_dict, predicted_price):
+    if traffic_recorder is not None:
+        traffic_recorder.record('/predict/', features_dict, predicted_price, served.version)
+
+
+async def _flush_traffic_capture():
+    while True:
+        await asyncio.sleep(config.TRAFFIC_CAPTURE_FLUSH_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(traffic_recorder.flush)
+        except Exception as e:
+            logging.error(f"Échec de l'écriture du trafic capturé : {e}")
+
+
+async def _flush_prediction_cache():
+    while True:
+        await asyncio.sleep(config.PREDICTION_CACHE_FLUSH_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(prediction_cache.flush)
+        except Exception as e:
+            logging.error(f"Échec de l'écriture du cache de prédictions sur disque : {e}")
+
+
+# File persistante des tâches de prédiction asynchrones (créée au premier usage)
+job_store = None
+# Workers lancés au premier POST /jobs si JOBS_WORKERS > 0 : un processus API qui ne reçoit
+# aucune tâche ne charge pas de seconde copie du modèle.
+job_workers = None
+_job_workers_lock = asyncio.Lock()
+
+
+def _job_store():
+    global job_store
+    if job_store is None:
+        job_store = JobStore()
+    return job_store
+
+
+async def _ensure_job_workers():
+    global job_workers
+    if config.JOBS_WORKERS <= 0 or job_workers is not None:
+        return
+    async with _job_workers_lock:
+        if job_workers is None:
+            pool = JobWorkerPool(config.JOBS_WORKERS, MODEL_PATH)
+            await asyncio.to_thread(pool.start)
+            job_workers = pool
+
+
+async def _flush_drift_sketches():
+    while True:
+        await asyncio.sleep(config.DRIFT_FLUSH_INTERVAL_SECONDS)
+        monitor = drift_monitor
+        if monitor is not None:
+            try:
+                await asyncio.to_thread(monitor.flush)
+            except Exception as e:
+                logging.error(f"Échec de l'écriture des esquisses de dérive : {e}")
+
+
+def _predict_batch_with_served_model(df):
+    served = model_server.current
+    if served is None:
+        raise RuntimeError("Model not loaded. Please contact administrator.")
+    predictions, errors = make_batch_prediction(served.model, df, feature_engineer=served.feature_engineer)
+    _schedule_shadow_scoring(df, predictions)
+    return predictions, errors
+
+
+async def _watch_model_registry():
+    while True:
+        await asyncio.sleep(config.MODEL_POLL_INTERVAL_SECONDS)
+        try:
+            # Chargement dans un thread : la boucle d'événements continue de servir les requêtes.
+            await asyncio.to_thread(model_server.refresh)
+        except Exception as e:
+            logging.error(f"Échec de la vérification du registre de modèles : {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global micro_batcher, job_workers
+    watcher = None
+    if config.MODEL_POLL_INTERVAL_SECONDS > 0:
+        watcher = asyncio.create_task(_watch_model_registry())
+    drift_flusher = None
+    if config.DRIFT_MONITORING_ENABLED and config.DRIFT_FLUSH_INTERVAL_SECONDS > 0:
+        drift_flusher = asyncio.create_task(_flush_drift_sketches())
+    capture_flusher = None
+    if traffic_recorder is not None:
+        capture_flusher = asyncio.create_task(_flush_traffic_capture())
+    cache_flusher = None
+    if prediction_cache is not None and prediction_cache.disk_backed:
+        cache_flusher = asyncio.create_task(_flush_prediction_cache())
+    if config.MICRO_BATCHING_ENABLED:
+        micro_batcher = MicroBatcher(_predict_batch_with_served_model,
+                                     max_batch_size=config.MICRO_BATCH_MAX_SIZE,
+                                     max_wait_ms=config.MICRO_BATCH_MAX_WAIT_MS)
+        await micro_batcher.start()
+    yield
+    if micro_batcher is not None:
+        await micro_batcher.stop()
+        micro_batcher = None
+    if watcher is not None:
+        watcher.cancel()
+    if drift_flusher is not None:
+        drift_flusher.cancel()
+    if drift_monitor is not None:
+        drift_monitor.flush()
+    if capture_flusher is not None:
+        capture_flusher.cancel()
+        traffic_recorder.flush()
+    if cache_flusher is not None:
+        cache_flusher.cancel()
+        prediction_cache.flush()
+    if job_workers is not None:
+        await asyncio.to_thread(job_workers.stop)
+        job_workers = None
+
+
+# Un seul thread pour l'ombre : il ne concurrence pas le modèle servi pour les threads du pool.
+_shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shadow-scoring')
+
+
+def _shadow_score(shadow, input_df, served_predictions):
+    """
+    Scores the same houses with the shadow model and records how far it is from the served one.
+    Runs in a background thread; the response never waits for it.
+    """
+    try:
+        shadow_predictions, _ = make_batch_prediction(shadow.model, input_df, feature_engineer=shadow.feature_engineer)
+    except Exception as e:
+        SHADOW_ERRORS.inc()
+        logging.warning(f"Échec du scoring en ombre de la version {shadow.version} : {e}")
+        return
+    served_predictions = np.asarray(served_predictions, dtype=np.float64)
+    valid = ~np.isnan(served_predictions) & ~np.isnan(shadow_predictions) & (served_predictions > 0)
+    for diff in np.abs(shadow_predictions[valid] - served_predictions[valid]) / served_predictions[valid]:
+        SHADOW_RELATIVE_DIFF.observe(float(diff))
+
+
+def _schedule_shadow_scoring(input_df, served_predictions):
+    shadow = model_server.shadow
+    if shadow is not None:
+        _shadow_executor.submit(_shadow_score, shadow, input_df, served_predictions)
+
 
 app = FastAPI(
     title="House Price Prediction API",
     description="API for predicting house prices based on various features.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 origins = [
@@ -43,6 +259,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    request.state.received_at = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Le modèle de route (et non l'URL brute) évite une série par URL inconnue.
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        REQUESTS.inc(1, path, str(status))
+        REQUEST_SECONDS.observe(time.perf_counter() - request.state.received_at, path)
+
 class HouseFeatures(BaseModel):
    
     date: str = Field(..., example="2023-01-15", description="Date de vente (AAAA-MM-JJ)")
@@ -74,19 +305,535 @@ class HouseFeatures(BaseModel):
 async def read_root():
     return {"message": "Welcome to the House Price Prediction API!"}
 
+@app.get("/cache/stats")
+async def cache_stats():
+    if prediction_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **prediction_cache.stats()}
+
+@app.get("/capture/stats")
+async def capture_stats():
+    if traffic_recorder is None:
+        return {"enabled": False}
+    return {"enabled": True, **traffic_recorder.stats()}
+
+@app.get("/drift")
+async def drift_report(hours: Optional[float] = Query(None, gt=0, description="Heures de trafic récent comparées (défaut : DRIFT_WINDOW_HOURS)")):
+    """
+    Drift and data-quality scores of the recent live traffic (merged across workers) against the
+    training profile of the served model: PSI and binned KS statistic per input field and for the
+    predicted price, plus missing and out-of-range (or unknown category) rates.
+    """
+    if not config.DRIFT_MONITORING_ENABLED:
+        return {"enabled": False}
+    served = model_server.current
+    monitor = _drift_monitor_for(served)
+    if monitor is None:
+        raise HTTPException(status_code=404, detail=f"Aucun profil de référence pour la version {model_server.version} "
+                                                    "(python -m src.drift_monitoring le construit).")
+    return {"enabled": True, **await run_in_threadpool(monitor.report, hours)}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus text exposition of the request, stage, batch size, cache and model load metrics.
+    """
+    if prediction_cache is not None:
+        for stat, value in prediction_cache.stats().items():
+            if isinstance(value, (int, float)):
+                CACHE_STATS.set(value, stat)
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/models")
+async def models_status():
+    return model_server.status()
+
+async def _apply_registry_change(change, *args):
+    try:
+        result = await run_in_threadpool(change, *args)
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e.args[0]) if e.args else str(e))
+    await run_in_threadpool(model_server.refresh)
+    return {"result": result, **model_server.status()}
+
+@app.post("/models/pin/{version}")
+async def pin_model(version: str):
+    return await _apply_registry_change(model_server.registry.pin, version)
+
+@app.post("/models/unpin")
+async def unpin_model():
+    return await _apply_registry_change(model_server.registry.unpin)
+
+@app.post("/models/rollback")
+async def rollback_model():
+    return await _apply_registry_change(model_server.registry.rollback)
+
+@app.post("/models/shadow/{version}")
+async def set_shadow_model(version: str):
+    return await _apply_registry_change(model_server.registry.set_shadow, version)
+
+@app.delete("/models/shadow")
+async def clear_shadow_model():
+    return await _apply_registry_change(model_server.registry.set_shadow, None)
+
 @app.post("/predict/")
-async def predict_price(features: HouseFeatures):
-    if model is None:
+async def predict_price(features: HouseFeatures, request: Request):
+    # Lecture du corps + validation pydantic, effectuées par FastAPI avant l'appel du handler
+    STAGE_SECONDS.observe(time.perf_counter() - request.state.received_at, "request_parsing")
+    # Référence prise une fois : un rechargement à chaud pendant la requête ne la perturbe pas.
+    served = model_server.current
+    if served is None:
         raise HTTPException(status_code=500, detail="Model not loaded. Please contact administrator.")
 
-  
-    input_df = pd.DataFrame([features.dict()])
+    features_dict = features.dict()
+    if prediction_cache is not None:
+        if prediction_cache.disk_backed: # Lecture SQLite en cas d'absence en mémoire : hors de la boucle d'événements
+            cached_price = await run_in_threadpool(prediction_cache.get, features_dict, served.version)
+        else:
+            cached_price = prediction_cache.get(features_dict, served.version)
+        if cached_price is not None:
+            _record_traffic(served, features_dict, cached_price)
+            _capture_request(served, features_dict, cached_price)
+            return {"predicted_price": cached_price}
+
+    if micro_batcher is not None:
+        try:
+            predicted_price = await micro_batcher.submit(features_dict)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Prediction failed due to an internal error: {e}")
+        if prediction_cache is not None:
+            prediction_cache.set(features_dict, predicted_price, served.version)
+        _record_traffic(served, features_dict, predicted_price)
+        _capture_request(served, features_dict, predicted_price)
+        return {"predicted_price": predicted_price}
+
+    with timed_stage("dataframe_construction"):
+        input_df = pd.DataFrame([features_dict])
+
+    try:
+        prediction = await run_in_threadpool(make_prediction, served.model, input_df, True, served.feature_engineer)
+        predicted_price = float(prediction[0])
+        _schedule_shadow_scoring(input_df, prediction)
+        if prediction_cache is not None:
+            prediction_cache.set(features_dict, predicted_price, served.version)
+        _record_traffic(served, features_dict, predicted_price)
+        _capture_request(served, features_dict, predicted_price)
+
+        return {"predicted_price": predicted_price}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction failed due to an internal error: {e}")
+
+
+def _format_validation_error(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors())
 
+
+def _validate_records(records: list):
+    """
+    Validates each house individually so that one invalid house does not reject the whole batch.
+    Returns the DataFrame of valid houses, their positions in the request and the per-row errors.
+    """
+    rows, positions, errors = [], [], {}
+    for i, record in enumerate(records):
+        try:
+            rows.append(HouseFeatures(**record).dict())
+            positions.append(i)
+        except ValidationError as e:
+            errors[i] = _format_validation_error(e)
+        except TypeError:
+            errors[i] = "Chaque maison doit être un objet JSON."
+    return pd.DataFrame(rows), positions, errors
+
+
+def _validate_columnar(df: pd.DataFrame):
+    """
+    Validates a columnar batch (JSON columns or CSV) column by column instead of object by object,
+    with the coercions of HouseFeatures: float fields become float64, int fields must hold whole numbers.
+    """
+    missing_columns = [name for name, annotation in HouseFeatures.__annotations__.items()
+                       if annotation != Optional[str] and name not in df.columns]
+    if missing_columns:
+        raise HTTPException(status_code=422, detail=f"Colonnes manquantes : {missing_columns}")
+
+    row_errors = pd.Series("", index=range(len(df)))
+    df = df.reset_index(drop=True)
+    int_fields = []
+    for name, annotation in HouseFeatures.__annotations__.items():
+        if name not in df.columns:
+            continue
+        if annotation in (int, float):
+            values = pd.to_numeric(df[name], errors='coerce').astype(np.float64)
+            row_errors[df[name].isna()] += f"{name}: field required; "
+            row_errors[values.isna() & df[name].notna()] += f"{name}: valeur numérique attendue; "
+            if annotation is int:
+                # Même règle que pydantic : 3.0 est accepté, 2.5 ne l'est pas.
+                not_whole = values.notna() & ~(np.isfinite(values) & (values % 1 == 0) & (values.abs() < 2 ** 63))
+                row_errors[not_whole] += f"{name}: valeur entière attendue; "
+                int_fields.append(name)
+            df[name] = values
+        elif annotation is str:
+            row_errors[df[name].isna()] += f"{name}: field required; "
+            df[name] = df[name].astype(str)
+
+    invalid = row_errors != ""
+    errors = {int(i): msg.rstrip("; ") for i, msg in row_errors[invalid].items()}
+    positions = np.flatnonzero(~invalid.to_numpy()).tolist()
+    df = df[~invalid.to_numpy()]
+    return df.astype({name: np.int64 for name in int_fields}), positions, errors
+
+
+def _validate_arrow(body: bytes, feature_engineer=None):
+    """
+    Validates an Arrow stream against the HouseFeatures schema, column by column.
+    """
     try:
-        prediction = make_prediction(model, input_df)
-        
-        return {"predicted_price": float(prediction[0])}
+        table = read_arrow_stream(body)
+    except ImportError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    _check_batch_size(table.num_rows)
+    float_fields = [name for name, annotation in HouseFeatures.__annotations__.items() if annotation is float]
+    int_fields = [name for name, annotation in HouseFeatures.__annotations__.items() if annotation is int]
+    string_fields = [name for name, annotation in HouseFeatures.__annotations__.items() if annotation is str]
+    optional_fields = [name for name, annotation in HouseFeatures.__annotations__.items() if annotation == Optional[str]]
+    # Colonnes supprimées par l'ingénierie, sauf celles que le FeatureEngineer lit encore (clés de voisinage)
+    passthrough_columns = feature_engineer.passthrough_columns() if feature_engineer is not None else []
+    skip_columns = [col for col in config.FEATURES_TO_DROP_AFTER_ENGINEERING if col not in passthrough_columns]
+    try:
+        columns, positions, errors = arrow_table_to_columns(table, float_fields, int_fields, string_fields, optional_fields,
+                                                            skip_columns=skip_columns)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return pd.DataFrame(columns, copy=False), positions, errors
+
+
+def _check_batch_size(n_rows: int):
+    if n_rows > config.BATCH_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Le lot dépasse la taille maximale de {config.BATCH_MAX_ROWS} maisons.")
+
+
+def _validate_payload(payload):
+    if isinstance(payload, dict) and isinstance(payload.get("columns"), dict):
+        _check_batch_size(max((len(values) for values in payload["columns"].values() if isinstance(values, list)), default=0))
+        return _validate_columnar(pd.DataFrame(payload["columns"]))
+    if isinstance(payload, list):
+        _check_batch_size(len(payload))
+        return _validate_records(payload)
+    raise HTTPException(status_code=422, detail="Le corps doit être une liste de maisons ou un objet {\"columns\": {...}}.")
+
+
+def _parse_batch(content_type: str, body: bytes, feature_engineer=None):
+    """
+    Parses and validates a /predict/batch body. CPU-bound on large batches: called in the threadpool
+    so that the event loop keeps serving the other requests. The number of houses is checked
+    before the validation.
+    """
+    if content_type.startswith("text/csv"):
+        # Une ligne de plus que la limite suffit à la dépasser : inutile de lire la suite.
+        df = pd.read_csv(io.BytesIO(body), nrows=config.BATCH_MAX_ROWS + 1)
+        _check_batch_size(len(df))
+        return _validate_columnar(df)
+    if content_type.startswith(ARROW_STREAM_CONTENT_TYPE):
+        return _validate_arrow(body, feature_engineer)
+    if content_type.startswith(MSGPACK_CONTENT_TYPES):
+        try:
+            payload = unpack_msgpack(body)
+        except ImportError as e:
+            raise HTTPException(status_code=415, detail=str(e))
+    else:
+        payload = json.loads(body)
+    return _validate_payload(payload)
+
+
+async def _read_body(request: Request, max_bytes: int) -> bytes:
+    """
+    Reads the request body, rejecting it with 413 as soon as it exceeds max_bytes
+    (from Content-Length when it is sent, otherwise while it is received).
+    """
+    too_large = HTTPException(status_code=413, detail=f"Le corps de la requête dépasse {max_bytes} octets.")
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_bytes:
+        raise too_large
+    blocks, size = [], 0
+    async for block in request.stream():
+        size += len(block)
+        if size > max_bytes:
+            raise too_large
+        blocks.append(block)
+    return b"".join(blocks)
+
+
+def _response_media_type(request: Request, content_type: str) -> str:
+    """
+    Response format: the one named in Accept if supported, otherwise the request's binary format, otherwise JSON.
+    """
+    accept = request.headers.get("accept", "")
+    for media_type in (ARROW_STREAM_CONTENT_TYPE,) + MSGPACK_CONTENT_TYPES + ("application/json",):
+        if media_type in accept:
+            return media_type
+    if content_type.startswith(ARROW_STREAM_CONTENT_TYPE):
+        return ARROW_STREAM_CONTENT_TYPE
+    if content_type.startswith(MSGPACK_CONTENT_TYPES):
+        return MSGPACK_CONTENT_TYPES[0]
+    return "application/json"
+
+
+@app.post("/predict/batch")
+async def predict_price_batch(request: Request):
+    """
+    Predicts prices for many houses in one call.
+
+    Accepted bodies:
+    - JSON list of HouseFeatures objects;
+    - columnar JSON: {"columns": {"bedrooms": [...], "date": [...], ...}};
+    - CSV (Content-Type: text/csv) with one house per line;
+    - Arrow IPC stream (Content-Type: application/vnd.apache.arrow.stream), one house per row;
+    - MessagePack (Content-Type: application/msgpack) with the same structure as the JSON bodies.
+
+    Predictions are returned in input order; houses that cannot be scored get a null
+    price and an entry in "errors" instead of failing the whole batch. Arrow and MessagePack
+    requests get a response in the same format (or the one named in Accept); the Arrow
+    response has a `predicted_price` column and an `error` column.
+    """
+    served = model_server.current
+    if served is None:
+        raise HTTPException(status_code=500, detail="Model not loaded. Please contact administrator.")
+
+    content_type = request.headers.get("content-type", "")
+    body = await _read_body(request, config.BATCH_MAX_BYTES)
+    parsing_start = time.perf_counter()
+    try:
+        df, positions, errors = await run_in_threadpool(_parse_batch, content_type, body, served.feature_engineer)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Corps de requête illisible : {e}")
+    STAGE_SECONDS.observe(time.perf_counter() - parsing_start, "request_parsing")
+
+    n_rows = len(positions) + len(errors)
+    if n_rows == 0:
+        raise HTTPException(status_code=400, detail="Le lot ne contient aucune maison.")
+
+    predicted_prices = np.full(n_rows, np.nan)
+    if positions:
+        try:
+            predictions, batch_errors = await run_in_threadpool(make_batch_prediction, served.model, df,
+                                                                 feature_engineer=served.feature_engineer)
+            _schedule_shadow_scoring(df, predictions)
+        except ValueError as e: # Schéma du lot incompatible avec le modèle servi
+            raise HTTPException(status_code=422, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Prediction failed due to an internal error: {e}")
+        positions = np.asarray(positions)
+        for local_index, message in batch_errors.items():
+            errors[int(positions[local_index])] = message
+        predicted_prices[positions] = predictions
+        _record_traffic(served, columns=df, predicted_prices=predicted_prices[positions])
+
+    media_type = _response_media_type(request, content_type)
+    if media_type == ARROW_STREAM_CONTENT_TYPE:
+        return Response(write_arrow_predictions(predicted_prices, errors), media_type=media_type)
+    response = {
+        "predicted_prices": [None if np.isnan(price) else float(price) for price in predicted_prices],
+        "errors": [{"index": i, "detail": errors[i]} for i in sorted(errors)],
+    }
+    if media_type in MSGPACK_CONTENT_TYPES:
+        return Response(pack_msgpack(response), media_type=media_type)
+    return response
+
+
+@app.post("/explain")
+async def explain_prices(houses: Union[HouseFeatures, List[HouseFeatures]],
+                         top_k: Optional[int] = Query(None, ge=1, description="Nombre de contributions gardées par maison"),
+                         approximate: bool = Query(False, description="Approximation de Saabas, plus rapide que TreeSHAP exact")):
+    """
+    Explains the predicted price of one house (HouseFeatures object) or of a list of houses.
+
+    Each explanation gives the contribution of each input field on the model scale (log1p of the
+    price): base_value + sum(contributions) + other = log1p(predicted_price). Contributions are
+    sorted by absolute value; with top_k, only the k largest are kept and the rest is summed in "other".
+    """
+    served = model_server.current
+    if served is None:
+        raise HTTPException(status_code=500, detail="Model not loaded. Please contact administrator.")
+    single = isinstance(houses, HouseFeatures)
+    records = [houses] if single else houses
+    if not records:
+        raise HTTPException(status_code=400, detail="Le lot ne contient aucune maison.")
+    if len(records) > config.EXPLAIN_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Le lot dépasse la taille maximale de {config.EXPLAIN_MAX_ROWS} maisons.")
+
+    with timed_stage("dataframe_construction"):
+        input_df = pd.DataFrame([house.dict() for house in records])
+    try:
+        explanations, errors = await run_in_threadpool(explain, served.model, input_df, served.feature_engineer,
+                                                       top_k, approximate, config.EXPLAIN_CHUNK_SIZE)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Prediction failed due to an internal error: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Explanation failed due to an internal error: {e}")
+
+    if single:
+        if errors:
+            raise HTTPException(status_code=400, detail=errors[0])
+        return explanations[0]
+    return {
+        "explanations": explanations,
+        "errors": [{"index": i, "detail": errors[i]} for i in sorted(errors)],
+    }
+
+
+PARQUET_CONTENT_TYPES = ("application/vnd.apache.parquet", "application/x-parquet")
+_JOB_PUBLIC_FIELDS = ('id', 'status', 'created', 'started', 'finished', 'rows_total', 'rows_done', 'rows_in_error',
+                      'error', 'cancel_requested', 'model_version')
+
+
+def _job_response(job: dict) -> dict:
+    response = {field: job[field] for field in _JOB_PUBLIC_FIELDS}
+    response['cancel_requested'] = bool(job['cancel_requested'])
+    response['progress'] = (min(job['rows_done'] / job['rows_total'], 1.0) if job['rows_total']
+                            else (1.0 if job['status'] == 'succeeded' else 0.0))
+    response['result_url'] = f"/jobs/{job['id']}/result" if job['status'] == 'succeeded' else None
+    return response
+
+
+_NUMERIC_FIELDS = [name for name, annotation in HouseFeatures.__annotations__.items() if annotation in (int, float)]
+
+
+def _check_job_columns(columns):
+    missing = [name for name, annotation in HouseFeatures.__annotations__.items()
+               if annotation != Optional[str] and name not in columns]
+    if missing:
+        raise HTTPException(status_code=422, detail=f"Colonnes manquantes : {missing}")
+
+
+def _check_job_frame(df: pd.DataFrame):
+    """
+    Schema of a job input read by pandas: HouseFeatures columns, and numeric fields holding numbers.
+    A column without any numeric value is a schema error; isolated bad values are row errors in the result.
+    """
+    _check_job_columns(df.columns)
+    for name in _NUMERIC_FIELDS:
+        values = df[name]
+        if (not pd.api.types.is_numeric_dtype(values) and values.notna().any()
+                and pd.to_numeric(values, errors='coerce').isna().all()):
+            raise HTTPException(status_code=422, detail=f"{name} : type numérique attendu (reçu {values.dtype}).")
+
+
+def _check_job_file(input_path: str):
+    """
+    Checks the header (and the first rows) of a CSV job input, or the schema of a Parquet one,
+    so that a job that could only fail on every row is rejected at submission.
+    """
+    if input_path.endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pq.read_schema(input_path)
+        _check_job_columns(schema.names)
+        for name in _NUMERIC_FIELDS:
+            field_type = schema.field(name).type
+            if not (pa.types.is_integer(field_type) or pa.types.is_floating(field_type) or pa.types.is_null(field_type)):
+                raise HTTPException(status_code=422, detail=f"{name} : type numérique attendu (reçu {field_type}).")
+    else:
+        _check_job_frame(pd.read_csv(input_path, nrows=config.JOBS_SCHEMA_SAMPLE_ROWS))
+
+
+async def _write_job_input(request: Request, job_dir: str) -> str:
+    """
+    Writes the request body to the job directory: CSV and Parquet bodies are streamed to disk
+    as they arrive, then their header or schema is checked; JSON bodies (list of houses or
+    {"columns": {...}}) are checked, then converted to CSV.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith(("text/csv",) + PARQUET_CONTENT_TYPES):
+        input_path = os.path.join(job_dir, "input.csv" if content_type.startswith("text/csv") else "input.parquet")
+        with open(input_path, "wb") as f:
+            async for block in request.stream():
+                f.write(block)
+        if os.path.getsize(input_path) > 0:
+            await run_in_threadpool(_check_job_file, input_path)
+        return input_path
+    payload = await request.json()
+    if isinstance(payload, dict) and isinstance(payload.get("columns"), dict):
+        df = pd.DataFrame(payload["columns"])
+    elif isinstance(payload, list):
+        df = pd.DataFrame(payload)
+    else:
+        raise HTTPException(status_code=422, detail="Le corps doit être un CSV, un Parquet, une liste de maisons ou un objet {\"columns\": {...}}.")
+    _check_job_frame(df)
+    input_path = os.path.join(job_dir, "input.csv")
+    await run_in_threadpool(df.to_csv, input_path, index=False)
+    return input_path
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: Request):
+    """
+    Submits a bulk prediction job and returns its id immediately.
+
+    Accepted bodies: CSV (Content-Type: text/csv) or Parquet (application/vnd.apache.parquet), streamed
+    to disk, or the JSON bodies of /predict/batch. Background workers (python -m src.prediction_jobs,
+    or JOBS_WORKERS processes started by the API on its first job) score the file chunk by chunk;
+    poll GET /jobs/{id} for the progress, then download GET /jobs/{id}/result (CSV with the row
+    number, id if present, predicted_price and error of each house).
+    """
+    store = _job_store()
+    job_id, job_dir = store.new_job_dir()
+    try:
+        input_path = await _write_job_input(request, job_dir)
+    except HTTPException:
+        store.delete_files(job_id)
+        raise
+    except Exception as e:
+        store.delete_files(job_id)
+        raise HTTPException(status_code=400, detail=f"Corps de requête illisible : {e}")
+    if os.path.getsize(input_path) == 0:
+        store.delete_files(job_id)
+        raise HTTPException(status_code=400, detail="Le fichier de la tâche est vide.")
+    job = await run_in_threadpool(store.submit, job_id, input_path)
+    await _ensure_job_workers()
+    return _job_response(job)
+
+
+@app.get("/jobs")
+async def list_jobs(limit: int = Query(100, ge=1, le=1000)):
+    return {"jobs": [_job_response(job) for job in await run_in_threadpool(_job_store().list, limit)]}
+
+
+async def _get_job(job_id: str) -> dict:
+    job = await run_in_threadpool(_job_store().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Tâche inconnue : {job_id}")
+    return job
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    return _job_response(await _get_job(job_id))
+
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    job = await _get_job(job_id)
+    if job['status'] != 'succeeded':
+        raise HTTPException(status_code=409, detail=f"La tâche {job_id} n'est pas terminée (statut : {job['status']}).")
+    return FileResponse(job['output_path'], media_type="text/csv", filename=f"predictions-{job_id}.csv")
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    Cancels a queued job, or asks a running one to stop after its current chunk.
+    """
+    job = await _get_job(job_id)
+    if job['status'] in FINISHED_STATUSES:
+        raise HTTPException(status_code=409, detail=f"La tâche {job_id} est déjà terminée (statut : {job['status']}).")
+    store = _job_store()
+    job = await run_in_threadpool(store.cancel, job_id)
+    if job['status'] == 'cancelled':
+        await run_in_threadpool(store.delete_files, job_id)
+    return _job_response(job)
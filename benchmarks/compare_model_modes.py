@@ -0,0 +1,110 @@
+# benchmarks/compare_model_modes.py
+"""
+Comparaison des deux préprocesseurs du modèle (config.MODEL_MODE) :
+'onehot' (imputation + StandardScaler + OneHotEncoder, chemin de référence) et
+'native_categorical' (codes de catégories + tree_method='hist', enable_categorical=True).
+
+Pour chaque mode : temps d'entraînement, latence de prédiction unitaire (Pipeline et
+modèle allégé), débit par lots, taille du modèle (pickle et booster natif) et précision
+sur l'ensemble de test.
+
+Usage :
+    python -m benchmarks.compare_model_modes
+    python -m benchmarks.compare_model_modes --synthetic-rows 200000
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from benchmarks.run_benchmarks import RESULTS_DIR, git_commit, latency_summary, timed
+from benchmarks.synthetic_data import generate_houses
+from src import config
+from src.features_engineering import FeatureEngineer
+from src.lean_model import LEAN_BOOSTER_FILE, load_lean_model
+from src.model import build_model_pipeline, export_lean_model, regression_metrics
+from src.predict import make_prediction, make_batch_prediction
+
+MODES = ('onehot', 'native_categorical')
+
+
+def single_prediction_latency(model, feature_engineer, X, n_requests: int) -> dict:
+    rows = [X.iloc[[i % len(X)]] for i in range(n_requests)]
+    make_prediction(model, rows[0], feature_engineer=feature_engineer) # Échauffement
+    durations = []
+    for row in rows:
+        start = time.perf_counter()
+        make_prediction(model, row, feature_engineer=feature_engineer)
+        durations.append(time.perf_counter() - start)
+    return latency_summary(durations)
+
+
+def compare_mode(mode: str, train_df: pd.DataFrame, test_df: pd.DataFrame, n_requests: int, work_dir: str) -> dict:
+    X_train = train_df.drop(columns=[config.TARGET_COLUMN])
+    X_test = test_df.drop(columns=[config.TARGET_COLUMN])
+    feature_engineer = FeatureEngineer()
+    X_train_fe = feature_engineer.fit_transform(X_train, train_df[config.TARGET_COLUMN])
+    pipeline = build_model_pipeline(feature_engineer.numerical_features_, feature_engineer.categorical_features_,
+                                    mode=mode)
+    _, fit_seconds = timed(pipeline.fit, X_train_fe, np.log1p(train_df[config.TARGET_COLUMN]))
+
+    pipeline_path = os.path.join(work_dir, f"{mode}.pkl")
+    joblib.dump(pipeline, pipeline_path)
+    lean_dir = os.path.join(work_dir, f"{mode}_lean")
+    export_lean_model(pipeline, feature_engineer, lean_dir)
+    lean_model = load_lean_model(lean_dir)
+
+    (predictions, _), batch_seconds = timed(make_batch_prediction, pipeline, X_test, feature_engineer=feature_engineer)
+    valid = ~np.isnan(predictions)
+    return {
+        'fit_seconds': fit_seconds,
+        'single_prediction_pipeline': single_prediction_latency(pipeline, feature_engineer, X_test, n_requests),
+        'single_prediction_lean': single_prediction_latency(lean_model, None, X_test, n_requests),
+        'batch_rows_per_second': len(X_test) / batch_seconds,
+        'n_model_features': int(lean_model.n_output_features),
+        'pickle_bytes': os.path.getsize(pipeline_path),
+        'booster_bytes': os.path.getsize(os.path.join(lean_dir, LEAN_BOOSTER_FILE)),
+        'test_metrics': regression_metrics(test_df[config.TARGET_COLUMN].to_numpy()[valid], predictions[valid]),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare les modes 'onehot' et 'native_categorical' du modèle.")
+    parser.add_argument('--synthetic-rows', type=int, default=0,
+                        help="Utiliser un jeu synthétique de cette taille (80/20) au lieu de train.csv/test.csv.")
+    parser.add_argument('--single-requests', type=int, default=200)
+    parser.add_argument('--output', help="Fichier JSON de résultats (défaut : benchmarks/results/modes_<date>_<commit>.json).")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.synthetic_rows:
+        data = generate_houses(args.synthetic_rows)
+        split = int(len(data) * 0.8)
+        train_df, test_df = data.iloc[:split], data.iloc[split:]
+    else:
+        train_df, test_df = pd.read_csv(config.TRAIN_DATA_PATH), pd.read_csv(config.TEST_DATA_PATH)
+
+    results = {'commit': git_commit(), 'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+               'train_rows': len(train_df), 'test_rows': len(test_df), 'modes': {}}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for mode in MODES:
+            logging.warning(f"Mode {mode}...")
+            results['modes'][mode] = compare_mode(mode, train_df, test_df, args.single_requests, work_dir)
+
+    output_path = args.output or os.path.join(
+        RESULTS_DIR, f"modes_{datetime.datetime.now():%Y%m%d_%H%M%S}_{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Résultats écrits dans {output_path}")
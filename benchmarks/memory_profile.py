@@ -0,0 +1,128 @@
+# benchmarks/memory_profile.py
+"""
+Pic de mémoire de l'entraînement (en mémoire et hors mémoire, src/out_of_core.py) et du
+scoring de fichiers, avec et sans le mode mémoire réduite (config.MEMORY_OPTIMIZED).
+
+Chaque étape tourne dans un processus séparé : le pic de RSS (VmHWM) d'un processus
+ne redescend jamais, il faut donc un processus neuf par mesure.
+
+Usage :
+    python -m benchmarks.memory_profile --rows 1000000
+    python -m benchmarks.memory_profile --rows 10000000 --skip-training
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+STAGES = ('training', 'out_of_core', 'scoring')
+
+
+def run_stage(stage: str, csv_path: str, work_dir: str) -> dict:
+    """
+    Runs one stage in the current process (called in a child process by measure).
+    """
+    from src import config
+    from src.memory_optimization import frame_memory_mb, peak_memory_mb
+
+    logging.getLogger().setLevel(logging.WARNING)
+    start = time.perf_counter()
+    result = {}
+    if stage == 'training':
+        import numpy as np
+        from src.data_preparation import load_data
+        from src.features_engineering import FeatureEngineer
+        from src.model import build_model_pipeline
+
+        X, y, _, _ = load_data(train_path=csv_path, load_test=False, use_cache=False)
+        result['raw_frame_mb'] = frame_memory_mb(X)
+        feature_engineer = FeatureEngineer()
+        X_fe = feature_engineer.fit_transform(X, y)
+        result['engineered_frame_mb'] = frame_memory_mb(X_fe)
+        result['peak_rss_after_features_mb'] = peak_memory_mb()
+        pipeline = build_model_pipeline(feature_engineer.numerical_features_, feature_engineer.categorical_features_)
+        pipeline.fit(X_fe, np.log1p(y))
+        import joblib
+        joblib.dump(pipeline, os.path.join(work_dir, 'model.pkl'))
+        joblib.dump(feature_engineer, os.path.join(work_dir, 'feature_engineer.pkl'))
+    elif stage == 'out_of_core':
+        from src.out_of_core import train_out_of_core
+
+        ooc_dir = os.path.join(work_dir, f"out_of_core_{int(config.MEMORY_OPTIMIZED)}")
+        os.makedirs(ooc_dir, exist_ok=True)
+        train_out_of_core(train_path=csv_path, test_path=None, model_path=os.path.join(ooc_dir, 'model.pkl'),
+                          feature_engineer_path=os.path.join(ooc_dir, 'feature_engineer.pkl'),
+                          lean_model_dir=os.path.join(ooc_dir, 'lean'),
+                          lineage_path=os.path.join(ooc_dir, 'lineage.jsonl'), registry_dir=None)
+    else:
+        from src.batch_scoring import score_file
+        from src.predict import load_model, load_feature_engineer
+
+        model = load_model(os.path.join(work_dir, 'model.pkl'))
+        feature_engineer = load_feature_engineer(os.path.join(work_dir, 'feature_engineer.pkl'), model=model)
+        output_path = os.path.join(work_dir, f"scored_{int(config.MEMORY_OPTIMIZED)}.csv")
+        score_file(csv_path, output_path, model=model, feature_engineer=feature_engineer, resume=False)
+    result['seconds'] = time.perf_counter() - start
+    result['peak_rss_mb'] = peak_memory_mb()
+    return result
+
+
+def measure(stage: str, csv_path: str, work_dir: str, memory_optimized: bool) -> dict:
+    env = dict(os.environ, MEMORY_OPTIMIZED='1' if memory_optimized else '0')
+    output = subprocess.check_output(
+        [sys.executable, '-m', 'benchmarks.memory_profile', '--child', stage, '--csv', csv_path,
+         '--work-dir', work_dir], cwd=PROJECT_ROOT, env=env, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pic de mémoire avec et sans config.MEMORY_OPTIMIZED.")
+    parser.add_argument('--rows', type=int, default=1000000, help="Taille du jeu synthétique.")
+    parser.add_argument('--skip-training', action='store_true',
+                        help="Ne mesurer que le scoring (le modèle est entraîné sur 100000 lignes).")
+    parser.add_argument('--output', help="Fichier JSON de résultats (défaut : benchmarks/results/memory_<date>_<commit>.json).")
+    parser.add_argument('--child', choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument('--csv', help=argparse.SUPPRESS)
+    parser.add_argument('--work-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_stage(args.child, args.csv, args.work_dir)))
+        sys.exit(0)
+
+    from benchmarks.run_benchmarks import RESULTS_DIR, git_commit
+    from benchmarks.synthetic_data import generate_houses
+
+    results = {'commit': git_commit(), 'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+               'rows': args.rows, 'stages': {}}
+    with tempfile.TemporaryDirectory() as work_dir:
+        csv_path = os.path.join(work_dir, 'houses.csv')
+        generate_houses(args.rows).to_csv(csv_path, index=False)
+        if args.skip_training:
+            training_csv = os.path.join(work_dir, 'training.csv')
+            generate_houses(100000, seed=1).to_csv(training_csv, index=False)
+            run_stage('training', training_csv, work_dir)
+        for stage in STAGES:
+            if stage in ('training', 'out_of_core') and args.skip_training:
+                continue
+            results['stages'][stage] = {}
+            for memory_optimized in (False, True):
+                logging.warning(f"{stage}, MEMORY_OPTIMIZED={int(memory_optimized)}...")
+                results['stages'][stage]['optimized' if memory_optimized else 'default'] = measure(
+                    stage, csv_path, work_dir, memory_optimized)
+
+    output_path = args.output or os.path.join(
+        RESULTS_DIR, f"memory_{datetime.datetime.now():%Y%m%d_%H%M%S}_{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Résultats écrits dans {output_path}")
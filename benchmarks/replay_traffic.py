@@ -0,0 +1,223 @@
+# benchmarks/replay_traffic.py
+"""
+Rejeu du trafic /predict/ capturé en production (src/traffic_capture.py, activé par
+TRAFFIC_CAPTURE_ENABLED=1) contre une nouvelle version de l'API.
+
+Les requêtes capturées sont envoyées soit à l'application en processus (client ASGI), soit à
+un serveur uvicorn local (--url), à un débit cible (--rps, en boucle ouverte) ou avec un nombre
+fixe de requêtes simultanées (--concurrency, en boucle fermée). Le rapport donne les
+percentiles de latence, le débit obtenu, le taux d'erreurs et l'écart entre les prix renvoyés
+et ceux enregistrés à la capture. --compare A B compare en plus hors ligne les prédictions de
+deux versions du modèle (version du registre ou chemin d'un modèle) sur les mêmes maisons.
+Avec le cache des prédictions actif, les maisons répétées (--requests) sont servies par le
+cache : PREDICTION_CACHE_ENABLED=0 mesure le coût du modèle à chaque requête.
+
+Usage :
+    python -m benchmarks.replay_traffic --concurrency 16
+    python -m benchmarks.replay_traffic --url http://127.0.0.1:8000 --rps 200 --requests 10000
+    python -m benchmarks.replay_traffic --compare v0001 v0002
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.run_benchmarks import RESULTS_DIR, git_commit, latency_summary
+from src import config
+from src.traffic_capture import read_captured
+
+
+async def replay(client, payloads, rps: float = None, concurrency: int = 16) -> list:
+    """
+    Sends the payloads to POST /predict/ and returns one (seconds, status_code, predicted_price) per request.
+
+    With rps, request i is sent at start + i / rps whatever the pending requests (open loop) and its
+    latency is measured from that scheduled time, so the queueing of an overloaded server is counted.
+    Otherwise `concurrency` requests are kept in flight (closed loop).
+    """
+    results = [None] * len(payloads)
+
+    async def send(i, scheduled):
+        try:
+            response = await client.post('/predict/', json=payloads[i])
+            price = response.json().get('predicted_price') if response.status_code == 200 else None
+            results[i] = (time.perf_counter() - scheduled, response.status_code, price)
+        except Exception as e:
+            logging.warning(f"Requête {i} en échec : {e}")
+            results[i] = (time.perf_counter() - scheduled, 0, None)
+
+    if rps:
+        start = time.perf_counter()
+        tasks = []
+        for i in range(len(payloads)):
+            scheduled = start + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(i, scheduled)))
+        await asyncio.gather(*tasks)
+    else:
+        next_index = iter(range(len(payloads)))
+
+        async def worker():
+            for i in next_index:
+                await send(i, time.perf_counter())
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+async def run_replay(payloads, url: str = None, rps: float = None, concurrency: int = 16) -> tuple:
+    """
+    Replays against a running server (url) or the in-process app. Returns (results, total seconds).
+    """
+    import httpx
+
+    limits = httpx.Limits(max_connections=max(concurrency, 100))
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+            start = time.perf_counter()
+            results = await replay(client, payloads, rps, concurrency)
+            return results, time.perf_counter() - start
+
+    from api.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://replay', timeout=60) as client:
+            start = time.perf_counter()
+            results = await replay(client, payloads, rps, concurrency)
+            return results, time.perf_counter() - start
+
+
+def prediction_diff(reference, candidate) -> dict:
+    """
+    Absolute and relative differences between two arrays of prices (rows missing on either side are skipped).
+    """
+    reference = np.asarray(reference, dtype=np.float64)
+    candidate = np.asarray(candidate, dtype=np.float64)
+    both = ~np.isnan(reference) & ~np.isnan(candidate)
+    summary = {'n': int(len(reference)), 'n_compared': int(both.sum())}
+    if not both.any():
+        return summary
+    absolute = np.abs(candidate[both] - reference[both])
+    relative = absolute / np.maximum(np.abs(reference[both]), 1e-9)
+    summary.update({
+        'n_different': int((relative > 1e-9).sum()),
+        'mean_abs': float(absolute.mean()),
+        'p50_abs': float(np.percentile(absolute, 50)),
+        'p95_abs': float(np.percentile(absolute, 95)),
+        'p99_abs': float(np.percentile(absolute, 99)),
+        'max_abs': float(absolute.max()),
+        'max_relative': float(relative.max()),
+        'mean_signed': float((candidate[both] - reference[both]).mean()),
+    })
+    return summary
+
+
+def load_version(spec: str):
+    """
+    Loads (model, feature_engineer) from a model path or a registered version.
+    """
+    from src.predict import load_model, load_feature_engineer
+
+    if os.path.exists(spec):
+        model = load_model(spec)
+        model_dir = os.path.dirname(os.path.abspath(spec.rstrip(os.sep)))
+        feature_engineer_path = os.path.join(model_dir, os.path.basename(config.FEATURE_ENGINEER_SAVE_PATH))
+        return model, load_feature_engineer(feature_engineer_path, model=model)
+    from src.model_registry import ModelRegistry
+
+    return ModelRegistry().load(spec)
+
+
+def compare_versions(payloads, version_a: str, version_b: str) -> dict:
+    """
+    Predicts the captured houses offline with two model versions and summarizes the differences (B - A).
+    """
+    from src.predict import make_batch_prediction
+
+    df = pd.DataFrame(payloads)
+    predictions = {}
+    for spec in (version_a, version_b):
+        model, feature_engineer = load_version(spec)
+        predictions[spec], errors = make_batch_prediction(model, df, feature_engineer=feature_engineer)
+        if errors:
+            logging.warning(f"{len(errors)} maison(s) en erreur avec {spec}.")
+    return {'a': version_a, 'b': version_b, **prediction_diff(predictions[version_a], predictions[version_b])}
+
+
+def run(capture_path: str, n_requests: int = None, url: str = None, rps: float = None, concurrency: int = 16,
+        compare=None, skip_replay: bool = False) -> dict:
+    entries = read_captured(capture_path, endpoint='/predict/')
+    if not entries:
+        raise ValueError(f"Aucune requête /predict/ capturée dans {capture_path}.")
+    if n_requests:
+        # Le trafic capturé est répété (ou tronqué) jusqu'au nombre de requêtes demandé.
+        entries = [entries[i % len(entries)] for i in range(n_requests)]
+    payloads = [entry['payload'] for entry in entries]
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'capture_path': capture_path,
+        'captured_model_versions': dict(Counter(str(entry.get('model_version')) for entry in entries)),
+        'target': url or 'in-process',
+    }
+    if not skip_replay:
+        replayed, total = asyncio.run(run_replay(payloads, url, rps, concurrency))
+        durations = [seconds for seconds, _, _ in replayed]
+        status_codes = np.asarray([status for _, status, _ in replayed])
+        summary = latency_summary(durations)
+        summary.update({
+            'mode': f"open loop at {rps} rps" if rps else f"closed loop, concurrency {concurrency}",
+            'requests_per_second': len(payloads) / total,
+            'error_rate': float(np.mean(status_codes != 200)),
+            'status_codes': {str(code): int(count) for code, count in Counter(status_codes.tolist()).items()},
+        })
+        results['replay'] = summary
+        captured_prices = [entry.get('predicted_price') for entry in entries]
+        replayed_prices = [price for _, _, price in replayed]
+        results['diff_vs_capture'] = prediction_diff(
+            [np.nan if price is None else price for price in captured_prices],
+            [np.nan if price is None else price for price in replayed_prices])
+    if compare:
+        results['compare_versions'] = compare_versions(payloads, *compare)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rejeu du trafic /predict/ capturé contre l'API.")
+    parser.add_argument('--capture', default=config.TRAFFIC_CAPTURE_PATH, help="Fichier JSON Lines de trafic capturé.")
+    parser.add_argument('--url', help="URL d'un serveur uvicorn local (défaut : application en processus).")
+    parser.add_argument('--rps', type=float, help="Débit cible en requêtes par seconde (boucle ouverte).")
+    parser.add_argument('--concurrency', type=int, default=16, help="Requêtes simultanées (sans --rps).")
+    parser.add_argument('--requests', type=int, help="Nombre de requêtes envoyées (défaut : une par requête capturée).")
+    parser.add_argument('--compare', nargs=2, metavar=('A', 'B'),
+                        help="Compare hors ligne les prédictions de deux versions (registre ou chemin de modèle).")
+    parser.add_argument('--skip-replay', action='store_true', help="Seulement --compare, sans envoyer de requêtes.")
+    parser.add_argument('--output', help="Fichier JSON de résultats (défaut : benchmarks/results/replay_<date>_<commit>.json).")
+    args = parser.parse_args()
+
+    # Les journaux INFO de chaque prédiction fausseraient les mesures.
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = run(args.capture, args.requests, args.url, args.rps, args.concurrency, args.compare, args.skip_replay)
+
+    output_path = args.output or os.path.join(
+        RESULTS_DIR, f"replay_{datetime.datetime.now():%Y%m%d_%H%M%S}_{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Résultats écrits dans {output_path}")
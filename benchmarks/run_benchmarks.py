@@ -0,0 +1,236 @@
+# benchmarks/run_benchmarks.py
+"""
+Suite de benchmarks : ingénierie des caractéristiques, latence de prédiction unitaire et
+par lots (p50/p95/p99), débit de l'endpoint /predict/ via un client ASGI en processus,
+temps d'entraînement et pic mémoire.
+
+Les résultats sont écrits en JSON (un fichier par exécution, avec le commit git) pour
+pouvoir comparer les exécutions d'un commit à l'autre.
+
+Usage :
+    python -m benchmarks.run_benchmarks --sizes 1000,10000,100000
+    python -m benchmarks.run_benchmarks --sizes 10000000 --skip-training --skip-api
+"""
+import argparse
+import asyncio
+import datetime
+import io
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from benchmarks.synthetic_data import generate_houses
+from src import config
+from src.predict import load_model, load_feature_engineer, make_prediction, make_batch_prediction
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+MEASURE_MEMORY = True # Désactivé par --no-memory : chaque mesure mémoire relance l'étape sous tracemalloc
+
+
+def latency_summary(durations) -> dict:
+    """Percentiles in milliseconds of a list of durations in seconds."""
+    durations_ms = np.asarray(durations) * 1000.0
+    return {
+        'n': int(len(durations_ms)),
+        'mean_ms': float(durations_ms.mean()),
+        'p50_ms': float(np.percentile(durations_ms, 50)),
+        'p95_ms': float(np.percentile(durations_ms, 95)),
+        'p99_ms': float(np.percentile(durations_ms, 99)),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    """Runs fn once and returns (result, seconds)."""
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()): # Les étapes pandas affichent des avertissements
+        result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def peak_memory_mb(fn, *args, **kwargs):
+    """
+    Runs fn once under tracemalloc and returns the peak traced memory in MB, or None when
+    memory measurement is disabled. Kept separate from timing runs because tracemalloc
+    slows allocations down. It tracks Python and NumPy allocations, not XGBoost's native ones.
+    """
+    if not MEASURE_MEMORY:
+        return None
+    tracemalloc.start()
+    try:
+        with redirect_stdout(io.StringIO()):
+            fn(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def bench_feature_engineering(df) -> dict:
+    from src.features_engineering import feature_engineer_data
+    from src.fast_features import fast_feature_engineer_data
+
+    _, pandas_seconds = timed(feature_engineer_data, df)
+    _, fast_seconds = timed(fast_feature_engineer_data, df)
+    return {
+        'pandas_seconds': pandas_seconds, 'pandas_peak_mb': peak_memory_mb(feature_engineer_data, df),
+        'fast_seconds': fast_seconds, 'fast_peak_mb': peak_memory_mb(fast_feature_engineer_data, df),
+        'fast_rows_per_second': len(df) / fast_seconds,
+    }
+
+
+def bench_single_predictions(model, feature_engineer, df, n_requests: int) -> dict:
+    rows = [df.iloc[[i % len(df)]] for i in range(n_requests)]
+    make_prediction(model, rows[0], feature_engineer=feature_engineer) # Échauffement
+    durations = []
+    for row in rows:
+        start = time.perf_counter()
+        make_prediction(model, row, feature_engineer=feature_engineer)
+        durations.append(time.perf_counter() - start)
+    return latency_summary(durations)
+
+
+def bench_batch_prediction(model, feature_engineer, df, repeats: int = 3) -> dict:
+    durations = [timed(make_batch_prediction, model, df, feature_engineer=feature_engineer)[1] for _ in range(repeats)]
+    summary = latency_summary(durations)
+    summary['rows_per_second'] = len(df) / float(np.median(durations))
+    summary['peak_mb'] = peak_memory_mb(make_batch_prediction, model, df, feature_engineer=feature_engineer)
+    return summary
+
+
+def bench_api(df, n_requests: int, concurrency: int) -> dict:
+    import httpx
+    from api.main import app
+
+    payloads = df.drop(columns=[config.TARGET_COLUMN]).head(n_requests).to_dict(orient='records')
+
+    async def run():
+        durations, status_codes = [], []
+        semaphore = asyncio.Semaphore(concurrency)
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url='http://benchmark') as client:
+                async def one(payload):
+                    async with semaphore:
+                        start = time.perf_counter()
+                        response = await client.post('/predict/', json=payload)
+                        durations.append(time.perf_counter() - start)
+                        status_codes.append(response.status_code)
+
+                start = time.perf_counter()
+                await asyncio.gather(*(one(payload) for payload in payloads))
+                total = time.perf_counter() - start
+
+                batch_start = time.perf_counter()
+                response = await client.post('/predict/batch', json=payloads)
+                batch_seconds = time.perf_counter() - batch_start
+        return durations, status_codes, total, batch_seconds, response.status_code
+
+    durations, status_codes, total, batch_seconds, batch_status = asyncio.run(run())
+    summary = latency_summary(durations)
+    summary.update({
+        'concurrency': concurrency,
+        'requests_per_second': len(payloads) / total,
+        'error_rate': float(np.mean(np.asarray(status_codes) != 200)),
+        'batch_endpoint_seconds': batch_seconds,
+        'batch_endpoint_rows_per_second': len(payloads) / batch_seconds,
+        'batch_endpoint_status': batch_status,
+    })
+    return summary
+
+
+def bench_training(df) -> dict:
+    from src.features_engineering import FeatureEngineer
+    from src.model import build_model_pipeline
+
+    X = df.drop(columns=[config.TARGET_COLUMN])
+    y = np.log1p(df[config.TARGET_COLUMN])
+
+    def fit():
+        feature_engineer = FeatureEngineer()
+        X_fe = feature_engineer.fit_transform(X, df[config.TARGET_COLUMN])
+        pipeline = build_model_pipeline(feature_engineer.numerical_features_, feature_engineer.categorical_features_)
+        return pipeline.fit(X_fe, y)
+
+    _, seconds = timed(fit)
+    return {'seconds': seconds, 'peak_traced_mb': peak_memory_mb(fit), 'rows_per_second': len(df) / seconds}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(sizes, n_single: int, n_api: int, concurrency: int, skip_training: bool, skip_api: bool) -> dict:
+    model, model_load_seconds = timed(load_model)
+    feature_engineer = load_feature_engineer(model=model)
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': {'platform': platform.platform(), 'cpu_count': os.cpu_count()},
+        'model_load_seconds': model_load_seconds,
+        'sizes': {},
+    }
+
+    for n_rows in sizes:
+        logging.warning(f"Benchmark sur {n_rows} lignes synthétiques...")
+        df = generate_houses(n_rows, with_api_fields=True)
+        X = df.drop(columns=[config.TARGET_COLUMN])
+        size_results = {
+            'feature_engineering': bench_feature_engineering(X),
+            'batch_prediction': bench_batch_prediction(model, feature_engineer, X),
+        }
+        if not skip_training:
+            size_results['training'] = bench_training(df.drop(columns=['grade', 'lat', 'long', 'zipcode']))
+        results['sizes'][str(n_rows)] = size_results
+
+    small = generate_houses(max(n_single, n_api), seed=7, with_api_fields=True)
+    results['single_prediction'] = bench_single_predictions(model, feature_engineer,
+                                                            small.drop(columns=[config.TARGET_COLUMN]), n_single)
+    if not skip_api:
+        results['api'] = bench_api(small, n_api, concurrency)
+    results['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks de performance du projet de prédiction des prix.")
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help="Tailles des jeux synthétiques, séparées par des virgules (jusqu'à 10000000).")
+    parser.add_argument('--single-requests', type=int, default=200, help="Nombre de prédictions unitaires chronométrées.")
+    parser.add_argument('--api-requests', type=int, default=500, help="Nombre de requêtes envoyées à l'API.")
+    parser.add_argument('--concurrency', type=int, default=16, help="Requêtes API simultanées.")
+    parser.add_argument('--skip-training', action='store_true')
+    parser.add_argument('--skip-api', action='store_true')
+    parser.add_argument('--no-memory', action='store_true', help="Ne pas relancer chaque étape sous tracemalloc.")
+    parser.add_argument('--output', help="Fichier JSON de résultats (défaut : benchmarks/results/<date>_<commit>.json).")
+    args = parser.parse_args()
+
+    # Les journaux INFO de chaque prédiction fausseraient les mesures.
+    logging.getLogger().setLevel(logging.WARNING)
+    MEASURE_MEMORY = not args.no_memory
+
+    results = run([int(size) for size in args.sizes.split(',')], args.single_requests, args.api_requests,
+                  args.concurrency, args.skip_training, args.skip_api)
+
+    output_path = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.datetime.now():%Y%m%d_%H%M%S}_{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Résultats écrits dans {output_path}")
@@ -0,0 +1,78 @@
+# benchmarks/synthetic_data.py
+"""
+Génération de jeux de données synthétiques ayant le schéma de data/processed/train.csv,
+de quelques milliers à plusieurs millions de lignes, pour les benchmarks.
+"""
+import numpy as np
+import pandas as pd
+
+CITIES = ['Seattle', 'Renton', 'Bellevue', 'Redmond', 'Kirkland', 'Issaquah', 'Kent', 'Auburn']
+STREET_NAMES = ['Main St', 'Densmore Ave N', 'W Blaine St', 'NE 8th St', 'Lake Washington Blvd', '132nd Ave SE']
+FIRST_SALE_DATE = np.datetime64('2014-05-02')
+N_SALE_DAYS = 70 # Les ventes du jeu réel s'étendent du 2014-05-02 au 2014-07-10
+
+
+def generate_houses(n_rows: int, seed: int = 42, with_api_fields: bool = False) -> pd.DataFrame:
+    """
+    Génère n_rows ventes synthétiques (avec la colonne 'price').
+    Args:
+        n_rows (int): Number of houses.
+        seed (int): Random seed, for reproducible benchmarks.
+        with_api_fields (bool): Also generate grade/lat/long/zipcode, required by HouseFeatures.
+    Returns:
+        pd.DataFrame: Houses with the columns of train.csv.
+    """
+    rng = np.random.default_rng(seed)
+    sqft_living = rng.lognormal(7.6, 0.42, n_rows).clip(370, 13540).astype(np.int64)
+    sqft_basement = np.where(rng.random(n_rows) < 0.4, (sqft_living * rng.uniform(0.1, 0.45, n_rows)).astype(np.int64), 0)
+    yr_built = rng.integers(1900, 2015, n_rows)
+    renovated = rng.random(n_rows) < 0.4
+    yr_renovated = np.where(renovated, np.minimum(yr_built + rng.integers(5, 60, n_rows), 2014), 0)
+    waterfront = (rng.random(n_rows) < 0.007).astype(np.int64)
+    view = rng.choice(5, n_rows, p=[0.9, 0.02, 0.04, 0.025, 0.015])
+    condition = rng.choice([1, 2, 3, 4, 5], n_rows, p=[0.01, 0.01, 0.63, 0.27, 0.08])
+    city_index = rng.integers(0, len(CITIES), n_rows)
+    zipcode = 98001 + city_index * 7 + rng.integers(0, 7, n_rows)
+
+    price = (150 * sqft_living * (1 + 0.5 * waterfront) * (1 + 0.08 * view) * (0.9 + 0.05 * condition)
+             * rng.lognormal(0, 0.25, n_rows)).round(-2)
+    dates = FIRST_SALE_DATE + rng.integers(0, N_SALE_DAYS, n_rows).astype('timedelta64[D]')
+
+    df = pd.DataFrame({
+        'date': np.char.add(dates.astype(str), ' 00:00:00'),
+        'price': price.astype(np.float64),
+        'bedrooms': rng.choice(np.arange(0.0, 10.0), n_rows, p=[0.002, 0.05, 0.25, 0.43, 0.2, 0.05, 0.012, 0.003, 0.002, 0.001]),
+        'bathrooms': (rng.integers(2, 21, n_rows) / 4.0),
+        'sqft_living': sqft_living,
+        'sqft_lot': rng.lognormal(8.9, 0.9, n_rows).clip(638, 1074218).astype(np.int64),
+        'floors': rng.choice([1.0, 1.5, 2.0, 2.5, 3.0, 3.5], n_rows, p=[0.47, 0.1, 0.39, 0.01, 0.028, 0.002]),
+        'waterfront': waterfront,
+        'view': view,
+        'condition': condition,
+        'sqft_above': sqft_living - sqft_basement,
+        'sqft_basement': sqft_basement,
+        'yr_built': yr_built,
+        'yr_renovated': yr_renovated,
+        'street': np.char.add(np.char.add(rng.integers(100, 30000, n_rows).astype(str), ' '),
+                              np.array(STREET_NAMES)[rng.integers(0, len(STREET_NAMES), n_rows)]),
+        'city': np.array(CITIES)[city_index],
+        'statezip': np.char.add('WA ', zipcode.astype(str)),
+    })
+    for col in ['date', 'street', 'city', 'statezip']:
+        df[col] = df[col].astype(object)
+    if with_api_fields:
+        df['grade'] = rng.integers(4, 13, n_rows)
+        df['lat'] = rng.uniform(47.15, 47.78, n_rows)
+        df['long'] = rng.uniform(-122.52, -121.31, n_rows)
+        df['zipcode'] = zipcode.astype(str).astype(object)
+    return df
+
+
+def write_houses_csv(path: str, n_rows: int, chunk_size: int = 1_000_000, seed: int = 42) -> str:
+    """
+    Écrit n_rows ventes synthétiques dans un CSV, par morceaux pour borner la mémoire (utile pour 10M lignes).
+    """
+    for i, start in enumerate(range(0, n_rows, chunk_size)):
+        chunk = generate_houses(min(chunk_size, n_rows - start), seed=seed + i)
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    return path
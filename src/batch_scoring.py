@@ -0,0 +1,262 @@
+# src/batch_scoring.py
+"""
+Scoring par lots de gros fichiers (CSV ou Parquet) en flux continu.
+
+Le fichier d'entrée est lu par morceaux (read_csv(chunksize=...) ou groupes de lignes
+Parquet), chaque morceau passe par l'ingénierie des caractéristiques et model.predict,
+puis les prédictions sont ajoutées au fichier CSV de sortie. La mémoire reste donc
+bornée quelle que soit la taille du fichier. Après chaque morceau, un point de reprise
+(<sortie>.checkpoint.json) est écrit : un scoring interrompu reprend au morceau suivant.
+
+Avec workers > 1, les morceaux sont scorés en parallèle par un pool de processus :
+chaque worker charge le modèle une seule fois et utilise `nthread` threads XGBoost,
+et les résultats sont réécrits dans l'ordre d'entrée.
+"""
+import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.memory_optimization import csv_dtypes, optimize_frame, peak_memory_mb
+from src.predict import load_model, load_feature_engineer, make_batch_prediction
+
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+
+
+def _checkpoint_path(output_path: str) -> str:
+    return f"{output_path}.checkpoint.json"
+
+
+def _input_signature(input_path: str) -> dict:
+    # Taille et date de modification : un fichier remplacé ou modifié entre deux exécutions est détecté
+    # sans relire ses données.
+    stat = os.stat(input_path)
+    return {'input_path': os.path.abspath(input_path), 'input_size': stat.st_size, 'input_mtime_ns': stat.st_mtime_ns}
+
+
+def _read_checkpoint(output_path: str, input_path: str, chunk_size: int):
+    path = _checkpoint_path(output_path)
+    if not os.path.exists(path) or not os.path.exists(output_path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('chunk_size') != chunk_size:
+        logging.warning(f"Point de reprise {path} ignoré : il concerne une autre taille de morceau.")
+        return None
+    if any(checkpoint.get(key) != value for key, value in _input_signature(input_path).items()):
+        logging.warning(f"Point de reprise {path} ignoré : le fichier d'entrée a changé depuis son écriture.")
+        return None
+    return checkpoint
+
+
+def _write_checkpoint(output_path: str, checkpoint: dict):
+    path = _checkpoint_path(output_path)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path) # Remplacement atomique : jamais de point de reprise à moitié écrit
+
+
+def iter_input_chunks(input_path: str, chunk_size: int, skip_rows: int = 0,
+                      memory_optimized: bool = config.MEMORY_OPTIMIZED):
+    """
+    Yields DataFrames of at most chunk_size rows, starting after skip_rows data rows.
+    CSV files are read with read_csv(chunksize=...), Parquet files row group by row group.
+    With memory_optimized, each chunk is downcast by optimize_frame (addresses are read as `category`).
+    """
+    chunks = _iter_raw_chunks(input_path, chunk_size, skip_rows, memory_optimized)
+    if not memory_optimized:
+        yield from chunks
+        return
+    for chunk in chunks:
+        yield optimize_frame(chunk, exclude=[config.TARGET_COLUMN])
+
+
+def _iter_raw_chunks(input_path: str, chunk_size: int, skip_rows: int, memory_optimized: bool):
+    if input_path.lower().endswith(PARQUET_EXTENSIONS):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrow est nécessaire pour lire des fichiers Parquet (pip install pyarrow).")
+        parquet_file = pq.ParquetFile(input_path)
+        # On saute directement les premiers groupes de lignes déjà traités sans les décoder.
+        row_groups, skipped = [], 0
+        for i in range(parquet_file.num_row_groups):
+            n_rows = parquet_file.metadata.row_group(i).num_rows
+            if not row_groups and skipped + n_rows <= skip_rows:
+                skipped += n_rows
+            else:
+                row_groups.append(i)
+        to_skip = skip_rows - skipped
+        buffer = []
+        buffered_rows = 0
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, row_groups=row_groups):
+            if to_skip:
+                dropped = min(to_skip, batch.num_rows)
+                batch = batch.slice(dropped)
+                to_skip -= dropped
+            if batch.num_rows:
+                buffer.append(batch.to_pandas(strings_to_categorical=memory_optimized))
+                buffered_rows += batch.num_rows
+            # iter_batches peut renvoyer des lots plus petits en fin de groupe : on les regroupe.
+            while buffered_rows >= chunk_size:
+                merged = pd.concat(buffer, ignore_index=True)
+                yield merged.iloc[:chunk_size]
+                buffer = [merged.iloc[chunk_size:]]
+                buffered_rows -= chunk_size
+        if buffered_rows:
+            yield pd.concat(buffer, ignore_index=True)
+    else:
+        # Une fonction plutôt qu'une liste : pandas convertit une liste de lignes à sauter en set,
+        # soit des centaines de Mo pour reprendre après 10 millions de lignes.
+        skiprows = (lambda i: 0 < i <= skip_rows) if skip_rows else None
+        yield from pd.read_csv(input_path, chunksize=chunk_size, skiprows=skiprows,
+                               dtype=csv_dtypes() if memory_optimized else None)
+
+
+def score_chunk(model, feature_engineer, chunk: pd.DataFrame, first_row: int) -> pd.DataFrame:
+    """
+    Scores one chunk and returns the output rows (row number, id if present, price, error).
+    """
+    chunk = chunk.drop(columns=[config.TARGET_COLUMN], errors='ignore')
+    predictions, errors = make_batch_prediction(model, chunk, chunk_size=len(chunk),
+                                                feature_engineer=feature_engineer)
+    output = pd.DataFrame({'row': np.arange(first_row, first_row + len(chunk))})
+    if 'id' in chunk.columns:
+        output['id'] = chunk['id'].to_numpy()
+    output['predicted_price'] = predictions
+    output['error'] = [errors.get(i, '') for i in range(len(chunk))]
+    return output
+
+
+def set_model_nthread(model, nthread: int):
+    """
+    Limits the number of threads XGBoost uses for prediction, to avoid oversubscription
+    when several worker processes share the machine.
+    """
+    if hasattr(model, 'named_steps'):
+        model.named_steps['regressor'].set_params(n_jobs=nthread)
+    elif hasattr(model, 'booster'): # LeanModel
+        model.booster.set_param({'nthread': nthread})
+
+
+# État propre à chaque processus worker, initialisé une seule fois par _init_worker
+_worker_model = None
+_worker_feature_engineer = None
+
+
+def _init_worker(model, feature_engineer, model_path, feature_engineer_path, nthread):
+    global _worker_model, _worker_feature_engineer
+    if model is None:
+        model = load_model(model_path)
+        feature_engineer = load_feature_engineer(feature_engineer_path, model=model)
+    if nthread:
+        set_model_nthread(model, nthread)
+    _worker_model, _worker_feature_engineer = model, feature_engineer
+
+
+def _score_chunk_in_worker(chunk: pd.DataFrame, first_row: int) -> pd.DataFrame:
+    return score_chunk(_worker_model, _worker_feature_engineer, chunk, first_row)
+
+
+def _iter_scored_chunks(chunks, first_row: int, model, feature_engineer, workers: int, nthread: int,
+                        model_path: str, feature_engineer_path: str):
+    """
+    Yields (chunk length, scored DataFrame) in input order, sequentially or with a process pool.
+    """
+    if workers <= 1:
+        if model is None:
+            model = load_model(model_path)
+            feature_engineer = load_feature_engineer(feature_engineer_path, model=model)
+        if nthread:
+            set_model_nthread(model, nthread)
+        for chunk in chunks:
+            yield len(chunk), score_chunk(model, feature_engineer, chunk, first_row)
+            first_row += len(chunk)
+        return
+
+    logging.info(f"Scoring parallèle : {workers} processus, {nthread} thread(s) XGBoost par processus.")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model, feature_engineer, model_path, feature_engineer_path, nthread)) as pool:
+        # Fenêtre bornée de morceaux en cours : la mémoire reste proportionnelle au nombre de workers.
+        pending = deque()
+        for chunk in chunks:
+            pending.append((len(chunk), pool.submit(_score_chunk_in_worker, chunk, first_row)))
+            first_row += len(chunk)
+            if len(pending) >= 2 * workers:
+                n_rows, future = pending.popleft()
+                yield n_rows, future.result()
+        while pending:
+            n_rows, future = pending.popleft()
+            yield n_rows, future.result()
+
+
+def score_file(input_path: str, output_path: str, model=None, feature_engineer=None,
+               chunk_size: int = config.SCORING_CHUNK_SIZE, resume: bool = True, workers: int = 1,
+               nthread: int = None, model_path: str = config.MODEL_SAVE_PATH,
+               feature_engineer_path: str = config.FEATURE_ENGINEER_SAVE_PATH, on_chunk=None):
+    """
+    Scores a CSV or Parquet file of any size with bounded memory.
+    Args:
+        input_path (str): CSV or Parquet file with the raw house features.
+        output_path (str): CSV file receiving the predictions, written chunk by chunk.
+        model: Loaded model; loaded from model_path if None.
+        feature_engineer (FeatureEngineer): Fitted feature engineer; loaded if None.
+        chunk_size (int): Number of rows read, scored and written at a time.
+        resume (bool): Resume from the checkpoint of a previous interrupted run, if any.
+        workers (int): Number of scoring processes (0 = one per CPU core, 1 = no pool).
+        nthread (int): XGBoost threads per process. Defaults to cores / workers when workers > 1.
+        model_path (str): Model loaded by each process when model is None.
+        feature_engineer_path (str): FeatureEngineer loaded by each process when model is None.
+        on_chunk (callable): Called with the checkpoint after each chunk is written (progress reporting).
+                             An exception raised by it stops the scoring and keeps the checkpoint,
+                             so that a later call with resume=True continues from there.
+    Returns:
+        dict: Summary with the number of rows scored and in error.
+    """
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if nthread is None and workers > 1:
+        nthread = max(1, (os.cpu_count() or 1) // workers)
+
+    checkpoint = _read_checkpoint(output_path, input_path, chunk_size) if resume else None
+    if checkpoint is not None:
+        logging.info(f"Reprise du scoring de {input_path} après {checkpoint['rows_done']} lignes.")
+        with open(output_path, 'r+b') as f:
+            f.truncate(checkpoint['output_bytes']) # Retire un morceau éventuellement écrit à moitié
+    else:
+        checkpoint = {**_input_signature(input_path), 'chunk_size': chunk_size,
+                      'chunks_done': 0, 'rows_done': 0, 'rows_in_error': 0, 'output_bytes': 0}
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        open(output_path, 'w').close()
+
+    chunks = iter_input_chunks(input_path, chunk_size, skip_rows=checkpoint['rows_done'])
+    scored_chunks = _iter_scored_chunks(chunks, checkpoint['rows_done'], model, feature_engineer, workers, nthread,
+                                        model_path, feature_engineer_path)
+    with open(output_path, 'ab') as output_file:
+        for n_rows, scored in scored_chunks:
+            output_file.write(scored.to_csv(header=checkpoint['output_bytes'] == 0, index=False).encode('utf-8'))
+            output_file.flush()
+            os.fsync(output_file.fileno())
+
+            checkpoint['chunks_done'] += 1
+            checkpoint['rows_done'] += n_rows
+            checkpoint['rows_in_error'] += int((scored['error'] != '').sum())
+            checkpoint['output_bytes'] = output_file.tell()
+            _write_checkpoint(output_path, checkpoint)
+            logging.info(f"Morceau {checkpoint['chunks_done']} traité ({checkpoint['rows_done']} lignes au total).")
+            if on_chunk is not None:
+                on_chunk(checkpoint)
+
+    if os.path.exists(_checkpoint_path(output_path)):
+        os.remove(_checkpoint_path(output_path))
+    summary = {'rows_scored': checkpoint['rows_done'] - checkpoint['rows_in_error'],
+               'rows_in_error': checkpoint['rows_in_error'], 'output_path': output_path,
+               'peak_rss_mb': round(peak_memory_mb(), 1)}
+    logging.info(f"Scoring terminé : {summary}")
+    return summary
@@ -0,0 +1,163 @@
+# src/columnar_io.py
+"""
+Formats binaires des corps de requête et de réponse de /predict/batch.
+
+- Arrow IPC stream (application/vnd.apache.arrow.stream) : les colonnes numériques
+  sont lues directement depuis les buffers Arrow (sans copie quand la colonne est
+  contiguë, sans valeur nulle et déjà du type du schéma) puis converties au type du champ
+  (float64 ou int64), comme le ferait pydantic. Le schéma est validé colonne par colonne,
+  sans objet Python par ligne.
+- MessagePack (application/msgpack) : même structure que le JSON, décodée plus vite.
+
+pyarrow et msgpack sont optionnels : ils ne sont importés qu'à l'usage.
+"""
+import numpy as np
+
+ARROW_STREAM_CONTENT_TYPE = 'application/vnd.apache.arrow.stream'
+MSGPACK_CONTENT_TYPES = ('application/msgpack', 'application/x-msgpack')
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.compute # noqa: F401 (enregistre pa.compute)
+    except ImportError:
+        raise ImportError("pyarrow est nécessaire pour les requêtes Arrow (pip install pyarrow).")
+    return pa
+
+
+def _import_msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise ImportError("msgpack est nécessaire pour les requêtes MessagePack (pip install msgpack).")
+    return msgpack
+
+
+def read_arrow_stream(body: bytes):
+    """
+    Lit un flux Arrow IPC et retourne la pyarrow.Table correspondante (les buffers
+    référencent directement `body`).
+    """
+    pa = _import_pyarrow()
+    return pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+
+
+def _date_column_to_numpy(column):
+    """
+    Dates Arrow (date32, timestamp) converties sans analyse ; les chaînes ISO sont converties
+    par Arrow en une passe, et seules les chaînes non ISO passent par parse_sale_dates.
+    """
+    pa = _import_pyarrow()
+    if pa.types.is_date(column.type) or pa.types.is_timestamp(column.type):
+        return column.to_numpy().astype('datetime64[D]')
+    try:
+        return pa.compute.cast(column, pa.timestamp('s')).to_numpy().astype('datetime64[D]')
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return column.to_numpy(zero_copy_only=False)
+
+
+def _not_whole(values: np.ndarray) -> np.ndarray:
+    """Valeurs non nulles qui ne sont pas des entiers int64 (2.5, inf...), refusées comme par pydantic."""
+    with np.errstate(invalid='ignore'):
+        whole = np.isfinite(values) & (np.mod(values, 1) == 0) & (np.abs(values) < 2 ** 63)
+    return ~np.isnan(values) & ~whole
+
+
+def arrow_table_to_columns(table, float_fields, int_fields, string_fields, optional_fields=(), skip_columns=()):
+    """
+    Valide une table Arrow contre le schéma attendu et la convertit en colonnes NumPy.
+
+    Args:
+        table (pyarrow.Table): Maisons reçues, une ligne par maison.
+        float_fields (list): Champs obligatoires de type flottant, convertis en float64.
+        int_fields (list): Champs obligatoires de type entier, convertis en int64 (une colonne
+                           flottante est acceptée si ses valeurs sont entières).
+        string_fields (list): Champs obligatoires de type chaîne ('date' accepte aussi date32/timestamp).
+        optional_fields (list): Champs facultatifs (validés s'ils sont présents).
+        skip_columns (list): Champs validés mais non convertis, car supprimés par l'ingénierie
+                             des caractéristiques (ex. street, city).
+    Returns:
+        tuple: (dict {colonne: np.ndarray} des lignes valides, positions de ces lignes dans la
+                requête, dict {position: message d'erreur} des lignes rejetées).
+    Raises:
+        ValueError: colonne obligatoire absente ou de type incompatible (erreur de schéma).
+    """
+    pa = _import_pyarrow()
+    missing = [name for name in list(float_fields) + list(int_fields) + list(string_fields)
+               if name not in table.column_names]
+    if missing:
+        raise ValueError(f"Colonnes manquantes : {missing}")
+
+    fields = [(name, 'float') for name in float_fields] + [(name, 'int') for name in int_fields]
+    fields += [(name, 'string') for name in string_fields]
+    fields += [(name, 'string') for name in optional_fields if name in table.column_names]
+    null_masks = {}
+    fraction_masks = {}
+    for name, kind in fields:
+        column_type = table.schema.field(name).type
+        if kind in ('float', 'int') and not (pa.types.is_integer(column_type) or pa.types.is_floating(column_type)):
+            raise ValueError(f"{name} : type numérique attendu (reçu {column_type}).")
+        if kind == 'string' and not (pa.types.is_string(column_type) or pa.types.is_large_string(column_type)
+                                     or (name == 'date' and (pa.types.is_date(column_type)
+                                                             or pa.types.is_timestamp(column_type)))):
+            raise ValueError(f"{name} : type chaîne attendu (reçu {column_type}).")
+        if table.column(name).null_count and name not in optional_fields:
+            null_masks[name] = table.column(name).is_null().to_numpy(zero_copy_only=False)
+        if kind == 'int' and pa.types.is_floating(column_type):
+            not_whole = _not_whole(table.column(name).to_numpy().astype(np.float64, copy=False))
+            if not_whole.any():
+                fraction_masks[name] = not_whole
+
+    errors = {}
+    valid = np.ones(table.num_rows, dtype=bool)
+    for mask in list(null_masks.values()) + list(fraction_masks.values()):
+        valid &= ~mask
+    for position in np.flatnonzero(~valid):
+        messages = [f"{name}: field required" for name, mask in null_masks.items() if mask[position]]
+        messages += [f"{name}: valeur entière attendue" for name, mask in fraction_masks.items() if mask[position]]
+        errors[int(position)] = "; ".join(messages)
+    if errors:
+        table = table.filter(pa.array(valid))
+
+    columns = {}
+    for name, kind in fields:
+        if name in skip_columns and name != 'date':
+            continue
+        column = table.column(name)
+        if name == 'date':
+            columns[name] = _date_column_to_numpy(column)
+        elif kind == 'float':
+            columns[name] = column.to_numpy().astype(np.float64, copy=False)
+        elif kind == 'int':
+            columns[name] = column.to_numpy().astype(np.int64, copy=False)
+        else:
+            columns[name] = column.to_numpy(zero_copy_only=False)
+    return columns, np.flatnonzero(valid).tolist(), errors
+
+
+def write_arrow_predictions(predicted_prices: np.ndarray, errors: dict) -> bytes:
+    """
+    Sérialise les prédictions en flux Arrow : colonne `predicted_price` (nulle pour les maisons
+    en erreur) et colonne `error` (message ou nulle), dans l'ordre de la requête.
+    """
+    pa = _import_pyarrow()
+    error_messages = np.full(len(predicted_prices), None, dtype=object)
+    for position, message in errors.items():
+        error_messages[position] = message
+    table = pa.table({
+        'predicted_price': pa.array(predicted_prices, mask=np.isnan(predicted_prices)),
+        'error': pa.array(error_messages, type=pa.string()),
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def unpack_msgpack(body: bytes):
+    return _import_msgpack().unpackb(body, raw=False)
+
+
+def pack_msgpack(payload) -> bytes:
+    return _import_msgpack().packb(payload, use_bin_type=True)
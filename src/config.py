@@ -15,10 +15,43 @@ RAW_DATA_DIR = os.path.join(DATA_DIR, 'raw') # Si vous avez un dossier pour les
 
 TRAIN_DATA_PATH = os.path.join(PROCESSED_DATA_DIR, 'train.csv')
 TEST_DATA_PATH = os.path.join(PROCESSED_DATA_DIR, 'test.csv')
+# Cache colonnaire (.npy mappés en mémoire) des CSV bruts et ingéniérés, voir src/dataset_cache.py
+DATA_CACHE_DIR = os.path.join(DATA_DIR, 'cache')
+USE_DATA_CACHE = os.getenv('USE_DATA_CACHE', '1') == '1'
+# Mode mémoire réduite (src/memory_optimization.py) : entiers/flottants réduits sans perte,
+# adresses et caractéristiques catégorielles en dtype `category`, dates analysées au chargement.
+MEMORY_OPTIMIZED = os.getenv('MEMORY_OPTIMIZED', '0') == '1'
 
 # --- Chemin du Modèle Sauvegardé ---
 # Le dossier 'models' est également à la racine du projet
 MODEL_SAVE_PATH = os.path.join(PROJECT_ROOT, 'models', 'xgboost_model.pkl') # <--- MODIFIEZ CECI
+# FeatureEngineer ajusté (listes de caractéristiques et types figés), sauvegardé à côté du modèle
+FEATURE_ENGINEER_SAVE_PATH = os.path.join(PROJECT_ROOT, 'models', 'feature_engineer.pkl')
+# Artefact d'inférence allégé (préprocesseur aplati + booster XGBoost natif), chargeable sans scikit-learn
+LEAN_MODEL_DIR = os.path.join(PROJECT_ROOT, 'models', 'lean')
+# Préprocesseur du modèle : 'onehot' (imputation + StandardScaler + OneHotEncoder, chemin de référence)
+# ou 'native_categorical' (codes de catégories, tree_method='hist', enable_categorical=True, sans mise à l'échelle)
+MODEL_MODE = os.getenv('MODEL_MODE', 'onehot')
+# Index de voisinage (src/neighbourhood.py) : statistiques de prix par ville et code postal,
+# ajustées sur les ventes d'entraînement et sérialisées avec le FeatureEngineer.
+USE_NEIGHBOURHOOD_FEATURES = os.getenv('USE_NEIGHBOURHOOD_FEATURES', '1') == '1'
+NEIGHBOURHOOD_SMOOTHING = 20 # Poids (en nombre de ventes) de l'a priori du niveau supérieur
+NEIGHBOURHOOD_MIN_SALES = 5 # Ventes minimales pour utiliser la médiane prix/pied² d'un niveau
+NEIGHBOURHOOD_N_FOLDS = 5 # Plis de l'encodage hors-pli des ventes d'entraînement
+# Meilleure configuration XGBoost trouvée par python -m src.tuning, utilisée par build_model_pipeline
+BEST_PARAMS_PATH = os.path.join(PROJECT_ROOT, 'models', 'best_params.json')
+# Matrices prétraitées des folds de validation croisée, réutilisées d'une recherche à l'autre
+TUNING_CACHE_DIR = os.path.join(DATA_DIR, 'cache', 'tuning')
+# Registre versionné des modèles (une version par entraînement, voir src/model_registry.py)
+MODEL_REGISTRY_DIR = os.path.join(PROJECT_ROOT, 'models', 'registry')
+# Intervalle de vérification du registre par l'API pour le rechargement à chaud (0 = désactivé)
+MODEL_POLL_INTERVAL_SECONDS = float(os.getenv('MODEL_POLL_INTERVAL_SECONDS', '10'))
+# Journal de lignée des modèles (une ligne JSON par entraînement complet ou incrémental)
+MODEL_LINEAGE_PATH = os.path.join(PROJECT_ROOT, 'models', 'lineage.jsonl')
+# Nombre d'arbres ajoutés au booster existant par un entraînement incrémental (python -m src.model --incremental)
+INCREMENTAL_N_ESTIMATORS = 100
+# Si activé, l'API charge l'artefact allégé au lieu du Pipeline picklé
+USE_LEAN_MODEL = os.getenv('USE_LEAN_MODEL', '0') == '1'
 
 # --- Colonne Cible ---
 TARGET_COLUMN = 'price' # Nom de la colonne que vous voulez prédire
@@ -34,6 +67,10 @@ INITIAL_NUMERICAL_FEATURES = [
     'yr_built', 'yr_renovated'
 ]
 
+# Colonnes numériques flottantes du dataset brut (bedrooms=3.0 donne la catégorie '3.0').
+# Utilisées quand un FeatureEngineer est reconstruit sans avoir vu les données d'entraînement.
+TRAINING_FLOAT_FEATURES = ['bedrooms', 'bathrooms', 'floors']
+
 # Caractéristiques catégorielles initiales du dataset brut
 INITIAL_CATEGORICAL_FEATURES = [
     # 'street', 'city', 'statezip', 'country' - Ces colonnes sont souvent droppées
@@ -45,6 +82,72 @@ INITIAL_CATEGORICAL_FEATURES = [
 # Log file path
 APP_LOG_FILE = 'logs/app.log'
 
+# --- Prédiction par lots ---
+BATCH_CHUNK_SIZE = 10000 # Nombre de lignes envoyées à model.predict en un seul appel
+BATCH_MAX_ROWS = 100000 # Nombre maximal de maisons acceptées par requête sur /predict/batch
+BATCH_MAX_BYTES = int(os.getenv('BATCH_MAX_BYTES', str(100 * 1024 * 1024))) # Taille maximale du corps d'une requête /predict/batch
+SCORING_CHUNK_SIZE = 50000 # Taille des morceaux lus depuis le disque par le scoring de fichiers (src/batch_scoring.py)
+
+# --- Entraînement hors mémoire (src/out_of_core.py, python -m src.model --out-of-core) ---
+OUT_OF_CORE_CHUNK_SIZE = int(os.getenv('OUT_OF_CORE_CHUNK_SIZE', '100000')) # Lignes lues et transformées à la fois
+OUT_OF_CORE_SAMPLE_ROWS = 100000 # Échantillon réservoir sur lequel l'imputation et la mise à l'échelle sont ajustées
+OUT_OF_CORE_MAX_BIN = 256 # Nombre de seuils par colonne des matrices quantifiées XGBoost
+# 1 = pages quantifiées sur disque (ExtMemQuantileDMatrix) ; 0 = QuantileDMatrix compressée en mémoire
+OUT_OF_CORE_EXTERNAL_MEMORY = os.getenv('OUT_OF_CORE_EXTERNAL_MEMORY', '0') == '1'
+OUT_OF_CORE_CACHE_DIR = os.path.join(DATA_DIR, 'cache', 'external_memory')
+
+# --- Explications (/explain) ---
+# TreeSHAP exact coûte bien plus qu'une prédiction : le nombre de maisons par requête est limité.
+EXPLAIN_MAX_ROWS = int(os.getenv('EXPLAIN_MAX_ROWS', '10000'))
+EXPLAIN_CHUNK_SIZE = 1000 # Nombre de lignes expliquées par appel au booster
+
+# --- Micro-batching de l'API (désactivé par défaut) ---
+# Regroupe les appels concurrents à /predict/ en un seul appel au modèle.
+MICRO_BATCHING_ENABLED = os.getenv('MICRO_BATCHING_ENABLED', '0') == '1'
+MICRO_BATCH_MAX_SIZE = int(os.getenv('MICRO_BATCH_MAX_SIZE', '64')) # Nombre maximal de maisons par micro-lot
+MICRO_BATCH_MAX_WAIT_MS = float(os.getenv('MICRO_BATCH_MAX_WAIT_MS', '5')) # Attente maximale avant de lancer un micro-lot
+
+# --- Cache des prédictions de l'API ---
+PREDICTION_CACHE_ENABLED = os.getenv('PREDICTION_CACHE_ENABLED', '1') == '1'
+PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', '10000')) # Nombre maximal de prédictions en cache
+PREDICTION_CACHE_TTL_SECONDS = float(os.getenv('PREDICTION_CACHE_TTL_SECONDS', '3600')) # Durée de vie d'une prédiction
+# Fichier SQLite optionnel pour partager le cache entre plusieurs workers (vide = cache mémoire uniquement)
+PREDICTION_CACHE_DISK_PATH = os.getenv('PREDICTION_CACHE_DISK_PATH', '') or None
+PREDICTION_CACHE_FLUSH_INTERVAL_SECONDS = float(os.getenv('PREDICTION_CACHE_FLUSH_INTERVAL_SECONDS', '1')) # Écriture des prédictions dans le fichier
+
+# --- Tâches de prédiction asynchrones (src/prediction_jobs.py, POST /jobs) ---
+JOBS_DIR = os.path.join(PROJECT_ROOT, 'predictions', 'jobs') # Un répertoire par tâche (entrée et prédictions)
+JOBS_DB_PATH = os.path.join(JOBS_DIR, 'jobs.sqlite') # File persistante des tâches
+# Processus workers lancés par l'API au premier POST /jobs (0 = aucun : lancer python -m src.prediction_jobs à part)
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', '0'))
+JOBS_SCHEMA_SAMPLE_ROWS = 1000 # Lignes d'un CSV soumis lues pour vérifier son schéma avant de l'accepter
+JOBS_CHUNK_SIZE = 10000 # Lignes scorées entre deux mises à jour de l'avancement (et points de reprise)
+JOBS_POLL_INTERVAL_SECONDS = 1.0 # Attente d'un worker inactif entre deux consultations de la file
+JOBS_HEARTBEAT_INTERVAL_SECONDS = 5.0 # Renouvellement du bail d'une tâche par son worker
+JOBS_LEASE_SECONDS = 30.0 # Bail non renouvelé depuis cette durée : tâche remise en file
+
+# --- Capture du trafic /predict/ (src/traffic_capture.py, rejouée par benchmarks/replay_traffic.py) ---
+TRAFFIC_CAPTURE_ENABLED = os.getenv('TRAFFIC_CAPTURE_ENABLED', '0') == '1'
+TRAFFIC_CAPTURE_PATH = os.getenv('TRAFFIC_CAPTURE_PATH', os.path.join(PROJECT_ROOT, 'logs', 'captured_requests.jsonl'))
+TRAFFIC_CAPTURE_SAMPLE_RATE = float(os.getenv('TRAFFIC_CAPTURE_SAMPLE_RATE', '0.01')) # Fraction des requêtes capturées
+TRAFFIC_CAPTURE_FLUSH_INTERVAL_SECONDS = float(os.getenv('TRAFFIC_CAPTURE_FLUSH_INTERVAL_SECONDS', '1'))
+TRAFFIC_CAPTURE_MAX_BUFFER = 10000 # Requêtes en attente d'écriture ; au-delà, les nouvelles sont ignorées
+TRAFFIC_CAPTURE_MAX_BYTES = int(os.getenv('TRAFFIC_CAPTURE_MAX_BYTES', str(100 * 1024 * 1024))) # Taille maximale du fichier
+
+# --- Surveillance de la dérive du trafic (src/drift_monitoring.py, GET /drift) ---
+DRIFT_MONITORING_ENABLED = os.getenv('DRIFT_MONITORING_ENABLED', '1') == '1'
+# Profil de référence calculé à l'entraînement (copié dans chaque version du registre)
+DRIFT_REFERENCE_PATH = os.path.join(PROJECT_ROOT, 'models', 'reference_profile.json')
+# Esquisses du trafic écrites par chaque worker, fusionnées par /drift
+DRIFT_SKETCH_DIR = os.getenv('DRIFT_SKETCH_DIR', os.path.join(PROJECT_ROOT, 'logs', 'drift'))
+DRIFT_FLUSH_INTERVAL_SECONDS = float(os.getenv('DRIFT_FLUSH_INTERVAL_SECONDS', '10'))
+DRIFT_WINDOW_HOURS = float(os.getenv('DRIFT_WINDOW_HOURS', '24')) # Heures de trafic fusionnées par /drift
+DRIFT_RETENTION_HOURS = float(os.getenv('DRIFT_RETENTION_HOURS', '168')) # Heures d'esquisses conservées sur disque
+DRIFT_NUMERICAL_FEATURES = INITIAL_NUMERICAL_FEATURES # Champs numériques surveillés
+DRIFT_CATEGORICAL_FEATURES = ['city', 'statezip'] # Champs catégoriels surveillés
+DRIFT_N_BINS = 20 # Compartiments des histogrammes numériques (quantiles d'entraînement)
+DRIFT_MAX_CATEGORIES = 200 # Catégories suivies par champ ; les autres comptent comme inconnues
+
 # Colonnes à retirer après l'ingénierie des caractéristiques
 # (par exemple, 'date' après extraction de l'année/mois, ou identifiants)
 FEATURES_TO_DROP_AFTER_ENGINEERING = [
@@ -56,9 +159,5 @@ FEATURES_TO_DROP_AFTER_ENGINEERING = [
 NUM_IMPUTER_STRATEGY = 'mean' # 'mean', 'median', 'most_frequent'
 CAT_IMPUTER_STRATEGY = 'most_frequent' # 'most_frequent', 'constant'
 
-# --- Listes des Caractéristiques Finales (Mises à jour par features_engineering.py) ---
-# Ces listes sont utilisées par model.py pour définir le preprocessor.
-# Elles seront remplies dynamiquement par la fonction feature_engineer_data
-# en fonction des caractéristiques finales sélectionnées/créées.
-_final_numerical_features = []
-_final_categorical_features = []
\ No newline at end of file
+# Les listes finales de caractéristiques ne sont plus stockées ici : elles sont figées
+# dans le FeatureEngineer ajusté (voir features_engineering.py), sauvegardé avec le modèle.
\ No newline at end of file
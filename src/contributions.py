@@ -0,0 +1,122 @@
+# src/contributions.py
+"""
+Contributions de chaque champ d'entrée à une prédiction, calculées par XGBoost
+(pred_contribs : TreeSHAP exact, ou approx_contribs : attribution de Saabas, plus rapide).
+
+Le booster voit la matrice transformée (colonnes mises à l'échelle et colonnes one-hot) :
+les contributions de ses colonnes sont d'abord regroupées par caractéristique ingéniérée
+(toutes les colonnes one-hot de bedrooms_cat vont à bedrooms_cat), puis réparties entre
+les champs bruts dont dépend chaque caractéristique (FEATURE_SOURCES), à parts égales
+quand il y en a plusieurs. Ce regroupement est un produit matriciel : la somme des
+contributions reste égale à la prédiction en échelle log moins la valeur de base.
+"""
+import numpy as np
+import xgboost as xgb # type: ignore
+
+from src.fast_features import FEATURE_SOURCES
+from src.native_categorical import NativeCategoricalPreprocessor
+from src.neighbourhood import NeighbourhoodIndex
+
+
+def feature_sources(feature: str) -> tuple:
+    """
+    Champs bruts (ceux de HouseFeatures) dont dépend une caractéristique ingéniérée.
+    """
+    if feature in FEATURE_SOURCES:
+        return FEATURE_SOURCES[feature]
+    return NeighbourhoodIndex.feature_sources.get(feature, (feature,))
+
+
+def _booster(model):
+    """
+    Booster, plage d'itérations et valeur manquante utilisés par model.predict (Pipeline ou LeanModel).
+    """
+    if hasattr(model, 'named_steps'):
+        regressor = model[-1]
+        try:
+            iteration_range = (0, int(regressor.best_iteration) + 1)
+        except AttributeError: # Pas d'arrêt précoce : toutes les itérations sont utilisées
+            iteration_range = (0, 0)
+        return regressor.get_booster(), iteration_range, regressor.missing
+    return model.booster, model.iteration_range, model.missing
+
+
+def output_columns(model) -> list:
+    """
+    Caractéristique ingéniérée à l'origine de chaque colonne de la matrice vue par le booster.
+    """
+    if hasattr(model, 'named_steps'):
+        preprocessor = model.named_steps['preprocessor']
+        if isinstance(preprocessor, NativeCategoricalPreprocessor):
+            return preprocessor.numerical_features_ + preprocessor.categorical_features_
+        columns = []
+        for name, transformer, cols in preprocessor.transformers_:
+            if name == 'cat_pipeline':
+                for col, categories in zip(cols, transformer.named_steps['encoder'].categories_):
+                    columns.extend([col] * len(categories))
+            elif name != 'remainder':
+                columns.extend(cols)
+        return columns
+    if model.mode == 'native_categorical':
+        return model.numerical_features + model.categorical_features
+    return model.numerical_features + [col for col, categories in zip(model.categorical_features, model.spec['categories'])
+                                       for _ in categories]
+
+
+def aggregation_matrix(columns: list):
+    """
+    Returns the input fields and a (n_columns, n_fields) matrix giving the share of each
+    booster column attributed to each field.
+    """
+    fields = list(dict.fromkeys(source for col in columns for source in feature_sources(col)))
+    positions = {field: i for i, field in enumerate(fields)}
+    matrix = np.zeros((len(columns), len(fields)))
+    for j, col in enumerate(columns):
+        sources = feature_sources(col)
+        for source in sources:
+            matrix[j, positions[source]] += 1.0 / len(sources)
+    return fields, matrix
+
+
+def compute_contributions(model, input_data_fe, approximate: bool = False):
+    """
+    Args:
+        model: Pipeline (préprocesseur + XGBRegressor) ou LeanModel.
+        input_data_fe: Caractéristiques ingéniérées (sortie de FeatureEngineer.transform).
+        approximate (bool): Attribution de Saabas (approx_contribs) au lieu de TreeSHAP exact.
+    Returns:
+        tuple: (liste des champs d'entrée,
+                matrice (n_lignes, n_champs) des contributions en échelle du modèle (log1p du prix),
+                valeur de base de chaque ligne,
+                prédiction du modèle pour chaque ligne, identique à model.predict).
+    """
+    booster, iteration_range, missing = _booster(model)
+    if hasattr(model, 'named_steps'):
+        matrix = model[:-1].transform(input_data_fe)
+    else:
+        matrix = model.transform(input_data_fe)
+    columns = output_columns(model)
+    if len(columns) != booster.num_features():
+        raise RuntimeError(f"Le préprocesseur produit {booster.num_features()} colonnes mais {len(columns)} "
+                         "ont pu être rattachées à une caractéristique.")
+
+    dmatrix = xgb.DMatrix(matrix, missing=missing, feature_names=booster.feature_names,
+                          feature_types=booster.feature_types,
+                          enable_categorical=booster.feature_types is not None)
+    raw = booster.predict(dmatrix, pred_contribs=True, approx_contribs=approximate, iteration_range=iteration_range)
+    predictions = booster.predict(dmatrix, iteration_range=iteration_range)
+    fields, aggregation = aggregation_matrix(columns)
+    return fields, raw[:, :-1].astype(np.float64) @ aggregation, raw[:, -1].astype(np.float64), predictions
+
+
+def top_contributions(fields: list, contributions: np.ndarray, top_k=None) -> dict:
+    """
+    Contributions d'une ligne triées par valeur absolue décroissante, limitées aux top_k
+    premières. Retourne aussi la somme des contributions écartées ('other').
+    """
+    order = np.argsort(-np.abs(contributions), kind='stable')
+    kept = order if top_k is None else order[:top_k]
+    return {
+        'contributions': {fields[i]: float(contributions[i]) for i in kept},
+        'other': float(contributions[order[len(kept):]].sum()),
+    }
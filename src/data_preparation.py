@@ -12,8 +12,18 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import pandas as pd
 #import config # Maintenant, cet import devrait fonctionner
 from src import config
+from src.dataset_cache import DatasetCache
+from src.memory_optimization import frame_memory_mb, optimize_frame, read_csv_optimized
 
-def load_data(train_path=config.TRAIN_DATA_PATH, test_path=config.TEST_DATA_PATH, target_column=config.TARGET_COLUMN):
+def _read_dataset(path, use_cache, memory_optimized=False):
+    if use_cache:
+        return DatasetCache().load_raw(path, categorical_strings=memory_optimized)
+    if memory_optimized:
+        return read_csv_optimized(path, config.SCORING_CHUNK_SIZE, exclude=[config.TARGET_COLUMN])
+    return pd.read_csv(path)
+
+def load_data(train_path=config.TRAIN_DATA_PATH, test_path=config.TEST_DATA_PATH, target_column=config.TARGET_COLUMN,
+              use_cache=config.USE_DATA_CACHE, load_test=True, memory_optimized=config.MEMORY_OPTIMIZED):
     """
     Loads training and testing data from the specified paths.
 
@@ -21,14 +31,19 @@ def load_data(train_path=config.TRAIN_DATA_PATH, test_path=config.TEST_DATA_PATH
         train_path (str): Path to the training CSV file.
         test_path (str): Path to the testing CSV file.
         target_column (str): The name of the target column.
+        use_cache (bool): Read the memory-mapped columnar cache (data/cache) instead of
+                          re-parsing the CSV files; the cache is rebuilt when a CSV changes.
+        load_test (bool): If False, the test file is not read and X_test, y_test are None.
+        memory_optimized (bool): Downcast the feature columns losslessly and store addresses as
+                                 `category` (see src/memory_optimization.py). The target is left as is.
 
     Returns:
         tuple: X_train, y_train, X_test, y_test DataFrames.
                 y_test might be None if the test set doesn't contain the target.
     """
     try:
-        train_df = pd.read_csv(train_path)
-        test_df = pd.read_csv(test_path)
+        train_df = _read_dataset(train_path, use_cache, memory_optimized)
+        test_df = _read_dataset(test_path, use_cache, memory_optimized) if load_test else None
     except FileNotFoundError as e:
         raise FileNotFoundError(f"Error loading data: {e}. Make sure '{train_path}' and '{test_path}' exist.")
     except Exception as e:
@@ -37,17 +52,40 @@ def load_data(train_path=config.TRAIN_DATA_PATH, test_path=config.TEST_DATA_PATH
     if target_column not in train_df.columns:
         raise ValueError(f"Target column '{target_column}' not found in training data. Available columns: {train_df.columns.tolist()}")
 
-    X_train = train_df.drop(columns=[target_column])
-    y_train = train_df[target_column]
+    if memory_optimized:
+        optimize_frame(train_df, exclude=[target_column])
+        if test_df is not None:
+            optimize_frame(test_df, exclude=[target_column])
+
+    # pop retire la cible sur place : pas de copie complète du jeu comme avec drop
+    y_train = train_df.pop(target_column)
+    X_train = train_df
 
     # Assume test_df may or may not have the target column
-    X_test = test_df.drop(columns=[target_column]) if target_column in test_df.columns else test_df
-    y_test = test_df[target_column] if target_column in test_df.columns else None
+    X_test, y_test = test_df, None
+    if test_df is not None and target_column in test_df.columns:
+        y_test = test_df.pop(target_column)
+        X_test = test_df
 
     print(f"Loaded data:")
     print(f"   X_train shape: {X_train.shape}")
     print(f"   y_train shape: {y_train.shape}")
-    print(f"   X_test shape: {X_test.shape}")
+    print(f"   X_test shape: {X_test.shape if X_test is not None else 'N/A'}")
     print(f"   y_test shape: {y_test.shape if y_test is not None else 'N/A'}")
+    print(f"   X_train memory: {frame_memory_mb(X_train):.1f} MB")
+
+    return X_train, y_train, X_test, y_test
+
+def load_engineered_data(path=config.TRAIN_DATA_PATH, target_column=config.TARGET_COLUMN,
+                         memory_optimized=config.MEMORY_OPTIMIZED):
+    """
+    Returns the feature-engineered version of a CSV file, from the columnar cache.
+    It is rebuilt only when the CSV or src/fast_features.py changes.
+    """
+    return DatasetCache().load_engineered(path, target_column, categorical_strings=memory_optimized)
 
-    return X_train, y_train, X_test, y_test
\ No newline at end of file
+if __name__ == "__main__":
+    # Conversion préalable des CSV vers le cache colonnaire (versions brute et ingéniérée)
+    for path in (config.TRAIN_DATA_PATH, config.TEST_DATA_PATH):
+        load_engineered_data(path)
+        print(f"Cache colonnaire prêt pour {path}")
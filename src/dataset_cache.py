@@ -0,0 +1,197 @@
+# src/dataset_cache.py
+"""
+Cache colonnaire typé des jeux de données CSV.
+
+Chaque CSV est converti une fois en un répertoire de fichiers .npy (un par colonne),
+rechargés ensuite en mémoire mappée (np.load(mmap_mode='c')) au lieu de ré-analyser le
+CSV. Les colonnes texte sont stockées en chaînes de largeur fixe, avec un masque des
+valeurs manquantes. Deux versions sont gardées : les données brutes et les données
+après fast_feature_engineer_data.
+
+Le cache est invalidé par le hash SHA-256 du fichier source (et, pour la version
+ingéniérée, du code de src/fast_features.py). Le hash n'est recalculé que si la date
+de modification ou la taille du fichier source ont changé.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from src import config
+
+MANIFEST_FILE = 'manifest.json'
+FAST_FEATURES_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fast_features.py')
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_signature(path: str) -> dict:
+    st = os.stat(path)
+    return {'mtime_ns': st.st_mtime_ns, 'size': st.st_size}
+
+
+def _save_frame(df: pd.DataFrame, directory: str, source_path: str, sha256: str):
+    """
+    Writes one .npy file per column into a temporary directory, then renames it into place
+    so that a concurrent reader never sees a half-written cache.
+    """
+    tmp_dir = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    columns = []
+    for i, col in enumerate(df.columns):
+        values = df[col].to_numpy()
+        entry = {'name': col, 'file': f"{i}.npy", 'mask': None}
+        if values.dtype == object:
+            missing = pd.isna(values)
+            present = values[~missing]
+            if not all(isinstance(value, str) for value in present):
+                raise ValueError(f"La colonne {col} mélange plusieurs types et ne peut pas être mise en cache.")
+            if missing.any():
+                entry['mask'] = f"{i}.mask.npy"
+                np.save(os.path.join(tmp_dir, entry['mask']), missing)
+            values = np.where(missing, '', values).astype(str)
+        np.save(os.path.join(tmp_dir, entry['file']), values, allow_pickle=False)
+        columns.append(entry)
+
+    manifest = {'source_path': os.path.abspath(source_path), 'sha256': sha256,
+                'source': _source_signature(source_path), 'n_rows': len(df),
+                'index': np.asarray(df.index).tolist() if not isinstance(df.index, pd.RangeIndex) else None,
+                'columns': columns}
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_dir, directory)
+
+
+def _strings_to_categorical(values: np.ndarray, missing) -> pd.Categorical:
+    # Une catégorie par valeur distincte : pas d'objet str Python par ligne.
+    categories, codes = np.unique(values, return_inverse=True)
+    codes = codes.reshape(-1).astype(np.int32)
+    if missing is not None:
+        codes[missing] = -1
+    return pd.Categorical.from_codes(codes, categories.astype(object)).remove_unused_categories()
+
+
+def _load_frame(directory: str, categorical_strings: bool = False) -> pd.DataFrame:
+    with open(os.path.join(directory, MANIFEST_FILE), encoding='utf-8') as f:
+        manifest = json.load(f)
+    data = {}
+    for entry in manifest['columns']:
+        # Copie à l'écriture : les colonnes restent modifiables sans jamais toucher au fichier de cache.
+        values = np.asarray(np.load(os.path.join(directory, entry['file']), mmap_mode='c', allow_pickle=False))
+        if values.dtype.kind == 'U':
+            missing = np.load(os.path.join(directory, entry['mask'])) if entry['mask'] is not None else None
+            if categorical_strings:
+                values = _strings_to_categorical(values, missing)
+            else:
+                values = values.astype(object)
+                if missing is not None:
+                    values[missing] = np.nan
+        data[entry['name']] = values
+    return pd.DataFrame(data, index=manifest['index'], copy=False)
+
+
+class DatasetCache:
+    """
+    Cache colonnaire d'un répertoire (config.DATA_CACHE_DIR), indexé par fichier source.
+    """
+
+    def __init__(self, cache_dir: str = config.DATA_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def _source_dir(self, source_path: str) -> str:
+        name = os.path.splitext(os.path.basename(source_path))[0]
+        path_hash = hashlib.sha256(os.path.abspath(source_path).encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.cache_dir, f"{name}-{path_hash}")
+
+    def _current_sha256(self, source_path: str, raw_dir: str) -> str:
+        """
+        Returns the hash of the source file, reusing the one recorded in the cache when the
+        file's mtime and size are unchanged (hashing a large file takes seconds).
+        """
+        if os.path.exists(os.path.join(raw_dir, MANIFEST_FILE)):
+            manifest = self._manifest(raw_dir)
+            if manifest['source'] == _source_signature(source_path):
+                return manifest['sha256']
+        return file_sha256(source_path)
+
+    def _cached_sha256(self, directory: str):
+        if not os.path.exists(os.path.join(directory, MANIFEST_FILE)):
+            return None
+        return self._manifest(directory)['sha256']
+
+    def load_raw(self, source_path: str, categorical_strings: bool = False) -> pd.DataFrame:
+        """
+        Returns the CSV as a DataFrame, from the cache when it is up to date.
+        With categorical_strings, text columns are returned as `category` (memory-optimized mode).
+        """
+        raw_dir = os.path.join(self._source_dir(source_path), 'raw')
+        sha256 = self._current_sha256(source_path, raw_dir)
+        if self._cached_sha256(raw_dir) != sha256:
+            logging.info(f"Conversion de {source_path} vers le cache colonnaire {raw_dir}...")
+            df = pd.read_csv(source_path)
+            if not self._save_or_skip(df, raw_dir, source_path, sha256):
+                return df
+        elif _source_signature(source_path) != self._manifest(raw_dir)['source']:
+            # Fichier touché mais contenu identique : on met à jour la signature pour éviter de re-hasher.
+            self._update_signature(raw_dir, source_path)
+        return _load_frame(raw_dir, categorical_strings)
+
+    def load_engineered(self, source_path: str, target_column: str = config.TARGET_COLUMN,
+                        categorical_strings: bool = False) -> pd.DataFrame:
+        """
+        Returns fast_feature_engineer_data applied to the CSV (without its target column),
+        from the cache when neither the CSV nor src/fast_features.py changed.
+        """
+        from src.fast_features import fast_feature_engineer_data
+
+        sha256 = self._current_sha256(source_path, os.path.join(self._source_dir(source_path), 'raw'))
+        features_hash = file_sha256(FAST_FEATURES_SOURCE)[:12]
+        engineered_dir = os.path.join(self._source_dir(source_path), f"engineered-{features_hash}")
+        if self._cached_sha256(engineered_dir) != sha256:
+            logging.info(f"Mise en cache des caractéristiques ingéniérées de {source_path}...")
+            raw = self.load_raw(source_path)
+            engineered = fast_feature_engineer_data(raw.drop(columns=[target_column], errors='ignore'))
+            if not self._save_or_skip(engineered, engineered_dir, source_path, sha256):
+                return engineered
+        return _load_frame(engineered_dir, categorical_strings)
+
+    @staticmethod
+    def _save_or_skip(df: pd.DataFrame, directory: str, source_path: str, sha256: str) -> bool:
+        """
+        Writes the cache of df; a frame that cannot be cached (column mixing several types)
+        is returned uncached by the caller, as without the cache, instead of failing the load.
+        """
+        try:
+            _save_frame(df, directory, source_path, sha256)
+            return True
+        except ValueError as e:
+            shutil.rmtree(f"{directory}.tmp-{os.getpid()}", ignore_errors=True)
+            logging.warning(f"{source_path} n'est pas mis en cache ({e}) : données lues sans le cache.")
+            return False
+
+    def _manifest(self, directory: str) -> dict:
+        with open(os.path.join(directory, MANIFEST_FILE), encoding='utf-8') as f:
+            return json.load(f)
+
+    def _update_signature(self, directory: str, source_path: str):
+        manifest = self._manifest(directory)
+        manifest['source'] = _source_signature(source_path)
+        tmp_path = os.path.join(directory, f"{MANIFEST_FILE}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(directory, MANIFEST_FILE))
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
@@ -0,0 +1,437 @@
+# src/drift_monitoring.py
+"""
+Surveillance en continu de la dérive et de la qualité du trafic de prédiction.
+
+Chaque champ d'entrée surveillé (et le prix prédit) est résumé par une esquisse de taille fixe :
+- numérique : histogramme à bornes fixes (quantiles du jeu d'entraînement), plus un compartiment
+  pour les valeurs sous le minimum et un pour celles au-dessus du maximum d'entraînement ;
+- catégoriel : nombre d'occurrences des catégories les plus fréquentes à l'entraînement, plus un
+  compartiment pour les catégories inconnues.
+
+Les esquisses s'additionnent : chaque worker uvicorn écrit périodiquement une esquisse par heure
+dans config.DRIFT_SKETCH_DIR (<version>/<heure UTC>/<hôte>-<pid>-<jeton>.json). Celles des
+dernières heures (config.DRIFT_WINDOW_HOURS) sont fusionnées, puis comparées au profil de
+référence calculé à l'entraînement avec les mêmes bornes (PSI et statistique de Kolmogorov-Smirnov).
+Les heures plus anciennes que config.DRIFT_RETENTION_HOURS sont supprimées.
+
+Usage : python -m src.drift_monitoring [--data FICHIER.csv] [--output profil.json]
+construit le profil de référence d'un modèle entraîné avant ce module.
+"""
+import argparse
+import calendar
+import glob
+import json
+import logging
+import math
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from bisect import bisect_right
+
+import numpy as np
+
+from src import config
+
+PREDICTED_PRICE = 'predicted_price'
+PSI_EPSILON = 1e-4 # Proportion minimale d'un compartiment (évite log(0))
+HOUR_FORMAT = '%Y%m%dT%H' # Nom des répertoires des heures UTC
+
+
+class NumericSketch:
+    """
+    Histogramme à bornes fixes : counts[0] = valeurs < edges[0], counts[-1] = valeurs > edges[-1],
+    counts[i] = valeurs de [edges[i-1], edges[i]) (le dernier intervalle inclut edges[-1]).
+    """
+    kind = 'numeric'
+
+    def __init__(self, edges, counts=None, missing: int = 0):
+        self.edges = [float(edge) for edge in edges]
+        self._inner_edges = np.asarray(self.edges[1:-1])
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        self.missing = int(missing)
+
+    @classmethod
+    def from_values(cls, values, n_bins: int):
+        """
+        Bornes aux quantiles des valeurs d'entraînement (dédoublonnées pour les valeurs discrètes).
+        """
+        values = np.asarray(values, dtype=np.float64)
+        finite = values[np.isfinite(values)]
+        edges = np.unique(np.quantile(finite, np.linspace(0, 1, n_bins + 1))).tolist() if len(finite) else [0.0]
+        if len(edges) == 1: # Valeur constante : un seul intervalle [v, v]
+            edges = edges * 2
+        sketch = cls(edges)
+        sketch.update(values)
+        return sketch
+
+    def empty_like(self):
+        return type(self)(self.edges)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        missing = np.isnan(values)
+        values = values[~missing]
+        positions = np.searchsorted(self._inner_edges, values, side='right') + 1
+        positions[values < self.edges[0]] = 0
+        positions[values > self.edges[-1]] = len(self.edges)
+        self.counts += np.bincount(positions, minlength=len(self.counts))
+        self.missing += int(missing.sum())
+
+    def update_value(self, value):
+        """
+        Version scalaire de update (une maison par requête), sans allocation NumPy.
+        """
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            value = math.nan
+        if math.isnan(value):
+            self.missing += 1
+        elif value < self.edges[0]:
+            self.counts[0] += 1
+        elif value > self.edges[-1]:
+            self.counts[-1] += 1
+        else:
+            self.counts[bisect_right(self.edges, value, 1, len(self.edges) - 1)] += 1
+
+    def out_of_range(self) -> int:
+        return int(self.counts[0] + self.counts[-1])
+
+    def to_dict(self) -> dict:
+        return {'kind': self.kind, 'edges': self.edges, 'counts': self.counts.tolist(), 'missing': self.missing}
+
+
+class CategorySketch:
+    """
+    Occurrences des catégories du vocabulaire d'entraînement ; counts[-1] = catégories inconnues.
+    """
+    kind = 'categorical'
+
+    def __init__(self, categories, counts=None, missing: int = 0):
+        self.categories = [str(category) for category in categories]
+        self._positions = {category: i for i, category in enumerate(self.categories)}
+        self.counts = (np.zeros(len(self.categories) + 1, dtype=np.int64) if counts is None
+                       else np.asarray(counts, dtype=np.int64))
+        self.missing = int(missing)
+
+    @classmethod
+    def from_values(cls, values, max_categories: int):
+        """
+        Vocabulaire limité aux max_categories catégories les plus fréquentes (mémoire fixe).
+        """
+        values = np.asarray(values, dtype=object)
+        present = values[(values == values) & (values != None)].astype(str) # noqa: E711
+        uniques, counts = np.unique(present, return_counts=True)
+        order = np.argsort(-counts, kind='stable')[:max_categories]
+        sketch = cls(uniques[order].tolist())
+        sketch.update(values)
+        return sketch
+
+    def empty_like(self):
+        return type(self)(self.categories)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=object)
+        missing = (values != values) | (values == None) # noqa: E711 (comparaison élément par élément)
+        uniques, counts = np.unique(values[~missing].astype(str), return_counts=True)
+        unknown = len(self.categories)
+        for category, count in zip(uniques.tolist(), counts.tolist()):
+            self.counts[self._positions.get(category, unknown)] += count
+        self.missing += int(missing.sum())
+
+    def update_value(self, value):
+        if value is None or value != value:
+            self.missing += 1
+        else:
+            self.counts[self._positions.get(str(value), len(self.categories))] += 1
+
+    def out_of_range(self) -> int:
+        return int(self.counts[-1])
+
+    def to_dict(self) -> dict:
+        return {'kind': self.kind, 'categories': self.categories, 'counts': self.counts.tolist(), 'missing': self.missing}
+
+
+def _sketch_from_dict(data: dict):
+    if data['kind'] == CategorySketch.kind:
+        return CategorySketch(data['categories'], data['counts'], data['missing'])
+    return NumericSketch(data['edges'], data['counts'], data['missing'])
+
+
+def population_stability_index(expected_counts, actual_counts) -> float:
+    """
+    PSI = somme((a - e) * ln(a / e)) sur les proportions des compartiments.
+    Usage courant : < 0.1 stable, 0.1-0.25 dérive modérée, > 0.25 dérive importante.
+    """
+    expected = np.maximum(np.asarray(expected_counts, dtype=np.float64) / max(np.sum(expected_counts), 1), PSI_EPSILON)
+    actual = np.maximum(np.asarray(actual_counts, dtype=np.float64) / max(np.sum(actual_counts), 1), PSI_EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def binned_ks_statistic(expected_counts, actual_counts) -> float:
+    """
+    Écart maximal entre les fonctions de répartition, évalué aux bornes des compartiments
+    (minorant de la statistique KS exacte, calculable sans conserver les valeurs).
+    """
+    expected = np.cumsum(expected_counts) / max(np.sum(expected_counts), 1)
+    actual = np.cumsum(actual_counts) / max(np.sum(actual_counts), 1)
+    return float(np.max(np.abs(actual - expected)))
+
+
+class TrafficProfile:
+    """
+    Une esquisse par champ surveillé et pour le prix prédit. Taille fixe, fusionnable par addition.
+    """
+
+    def __init__(self, sketches: dict, n_houses: int = 0):
+        self.sketches = sketches
+        self.n_houses = n_houses
+
+    @classmethod
+    def from_training_data(cls, X, prices, numerical_features=None, categorical_features=None,
+                           n_bins: int = config.DRIFT_N_BINS, max_categories: int = config.DRIFT_MAX_CATEGORIES):
+        """
+        Profil de référence : distribution des champs bruts d'entraînement et des prix de vente,
+        qui servent de référence aux prix prédits.
+        """
+        numerical_features = config.DRIFT_NUMERICAL_FEATURES if numerical_features is None else numerical_features
+        categorical_features = config.DRIFT_CATEGORICAL_FEATURES if categorical_features is None else categorical_features
+        sketches = {col: NumericSketch.from_values(X[col], n_bins) for col in numerical_features if col in X}
+        sketches.update({col: CategorySketch.from_values(X[col], max_categories) for col in categorical_features if col in X})
+        sketches[PREDICTED_PRICE] = NumericSketch.from_values(prices, n_bins)
+        return cls(sketches, n_houses=len(prices))
+
+    def empty_like(self):
+        """
+        Profil vide avec les mêmes bornes et vocabulaires (pour le trafic comparé à ce profil).
+        """
+        return TrafficProfile({col: sketch.empty_like() for col, sketch in self.sketches.items()})
+
+    def update_record(self, record: dict, predicted_price=None):
+        for col, sketch in self.sketches.items():
+            if col == PREDICTED_PRICE:
+                if predicted_price is not None:
+                    sketch.update_value(predicted_price)
+            else:
+                sketch.update_value(record.get(col))
+        self.n_houses += 1
+
+    def update_columns(self, columns, predicted_prices=None):
+        """
+        Args:
+            columns: DataFrame ou dict {colonne: array} des maisons reçues.
+            predicted_prices: Prix prédits (NaN pour les maisons non évaluées), ou None.
+        """
+        n_rows = 0
+        for col, sketch in self.sketches.items():
+            if col == PREDICTED_PRICE:
+                if predicted_prices is not None:
+                    sketch.update(predicted_prices)
+            elif col in columns:
+                values = np.asarray(columns[col])
+                sketch.update(values)
+                n_rows = len(values)
+        self.n_houses += n_rows
+
+    def merge(self, other):
+        """
+        Ajoute les compteurs d'un autre profil construit sur les mêmes bornes.
+        """
+        for col, sketch in other.sketches.items():
+            mine = self.sketches.get(col)
+            if mine is None or len(mine.counts) != len(sketch.counts):
+                raise ValueError(f"Esquisses incompatibles pour '{col}' : profils construits sur des références différentes.")
+            mine.counts += sketch.counts
+            mine.missing += sketch.missing
+        self.n_houses += other.n_houses
+        return self
+
+    def compare(self, reference) -> dict:
+        """
+        Scores de dérive et de qualité de chaque champ par rapport au profil de référence.
+        """
+        features = {}
+        for col, sketch in self.sketches.items():
+            expected = reference.sketches[col]
+            n_values = int(sketch.counts.sum())
+            n_total = n_values + sketch.missing
+            features[col] = {
+                'kind': sketch.kind,
+                'count': n_values,
+                'missing_rate': sketch.missing / n_total if n_total else None,
+                # Valeurs hors de l'intervalle d'entraînement, ou catégories inconnues
+                'out_of_range_rate': sketch.out_of_range() / n_values if n_values else None,
+                'psi': population_stability_index(expected.counts, sketch.counts) if n_values else None,
+                'ks': (binned_ks_statistic(expected.counts, sketch.counts)
+                       if n_values and sketch.kind == NumericSketch.kind else None),
+            }
+        return {'n_houses': self.n_houses, 'features': features}
+
+    def to_dict(self) -> dict:
+        return {'n_houses': self.n_houses, 'sketches': {col: sketch.to_dict() for col, sketch in self.sketches.items()}}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls({col: _sketch_from_dict(sketch) for col, sketch in data['sketches'].items()}, data['n_houses'])
+
+
+def save_profile(profile: TrafficProfile, path: str):
+    # Écriture dans un fichier temporaire puis renommage : un lecteur ne voit jamais un profil à moitié écrit.
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(profile.to_dict(), f)
+    os.replace(tmp_path, path)
+
+
+def load_profile(path: str):
+    """
+    Profil sauvegardé à path, ou None s'il n'existe pas.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return TrafficProfile.from_dict(json.load(f))
+
+
+def _hour_of(timestamp: float) -> int:
+    return int(timestamp // 3600)
+
+
+def _hour_name(hour: int) -> str:
+    return time.strftime(HOUR_FORMAT, time.gmtime(hour * 3600))
+
+
+def _parse_hour(name: str):
+    try:
+        return _hour_of(calendar.timegm(time.strptime(name, HOUR_FORMAT)))
+    except ValueError:
+        return None
+
+
+def prune_sketches(sketch_dir: str = config.DRIFT_SKETCH_DIR,
+                   retention_hours: float = config.DRIFT_RETENTION_HOURS) -> int:
+    """
+    Supprime les heures d'esquisses (toutes versions) plus anciennes que retention_hours,
+    puis les répertoires de version devenus vides. Retourne le nombre d'heures supprimées.
+    """
+    oldest = _hour_of(time.time() - retention_hours * 3600)
+    removed = 0
+    for version_dir in glob.glob(os.path.join(sketch_dir, '*', '')):
+        for hour_dir in glob.glob(os.path.join(version_dir, '*', '')):
+            hour = _parse_hour(os.path.basename(os.path.dirname(hour_dir)))
+            if hour is not None and hour < oldest:
+                # Plusieurs workers peuvent élaguer en même temps
+                shutil.rmtree(hour_dir, ignore_errors=True)
+                removed += 1
+        try:
+            os.rmdir(version_dir)
+        except OSError: # Répertoire non vide
+            pass
+    return removed
+
+
+class DriftMonitor:
+    """
+    Profil du trafic d'un worker pour une version de modèle, comparé au profil de référence
+    de cette version. Thread-safe ; le trafic est compté par heure UTC et flush écrit les
+    esquisses horaires du worker dans sketch_dir pour que report puisse fusionner celles
+    de tous les workers sur une fenêtre récente.
+    """
+
+    def __init__(self, version: str, reference: TrafficProfile, sketch_dir: str = config.DRIFT_SKETCH_DIR,
+                 window_hours: float = config.DRIFT_WINDOW_HOURS,
+                 retention_hours: float = config.DRIFT_RETENTION_HOURS):
+        self.version = version
+        self.reference = reference
+        self.sketch_dir = sketch_dir
+        self.window_hours = window_hours
+        self.retention_hours = max(retention_hours, window_hours)
+        # Jeton propre à ce moniteur : un PID réutilisé (redémarrage, retour à une version) n'écrase
+        # jamais les esquisses d'un autre processus.
+        self._worker_name = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._hours = {} # heure -> profil de ce worker pour cette heure
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def _version_dir(self) -> str:
+        return os.path.join(self.sketch_dir, str(self.version).replace(os.sep, '_'))
+
+    def _worker_path(self, hour: int) -> str:
+        return os.path.join(self._version_dir(), _hour_name(hour), f"{self._worker_name}.json")
+
+    def _live(self) -> TrafficProfile:
+        # Appelé sous self._lock
+        hour = _hour_of(time.time())
+        profile = self._hours.get(hour)
+        if profile is None:
+            profile = self._hours[hour] = self.reference.empty_like()
+        self._dirty.add(hour)
+        return profile
+
+    def record(self, record: dict, predicted_price=None):
+        with self._lock:
+            self._live().update_record(record, predicted_price)
+
+    def record_batch(self, columns, predicted_prices=None):
+        with self._lock:
+            self._live().update_columns(columns, predicted_prices)
+
+    def flush(self):
+        """
+        Écrit les esquisses horaires de ce worker qui ont changé depuis la dernière écriture,
+        oublie les heures passées déjà écrites et supprime les heures hors rétention.
+        """
+        current = _hour_of(time.time())
+        with self._lock:
+            snapshots = {hour: TrafficProfile.from_dict(self._hours[hour].to_dict()) for hour in self._dirty}
+            self._dirty.clear()
+            # Une heure passée ne reçoit plus de trafic : son esquisse est écrite une dernière fois ci-dessous.
+            for hour in [hour for hour in self._hours if hour < current]:
+                del self._hours[hour]
+        for hour, snapshot in sorted(snapshots.items()):
+            path = self._worker_path(hour)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            save_profile(snapshot, path)
+        prune_sketches(self.sketch_dir, self.retention_hours)
+
+    def merged(self, window_hours: float = None) -> TrafficProfile:
+        """
+        Fusion des esquisses de tous les workers écrites pour cette version pendant les
+        window_hours dernières heures, arrondies à l'heure entière (heure en cours comprise).
+        """
+        self.flush()
+        window_hours = self.window_hours if window_hours is None else window_hours
+        oldest = _hour_of(time.time()) - max(1, math.ceil(window_hours)) + 1
+        merged = self.reference.empty_like()
+        for hour_dir in sorted(glob.glob(os.path.join(self._version_dir(), '*', ''))):
+            hour = _parse_hour(os.path.basename(os.path.dirname(hour_dir)))
+            if hour is None or hour < oldest:
+                continue
+            for path in sorted(glob.glob(os.path.join(hour_dir, '*.json'))):
+                try:
+                    merged.merge(load_profile(path))
+                except (OSError, ValueError, KeyError) as e:
+                    logging.warning(f"Esquisse de dérive ignorée ({path}) : {e}")
+        return merged
+
+    def report(self, window_hours: float = None) -> dict:
+        window_hours = self.window_hours if window_hours is None else window_hours
+        return {'model_version': self.version, 'window_hours': window_hours,
+                **self.merged(window_hours).compare(self.reference)}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Construit le profil de référence de la surveillance de dérive.")
+    parser.add_argument('--data', default=config.TRAIN_DATA_PATH, help="CSV d'entraînement (avec la colonne cible)")
+    parser.add_argument('--output', default=config.DRIFT_REFERENCE_PATH, help="Fichier JSON du profil de référence")
+    args = parser.parse_args()
+
+    import pandas as pd
+    data = pd.read_csv(args.data)
+    save_profile(TrafficProfile.from_training_data(data, data[config.TARGET_COLUMN]), args.output)
+    logging.info(f"Profil de référence sauvegardé dans {args.output}")
@@ -0,0 +1,296 @@
+# src/fast_features.py
+"""
+Version vectorisée (NumPy) de feature_engineer_data.
+
+Produit exactement les mêmes colonnes, valeurs et types que l'implémentation pandas de
+features_engineering.py, mais sans copie de DataFrame, sans accesseur .dt et sans
+.apply ligne par ligne. Accepte un DataFrame, un dict (une maison ou des colonnes),
+une liste de dicts ou un tableau NumPy structuré.
+
+Le cœur du calcul (compute_features) ne dépend que de NumPy ; pandas n'est importé
+que pour construire le DataFrame de sortie et pour les formats de date non ISO.
+"""
+import datetime
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+from src import config
+
+REFERENCE_DATE = np.datetime64('2014-05-01', 'D') # Même référence que extract_date_features
+CATEGORY_LIKE_COLUMNS = ['waterfront', 'view', 'condition', 'floors', 'bedrooms']
+
+# En dessous de ce nombre de lignes, les dates sont analysées une à une avec
+# datetime.fromisoformat, bien plus rapide que NumPy/pandas pour quelques valeurs.
+SMALL_BATCH_SIZE = 16
+
+def _wide(values: np.ndarray) -> np.ndarray:
+    """
+    Opérande élargi à 64 bits : les colonnes réduites par le mode mémoire (int16, float32...)
+    donnent ainsi les mêmes résultats que les colonnes int64/float64, sans dépassement.
+    """
+    if values.dtype.kind in 'iu' and values.dtype.itemsize < 8:
+        return values.astype(np.int64)
+    if values.dtype.kind == 'f' and values.dtype.itemsize < 8:
+        return values.astype(np.float64)
+    return values
+
+
+def _as_str_objects(values: np.ndarray) -> np.ndarray:
+    """
+    Équivalent de values.astype(str).astype(object), avec un seul objet str par valeur
+    distincte partagé par toutes les lignes (8 octets par ligne au lieu d'environ 60).
+    """
+    if len(values) <= SMALL_BATCH_SIZE or values.dtype == object:
+        return values.astype(str).astype(object)
+    uniques, inverse = np.unique(values, return_inverse=True)
+    return uniques.astype(str).astype(object)[inverse.reshape(-1)]
+
+
+class FeatureNode(NamedTuple):
+    """
+    Nœud du graphe des caractéristiques.
+    inputs: colonnes brutes ou autres nœuds passés (dans cet ordre) à compute.
+    requires: nœuds qui doivent être disponibles sans être lus (conditions héritées de
+              feature_engineer_data, ex. is_renovated n'existe qu'avec une date de vente).
+    """
+    inputs: tuple
+    compute: Callable
+    requires: tuple = ()
+
+
+def _year(dates: np.ndarray) -> np.ndarray:
+    return dates.astype('datetime64[Y]').astype(np.int64) + 1970
+
+
+def _renovation_age(sale_year: np.ndarray, yr_renovated: np.ndarray) -> np.ndarray:
+    renovation_age = sale_year - yr_renovated
+    return np.where(renovation_age > 0, renovation_age, 0).astype(renovation_age.dtype)
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    return _wide(numerator) / (_wide(denominator) + 1e-6)
+
+
+def _product(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    return _wide(left) * _wide(right)
+
+
+# Graphe déclaré des caractéristiques : chaque nœud liste ses entrées et n'est calculé que si
+# elles sont toutes disponibles (mêmes conditions que les étapes de feature_engineer_data).
+# '_sale_date' (dates analysées, lignes invalides retirées) est fourni par compute_features ;
+# les nœuds préfixés par '_' sont des intermédiaires partagés, calculés une seule fois et absents
+# de la sortie. L'ordre du dict est un ordre topologique et celui des colonnes de sortie.
+FEATURE_GRAPH = {
+    '_sale_year': FeatureNode(('_sale_date',), _year),
+    'days_since_ref': FeatureNode(('_sale_date',), lambda dates: (dates - REFERENCE_DATE).astype(np.int64)),
+    'sale_year': FeatureNode(('_sale_year',), _as_str_objects),
+    'sale_month': FeatureNode(('_sale_date',),
+                              lambda dates: _as_str_objects(dates.astype('datetime64[M]').astype(np.int64) % 12 + 1)),
+    # L'âge ne peut pas être négatif
+    'house_age': FeatureNode(('yr_built', '_sale_year'), lambda yr_built, sale_year: np.maximum(sale_year - yr_built, 0)),
+    'is_renovated': FeatureNode(('yr_renovated', 'yr_built'),
+                                lambda yr_renovated, yr_built: ((yr_renovated > yr_built) & (yr_renovated > 0)).astype(int),
+                                requires=('_sale_year',)),
+    'renovation_age': FeatureNode(('yr_renovated', '_sale_year'), lambda yr_renovated, sale_year: _renovation_age(sale_year, yr_renovated),
+                                  requires=('yr_built',)),
+    'sqft_ratio_living_lot': FeatureNode(('sqft_living', 'sqft_lot'), _ratio),
+    'building_total_sqft': FeatureNode(('sqft_above', 'sqft_basement'), lambda above, basement: _wide(above) + _wide(basement)),
+    'sqft_living_per_bedroom': FeatureNode(('sqft_living', 'bedrooms'), _ratio),
+    'sqft_living_per_bathroom': FeatureNode(('sqft_living', 'bathrooms'), _ratio),
+    **{f'{col}_cat': FeatureNode((col,), _as_str_objects) for col in CATEGORY_LIKE_COLUMNS},
+    'sqft_living_x_grade': FeatureNode(('sqft_living', 'grade'), _product),
+    'waterfront_x_sqft_living': FeatureNode(('waterfront', 'sqft_living'), _product),
+    'lat_x_long': FeatureNode(('lat', 'long'), _product),
+}
+
+
+def feature_sources(name: str) -> tuple:
+    """
+    Colonnes brutes lues (directement ou via des intermédiaires) par un nœud du graphe.
+    """
+    if name == '_sale_date':
+        return ('date',)
+    if name not in FEATURE_GRAPH:
+        return (name,)
+    return tuple(dict.fromkeys(source for node_input in FEATURE_GRAPH[name].inputs
+                               for source in feature_sources(node_input)))
+
+
+# Colonnes brutes dont dépend chaque caractéristique créée par compute_features. Les colonnes
+# absentes de ce dict sont des colonnes brutes conservées telles quelles. Sert à ramener les
+# contributions du modèle aux champs d'entrée (src/contributions.py).
+FEATURE_SOURCES = {name: feature_sources(name) for name in FEATURE_GRAPH if not name.startswith('_')}
+
+
+class FeaturePlan(NamedTuple):
+    """
+    Sous-graphe à évaluer pour produire un ensemble de colonnes (voir feature_plan).
+    """
+    nodes: tuple # Nœuds à calculer, dans l'ordre du graphe
+    outputs: tuple # Colonnes retournées (caractéristiques et colonnes brutes conservées)
+    columns: frozenset # Colonnes brutes lues
+
+
+def feature_plan(outputs) -> FeaturePlan:
+    """
+    Élague le graphe aux nœuds nécessaires pour produire outputs, par exemple les colonnes
+    consommées par le modèle ajusté (FeatureEngineer) : les autres ne sont jamais évalués.
+    """
+    outputs = tuple(dict.fromkeys(outputs))
+    needed, pending = set(), [col for col in outputs if col in FEATURE_GRAPH]
+    while pending:
+        name = pending.pop()
+        if name not in needed:
+            needed.add(name)
+            pending.extend(col for col in FEATURE_GRAPH[name].inputs + FEATURE_GRAPH[name].requires
+                           if col in FEATURE_GRAPH)
+    nodes = tuple(name for name in FEATURE_GRAPH if name in needed)
+    raw_columns = {'date'} # Toujours lue : les lignes dont la date est invalide sont retirées
+    raw_columns.update(col for col in outputs if col not in FEATURE_GRAPH)
+    for name in nodes:
+        raw_columns.update(col for col in FEATURE_GRAPH[name].inputs + FEATURE_GRAPH[name].requires
+                           if col not in FEATURE_GRAPH and col != '_sale_date')
+    return FeaturePlan(nodes, outputs, frozenset(raw_columns))
+
+
+def missing_inputs(columns) -> dict:
+    """
+    {caractéristique: colonnes brutes absentes} des caractéristiques du graphe non calculables
+    à partir de columns (ex. sqft_living_x_grade sans 'grade').
+    """
+    columns = set(columns)
+    missing = {}
+    for name in FEATURE_GRAPH:
+        node = FEATURE_GRAPH[name]
+        absent = [col for col in feature_sources(name) if col not in columns]
+        absent += [col for required in node.requires for col in feature_sources(required)
+                   if col not in columns and col not in absent]
+        if absent and not name.startswith('_'):
+            missing[name] = absent
+    return missing
+
+
+def _to_columns(data, only=None):
+    """
+    Normalise l'entrée en un dict ordonné {colonne: np.ndarray 1D}, limité aux colonnes
+    de only lorsqu'il est fourni. Retourne aussi l'index pandas d'origine (ou None).
+    """
+    def selected(keys):
+        return [key for key in keys if only is None or key in only]
+
+    if hasattr(data, 'columns') and hasattr(data, 'index'): # DataFrame pandas
+        return {col: data[col].to_numpy() for col in selected(data.columns)}, data.index
+    if isinstance(data, np.ndarray) and data.dtype.names is not None: # Tableau structuré
+        data = np.atleast_1d(data)
+        return {name: data[name] for name in selected(data.dtype.names)}, None
+    if isinstance(data, dict):
+        if all(np.ndim(value) == 0 for value in data.values()): # Une seule maison
+            return {key: np.array([data[key]]) for key in selected(data)}, None
+        return {key: np.asarray(data[key]) for key in selected(data)}, None
+    if isinstance(data, (list, tuple)): # Liste de maisons
+        keys = selected(dict.fromkeys(key for record in data for key in record))
+        return {key: np.array([record.get(key) for record in data]) for key in keys}, None
+    raise TypeError(f"Type d'entrée non supporté pour l'ingénierie des caractéristiques : {type(data).__name__}")
+
+
+def _parse_one_date(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return np.datetime64('NaT', 'D')
+    if isinstance(value, (datetime.date, np.datetime64)):
+        return np.datetime64(value, 'D')
+    try:
+        return np.datetime64(datetime.datetime.fromisoformat(str(value)).replace(tzinfo=None), 'D')
+    except ValueError:
+        pass
+    import pandas as pd # Formats non ISO : on délègue à pandas comme l'implémentation d'origine
+    parsed = pd.to_datetime(value, errors='coerce')
+    return np.datetime64('NaT', 'D') if parsed is pd.NaT else np.datetime64(parsed.to_pydatetime().replace(tzinfo=None), 'D')
+
+
+def parse_sale_dates(values) -> np.ndarray:
+    """
+    Convertit une colonne de dates en datetime64[D] ; les dates invalides deviennent NaT.
+    """
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[D]')
+    if len(values) > SMALL_BATCH_SIZE:
+        try:
+            return values.astype('datetime64[s]').astype('datetime64[D]')
+        except (ValueError, TypeError):
+            pass # Au moins une date non ISO ou invalide : analyse valeur par valeur
+    return np.array([_parse_one_date(value) for value in values], dtype='datetime64[D]')
+
+
+def compute_features(data, input_dtypes=None, keep_columns=(), plan=None):
+    """
+    Calcule les caractéristiques de feature_engineer_data de façon vectorisée, en évaluant
+    le graphe FEATURE_GRAPH.
+
+    Args:
+        data: DataFrame, dict (une maison ou des colonnes), liste de dicts ou tableau structuré.
+        input_dtypes (dict): Types des colonnes brutes vus à l'entraînement ({colonne: dtype}).
+                             Les entiers reçus pour une colonne flottante à l'entraînement sont
+                             convertis, afin que par exemple bedrooms=3 donne bien '3.0'.
+        keep_columns (iterable): Colonnes brutes conservées dans le résultat même si
+                                 feature_engineer_data les supprime (ex. city et statezip,
+                                 clés de l'index de voisinage).
+        plan (FeaturePlan): Sous-graphe élagué (feature_plan). Seuls ses nœuds sont évalués et
+                            seules ses colonnes de sortie disponibles sont retournées
+                            (keep_columns est alors ignoré). None : toutes les caractéristiques.
+
+    Returns:
+        tuple: (dict ordonné {colonne: np.ndarray} identique aux colonnes de feature_engineer_data,
+                masque booléen des lignes conservées (les dates invalides sont retirées),
+                index pandas d'origine ou None).
+    """
+    columns, index = _to_columns(data, None if plan is None else plan.columns)
+    for col, dtype in (input_dtypes or {}).items():
+        if col in columns and columns[col].dtype.kind in 'iub' and np.dtype(dtype).kind == 'f':
+            columns[col] = columns[col].astype(dtype)
+    n_rows = len(next(iter(columns.values()))) if columns else 0
+    keep = np.ones(n_rows, dtype=bool)
+
+    available = dict(columns)
+    if 'date' in columns:
+        dates = parse_sale_dates(columns['date'])
+        keep = ~np.isnat(dates)
+        if not keep.all():
+            dates = dates[keep]
+            columns = {col: values[keep] for col, values in columns.items()}
+            available = dict(columns)
+        if len(dates):
+            available['_sale_date'] = dates
+
+    new = {}
+    for name in (FEATURE_GRAPH if plan is None else plan.nodes):
+        node = FEATURE_GRAPH[name]
+        if all(col in available for col in node.inputs + node.requires):
+            available[name] = node.compute(*(available[col] for col in node.inputs))
+            if not name.startswith('_'):
+                new[name] = available[name]
+
+    if plan is not None:
+        return {col: available[col] for col in plan.outputs if col in available}, keep, index
+
+    # Même ordre et mêmes suppressions que feature_engineer_data
+    columns_to_drop = set(config.FEATURES_TO_DROP_AFTER_ENGINEERING) | {'date', 'id'}
+    columns_to_drop.update(col for col in CATEGORY_LIKE_COLUMNS if col in columns)
+    columns_to_drop.difference_update(keep_columns)
+    result = {col: values for col, values in columns.items() if col not in columns_to_drop}
+    result.update(new)
+    return result, keep, index
+
+
+def fast_feature_engineer_data(data, input_dtypes=None, keep_columns=()):
+    """
+    Équivalent vectorisé de feature_engineer_data retournant un DataFrame pandas.
+    L'index d'origine est conservé lorsque l'entrée est un DataFrame.
+    """
+    import pandas as pd
+
+    result, keep, index = compute_features(data, input_dtypes, keep_columns)
+    if index is not None:
+        index = index[keep]
+    return pd.DataFrame(result, index=index, copy=False)
@@ -3,6 +3,9 @@ import numpy as np
 import datetime
 
 from src import config as config
+from src.fast_features import compute_features, fast_feature_engineer_data, feature_plan, missing_inputs
+from src.native_categorical import NativeCategoricalPreprocessor
+from src.neighbourhood import NeighbourhoodIndex
 
 def extract_date_features(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -102,29 +105,20 @@ def handle_categorical_transformations(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def feature_engineer_data(df: pd.DataFrame) -> pd.DataFrame:
+def get_final_feature_lists(columns):
     """
-    Applique toutes les étapes d'ingénierie de caractéristiques au DataFrame pour XGBoost.
+    Détermine les listes finales de caractéristiques numériques et catégorielles
+    à partir des colonnes disponibles après ingénierie. Fonction pure : ne modifie pas config.
     """
-    df_engineered = df.copy()
-
-    # Appliquer les fonctions d'ingénierie de caractéristiques
-    df_engineered = extract_date_features(df_engineered)
-    df_engineered = create_house_age_and_renovation_features(df_engineered)
-    df_engineered = combine_area_features(df_engineered)
-    df_engineered = handle_categorical_transformations(df_engineered)
-    df_engineered = create_interaction_features(df_engineered)
-
-    # --- Mise à jour dynamique de la configuration pour les caractéristiques ---
-    current_numerical_features = config.INITIAL_NUMERICAL_FEATURES[:]
-    current_categorical_features = config.INITIAL_CATEGORICAL_FEATURES[:]
+    columns = set(columns)
 
     # Supprimer les caractéristiques numériques initiales qui sont maintenant transformées ou catégorielles
     features_to_remove_from_initial_num = ['date', 'yr_built', 'yr_renovated', 'sqft_living', 'sqft_lot', 'sqft_above', 'sqft_basement']
     for col in ['waterfront', 'view', 'condition', 'floors', 'bedrooms']:
         features_to_remove_from_initial_num.append(col)
 
-    current_numerical_features = [f for f in current_numerical_features if f not in features_to_remove_from_initial_num]
+    current_numerical_features = [f for f in config.INITIAL_NUMERICAL_FEATURES if f not in features_to_remove_from_initial_num]
+    current_categorical_features = config.INITIAL_CATEGORICAL_FEATURES[:]
 
     # Collecter TOUTES les nouvelles caractéristiques numériques ingéniérées
     new_engineered_numerical_features = [
@@ -133,7 +127,7 @@ def feature_engineer_data(df: pd.DataFrame) -> pd.DataFrame:
         'sqft_living_x_grade', 'waterfront_x_sqft_living', 'lat_x_long'
     ]
     for feat in new_engineered_numerical_features:
-        if feat in df_engineered.columns and feat not in current_numerical_features:
+        if feat in columns and feat not in current_numerical_features:
             current_numerical_features.append(feat)
 
     # Collecter TOUTES les nouvelles caractéristiques catégorielles ingéniérées
@@ -142,17 +136,34 @@ def feature_engineer_data(df: pd.DataFrame) -> pd.DataFrame:
         'sale_year', 'sale_month'
     ]
     for feat in new_engineered_categorical_features:
-        if feat in df_engineered.columns and feat not in current_categorical_features:
+        if feat in columns and feat not in current_categorical_features:
             current_categorical_features.append(feat)
 
-    # Listes finales pour le ColumnTransformer
-    config._final_numerical_features = [f for f in current_numerical_features if f in df_engineered.columns]
-    config._final_categorical_features = [f for f in current_categorical_features if f in df_engineered.columns]
+    final_numerical_features = [f for f in current_numerical_features if f in columns]
+    final_categorical_features = [f for f in current_categorical_features if f in columns]
+    return final_numerical_features, final_categorical_features
+
+
+def feature_engineer_data(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Applique toutes les étapes d'ingénierie de caractéristiques au DataFrame pour XGBoost.
+    """
+    df_engineered = df.copy()
+
+    # Appliquer les fonctions d'ingénierie de caractéristiques
+    df_engineered = extract_date_features(df_engineered)
+    df_engineered = create_house_age_and_renovation_features(df_engineered)
+    df_engineered = combine_area_features(df_engineered)
+    df_engineered = handle_categorical_transformations(df_engineered)
+    df_engineered = create_interaction_features(df_engineered)
+
+    # Listes finales pour le ColumnTransformer (calculées sans modifier config)
+    _, final_categorical_features = get_final_feature_lists(df_engineered.columns)
 
     # --- Supprimer les colonnes originales qui ne sont plus nécessaires ---
     columns_to_drop_now = config.FEATURES_TO_DROP_AFTER_ENGINEERING + ['date_datetime', 'date']
     for col in ['waterfront', 'view', 'condition', 'floors', 'bedrooms']:
-        if f'{col}_cat' in config._final_categorical_features and col in df_engineered.columns and col not in columns_to_drop_now:
+        if f'{col}_cat' in final_categorical_features and col in df_engineered.columns and col not in columns_to_drop_now:
             columns_to_drop_now.append(col)
     
     if 'id' in df_engineered.columns and 'id' not in columns_to_drop_now:
@@ -160,4 +171,214 @@ def feature_engineer_data(df: pd.DataFrame) -> pd.DataFrame:
 
     df_processed = df_engineered.drop(columns=columns_to_drop_now, errors='ignore')
 
-    return df_processed
\ No newline at end of file
+    return df_processed
+
+
+class FeatureEngineer:
+    """
+    Ingénierie des caractéristiques ajustée, dans le style d'un transformateur scikit-learn.
+
+    `fit` fige les listes de caractéristiques numériques/catégorielles et les types des
+    colonnes d'entrée ; `transform` est ensuite une fonction pure (aucun état global modifié),
+    utilisable en parallèle depuis plusieurs threads ou processus. L'objet est sauvegardé
+    à côté du modèle (config.FEATURE_ENGINEER_SAVE_PATH).
+
+    Lorsque les prix sont fournis au fit (et config.USE_NEIGHBOURHOOD_FEATURES), un index de
+    voisinage (src/neighbourhood.py) est construit sur les ventes d'entraînement et ajoute
+    ses caractéristiques numériques (encodage du prix par ville et code postal).
+
+    Le fit élague aussi le graphe des caractéristiques (fast_features.FEATURE_GRAPH) aux colonnes
+    consommées par le modèle : transform n'évalue que celles-ci.
+    """
+
+    neighbourhood_index_ = None # FeatureEngineer sauvegardés avant l'index de voisinage
+    feature_plan_ = None
+
+    def __init__(self):
+        self.numerical_features_ = None
+        self.categorical_features_ = None
+        self.input_dtypes_ = {}
+        self.dtypes_ = {}
+        self.neighbourhood_index_ = None
+        self.feature_plan_ = None
+
+    def __getstate__(self):
+        # Le plan n'est pas sérialisé : il est reconstruit au chargement à partir du graphe courant
+        return {key: value for key, value in self.__dict__.items() if key != 'feature_plan_'}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.numerical_features_ is not None:
+            self._build_feature_plan()
+
+    def _build_feature_plan(self):
+        required = [col for col in self.get_feature_names_out() if col not in NeighbourhoodIndex.feature_names]
+        self.feature_plan_ = feature_plan(required + list(self.passthrough_columns()))
+
+    @staticmethod
+    def _neighbourhood_training_data(X, y, X_fe):
+        """
+        Clés (city, statezip), prix et superficie des ventes conservées par l'ingénierie
+        (les lignes dont la date est invalide sont retirées de X_fe).
+        """
+        rows = X_fe.index if len(X_fe) != len(X) else slice(None)
+        keys = {col: X.loc[rows, col].to_numpy() for col in NeighbourhoodIndex.key_columns}
+        return keys, np.asarray(y.loc[rows] if hasattr(y, 'loc') else y), X_fe['sqft_living'].to_numpy()
+
+    def fit(self, X, y=None, engineered=None):
+        """
+        Args:
+            X: Raw features.
+            y: Sale prices (not log-transformed). Required for the neighbourhood index;
+               without them it is not built.
+            engineered (pd.DataFrame): fast_feature_engineer_data(X) when already available,
+                                       e.g. from the columnar dataset cache.
+        """
+        X_fe = engineered if engineered is not None else fast_feature_engineer_data(X)
+        for feature, absent in missing_inputs(X.columns).items():
+            print(f"Attention : Caractéristique '{feature}' non calculée (colonnes absentes : {', '.join(absent)}).")
+        neighbourhood_index = None
+        if y is not None and self.uses_neighbourhood(X.columns, X_fe.columns):
+            keys, price, sqft_living = self._neighbourhood_training_data(X, y, X_fe)
+            neighbourhood_index = NeighbourhoodIndex.fit(keys, price, sqft_living, config.NEIGHBOURHOOD_SMOOTHING,
+                                                         config.NEIGHBOURHOOD_MIN_SALES)
+        return self.fit_summary({col: X_fe[col].dtype.str for col in X_fe.columns},
+                                {col: X[col].dtype.str for col in X.columns if pd.api.types.is_numeric_dtype(X[col])},
+                                neighbourhood_index)
+
+    @staticmethod
+    def uses_neighbourhood(input_columns, engineered_columns) -> bool:
+        """
+        True si l'index de voisinage doit être construit pour ces colonnes (et que config l'active).
+        """
+        return (config.USE_NEIGHBOURHOOD_FEATURES and 'sqft_living' in engineered_columns
+                and all(col in input_columns for col in NeighbourhoodIndex.key_columns))
+
+    def fit_summary(self, engineered_dtypes: dict, input_dtypes: dict, neighbourhood_index=None):
+        """
+        Fige l'état du FeatureEngineer à partir d'un résumé des données d'entraînement plutôt
+        que des données elles-mêmes (utilisé par fit et par l'entraînement hors mémoire).
+        Args:
+            engineered_dtypes (dict): {colonne: dtype.str} des colonnes de fast_feature_engineer_data.
+            input_dtypes (dict): {colonne: dtype.str} des colonnes brutes numériques.
+            neighbourhood_index (NeighbourhoodIndex): Index de voisinage déjà ajusté, ou None.
+        """
+        self.numerical_features_, self.categorical_features_ = get_final_feature_lists(engineered_dtypes)
+        self.neighbourhood_index_ = neighbourhood_index
+        if neighbourhood_index is not None:
+            self.numerical_features_ = self.numerical_features_ + NeighbourhoodIndex.feature_names
+        self.dtypes_ = {col: engineered_dtypes.get(col, np.dtype(np.float64).str) for col in self.get_feature_names_out()}
+        self.input_dtypes_ = dict(input_dtypes)
+        self._build_feature_plan()
+        return self
+
+    def check_input_schema(self, X):
+        """
+        Vérifie une fois pour tout un lot les colonnes brutes lues par transform : colonne absente,
+        ou colonne numérique à l'entraînement sans aucune valeur numérique. Ces erreurs concernent
+        toutes les lignes ; ValueError est levée pour ne pas les rejouer ligne par ligne.
+        """
+        if self.feature_plan_ is None:
+            raise ValueError("Le FeatureEngineer doit être ajusté (fit) avant transform.")
+        missing = sorted(col for col in self.feature_plan_.columns if col not in X.columns)
+        if missing:
+            raise ValueError(f"Colonnes manquantes : {missing}")
+        for col in sorted(self.feature_plan_.columns):
+            dtype = self.input_dtypes_.get(col)
+            if dtype is None or np.dtype(dtype).kind not in 'iuf' or pd.api.types.is_numeric_dtype(X[col]):
+                continue
+            values = X[col]
+            if values.notna().any() and pd.to_numeric(values, errors='coerce').isna().all():
+                raise ValueError(f"{col} : type numérique attendu (reçu {values.dtype}).")
+
+    def passthrough_columns(self):
+        """
+        Colonnes brutes lues par transform bien que supprimées de la sortie (clés de l'index de voisinage).
+        """
+        return NeighbourhoodIndex.key_columns if self.neighbourhood_index_ is not None else []
+
+    def _output_frame(self, columns: dict, index) -> pd.DataFrame:
+        """
+        Construit la sortie à partir des colonnes calculées, sans copie ni consolidation.
+        En mode mémoire réduite (config.MEMORY_OPTIMIZED), les catégorielles sont en dtype `category`.
+        """
+        data = {col: columns[col] for col in self.get_feature_names_out()}
+        if config.MEMORY_OPTIMIZED:
+            for col in self.categorical_features_:
+                if not isinstance(data[col].dtype, pd.CategoricalDtype):
+                    data[col] = pd.Categorical(data[col])
+        return pd.DataFrame(data, index=index, copy=False)
+
+    def transform(self, X) -> pd.DataFrame:
+        """
+        Applique l'ingénierie des caractéristiques et retourne uniquement les colonnes figées au fit.
+        Accepte les mêmes entrées que fast_feature_engineer_data (DataFrame, dict, tableau structuré).
+        """
+        if self.numerical_features_ is None:
+            raise ValueError("Le FeatureEngineer doit être ajusté (fit) avant transform.")
+        columns, keep, index = compute_features(X, self.input_dtypes_, plan=self.feature_plan_)
+        if index is not None:
+            index = index[keep]
+        if self.neighbourhood_index_ is not None:
+            missing_keys = [col for col in NeighbourhoodIndex.key_columns if col not in columns]
+            if missing_keys:
+                raise ValueError(f"Colonnes manquantes pour l'index de voisinage : {missing_keys}")
+            columns.update(self.neighbourhood_index_.lookup(columns))
+        missing = [col for col in self.get_feature_names_out() if col not in columns]
+        if missing:
+            raise ValueError(f"Caractéristiques manquantes après ingénierie : {missing}")
+        return self._output_frame(columns, index)
+
+    def fit_transform(self, X, y=None, engineered=None) -> pd.DataFrame:
+        """
+        Fit puis transform des données d'entraînement. Les caractéristiques de voisinage de ces
+        ventes sont calculées hors-pli (config.NEIGHBOURHOOD_N_FOLDS) : le prix d'une vente
+        n'entre pas dans sa propre caractéristique, sans quoi le modèle surestimerait leur poids.
+        """
+        X_fe = engineered if engineered is not None else fast_feature_engineer_data(X)
+        self.fit(X, y, X_fe)
+        columns = {col: X_fe[col] for col in X_fe.columns}
+        if self.neighbourhood_index_ is not None:
+            keys, price, sqft_living = self._neighbourhood_training_data(X, y, X_fe)
+            columns.update(self.neighbourhood_index_.out_of_fold_features(
+                keys, price, sqft_living, config.NEIGHBOURHOOD_N_FOLDS, seed=42))
+        return self._output_frame(columns, X_fe.index)
+
+    def transform_out_of_fold(self, X, fold_indexes, folds, engineered=None) -> pd.DataFrame:
+        """
+        Transform des ventes d'entraînement lues par morceaux (src/out_of_core.py) : comme dans
+        fit_transform, leurs caractéristiques de voisinage viennent de l'index ajusté sans leur pli
+        (fold_indexes[folds[i]], voir NeighbourhoodIndex.fit_folds).
+        Args:
+            folds (np.ndarray): Pli de chaque ligne conservée par l'ingénierie (date valide).
+        """
+        X_fe = engineered if engineered is not None else fast_feature_engineer_data(X)
+        columns = {col: X_fe[col] for col in X_fe.columns}
+        if self.neighbourhood_index_ is not None:
+            rows = X_fe.index if len(X_fe) != len(X) else slice(None)
+            keys = {col: X.loc[rows, col].to_numpy() for col in NeighbourhoodIndex.key_columns}
+            columns.update(self.neighbourhood_index_.lookup_out_of_fold(fold_indexes, folds, keys))
+        return self._output_frame(columns, X_fe.index)
+
+    def get_feature_names_out(self):
+        return self.numerical_features_ + self.categorical_features_
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """
+        Reconstruit un FeatureEngineer à partir du ColumnTransformer d'un pipeline déjà entraîné,
+        pour les modèles sauvegardés avant que le FeatureEngineer ne soit sérialisé.
+        """
+        feature_engineer = cls()
+        preprocessor = pipeline.named_steps['preprocessor']
+        if isinstance(preprocessor, NativeCategoricalPreprocessor):
+            feature_engineer.numerical_features_ = list(preprocessor.numerical_features_)
+            feature_engineer.categorical_features_ = list(preprocessor.categorical_features_)
+        else:
+            transformers = dict((name, columns) for name, _, columns in preprocessor.transformers_)
+            feature_engineer.numerical_features_ = list(transformers.get('num_pipeline', []))
+            feature_engineer.categorical_features_ = list(transformers.get('cat_pipeline', []))
+        # Types d'entrée de l'entraînement : bedrooms=3 doit être converti comme bedrooms=3.0.
+        feature_engineer.input_dtypes_ = {col: np.dtype(np.float64).str for col in config.TRAINING_FLOAT_FEATURES}
+        feature_engineer._build_feature_plan()
+        return feature_engineer
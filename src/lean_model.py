@@ -0,0 +1,170 @@
+# src/lean_model.py
+"""
+Modèle d'inférence allégé : préprocesseur aplati en tableaux simples + booster XGBoost natif.
+
+Ce module ne dépend que de NumPy et XGBoost (ni scikit-learn, ni joblib, ni pandas),
+ce qui réduit le temps de démarrage et la mémoire de chaque worker uvicorn.
+L'artefact est produit par export_lean_model (src/model.py) après l'entraînement et
+donne des prédictions identiques au bit près à celles du Pipeline scikit-learn.
+"""
+import json
+import os
+
+import numpy as np
+import xgboost as xgb # type: ignore
+
+from src.fast_features import compute_features, feature_plan
+from src.neighbourhood import NeighbourhoodIndex
+
+LEAN_SPEC_FILE = 'preprocessor.json'
+LEAN_BOOSTER_FILE = 'booster.ubj'
+
+
+def _is_missing(values: np.ndarray) -> np.ndarray:
+    if values.dtype.kind == 'f':
+        return np.isnan(values)
+    if values.dtype == object:
+        return (values != values) | (values == None) # noqa: E711 (comparaison élément par élément)
+    return np.zeros(len(values), dtype=bool)
+
+
+class LeanModel:
+    """
+    Reproduit Pipeline(ColumnTransformer(imputer + scaler | imputer + one-hot), XGBRegressor).predict
+    avec des opérations NumPy sur les statistiques extraites du préprocesseur ajusté, ou, en mode
+    'native_categorical', Pipeline(NativeCategoricalPreprocessor, XGBRegressor) avec les codes
+    des catégories.
+    """
+
+    def __init__(self, booster, spec: dict):
+        self.booster = booster
+        self.spec = spec
+        self.mode = spec.get('mode', 'onehot')
+        self.numerical_features = spec['numerical_features']
+        self.categorical_features = spec['categorical_features']
+        self.input_dtypes = spec.get('input_dtypes', {})
+        self.iteration_range = tuple(spec['iteration_range'])
+        self.missing = np.nan if spec['missing'] is None else spec['missing']
+        self.neighbourhood_index = (NeighbourhoodIndex.from_dict(spec['neighbourhood'])
+                                    if spec.get('neighbourhood') else None)
+        # Graphe des caractéristiques élagué aux colonnes consommées par le modèle
+        required = [col for col in self.numerical_features + self.categorical_features
+                    if col not in NeighbourhoodIndex.feature_names]
+        if self.neighbourhood_index is not None:
+            required += NeighbourhoodIndex.key_columns
+        self.feature_plan = feature_plan(required)
+
+        # Vocabulaires triés pour un encodage vectorisé par searchsorted
+        self._vocabularies = []
+        for categories in spec['categories']:
+            categories = np.asarray(categories, dtype=str)
+            order = np.argsort(categories, kind='stable')
+            self._vocabularies.append((categories[order], order, len(categories)))
+
+        if self.mode == 'native_categorical':
+            self.n_output_features = len(self.numerical_features) + len(self.categorical_features)
+            return
+        self.num_fill = np.asarray(spec['num_fill'], dtype=np.float64)
+        self.num_mean = None if spec['num_mean'] is None else np.asarray(spec['num_mean'], dtype=np.float64)
+        self.num_scale = None if spec['num_scale'] is None else np.asarray(spec['num_scale'], dtype=np.float64)
+        self.cat_fill = spec['cat_fill']
+        self.n_output_features = len(self.numerical_features) + sum(size for _, _, size in self._vocabularies)
+
+    def transform(self, X) -> np.ndarray:
+        """
+        Applique le préprocesseur aplati à des caractéristiques déjà ingéniérées.
+        Args:
+            X: DataFrame or dict {column: array} containing the engineered features.
+        Returns:
+            np.ndarray: The dense float64 matrix given to the booster.
+        """
+        n_rows = len(X[self.numerical_features[0]] if self.numerical_features else X[self.categorical_features[0]])
+        if self.mode == 'native_categorical':
+            return self._transform_native(X, n_rows)
+        output = np.zeros((n_rows, self.n_output_features), dtype=np.float64)
+
+        for j, col in enumerate(self.numerical_features):
+            values = np.asarray(X[col], dtype=np.float64)
+            output[:, j] = np.where(np.isnan(values), self.num_fill[j], values)
+        n_num = len(self.numerical_features)
+        if self.num_mean is not None:
+            output[:, :n_num] -= self.num_mean
+        if self.num_scale is not None:
+            output[:, :n_num] /= self.num_scale
+
+        offset = n_num
+        rows = np.arange(n_rows)
+        for j, col in enumerate(self.categorical_features):
+            values = np.asarray(X[col], dtype=object)
+            values = np.where(_is_missing(values), self.cat_fill[j], values).astype(str)
+            sorted_categories, order, size = self._vocabularies[j]
+            positions = np.clip(np.searchsorted(sorted_categories, values), 0, size - 1)
+            known = sorted_categories[positions] == values # Catégories inconnues ignorées (handle_unknown='ignore')
+            output[rows[known], offset + order[positions[known]]] = 1.0
+            offset += size
+
+        if self.spec['sparse_output']:
+            # Une sortie creuse du ColumnTransformer ne stocke pas les zéros : XGBoost les voit comme manquants.
+            output[output == 0] = np.nan
+        return output
+
+    def _transform_native(self, X, n_rows: int) -> np.ndarray:
+        """
+        Mode catégories natives : colonnes numériques brutes, puis code de chaque catégorie
+        (son rang dans le vocabulaire du fit), NaN pour les valeurs manquantes ou inconnues.
+        """
+        output = np.full((n_rows, self.n_output_features), np.nan, dtype=np.float64)
+        for j, col in enumerate(self.numerical_features):
+            output[:, j] = np.asarray(X[col], dtype=np.float64)
+        offset = len(self.numerical_features)
+        for j, col in enumerate(self.categorical_features):
+            values = np.asarray(X[col], dtype=object)
+            present = ~_is_missing(values)
+            values = values[present].astype(str)
+            sorted_categories, order, size = self._vocabularies[j]
+            if size == 0:
+                continue
+            positions = np.clip(np.searchsorted(sorted_categories, values), 0, size - 1)
+            known = sorted_categories[positions] == values
+            codes = np.full(len(values), np.nan)
+            codes[known] = order[positions[known]]
+            output[present, offset + j] = codes
+        return output
+
+    def predict(self, X) -> np.ndarray:
+        """
+        Same contract as Pipeline.predict: takes engineered features, returns raw model outputs.
+        """
+        return self.predict_transformed(self.transform(X))
+
+    def predict_transformed(self, matrix: np.ndarray) -> np.ndarray:
+        """
+        Runs the booster on a matrix already produced by transform.
+        """
+        return self.booster.inplace_predict(matrix, iteration_range=self.iteration_range,
+                                            predict_type='value', missing=self.missing)
+
+    def predict_raw(self, data) -> np.ndarray:
+        """
+        Runs the vectorized feature engineering (and neighbourhood lookups) then predict, without pandas.
+        Rows with an invalid sale date are dropped, as in feature_engineer_data.
+        """
+        columns, _, _ = compute_features(data, self.input_dtypes, plan=self.feature_plan)
+        if self.neighbourhood_index is not None:
+            columns.update(self.neighbourhood_index.lookup(columns))
+        return self.predict(columns)
+
+
+def load_lean_model(model_dir: str) -> LeanModel:
+    """
+    Loads a lean model exported by export_lean_model.
+    Args:
+        model_dir (str): Directory containing preprocessor.json and booster.ubj.
+    Returns:
+        LeanModel: The loaded model.
+    """
+    with open(os.path.join(model_dir, LEAN_SPEC_FILE), encoding='utf-8') as f:
+        spec = json.load(f)
+    booster = xgb.Booster()
+    booster.load_model(os.path.join(model_dir, LEAN_BOOSTER_FILE))
+    return LeanModel(booster, spec)
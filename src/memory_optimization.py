@@ -0,0 +1,132 @@
+# src/memory_optimization.py
+"""
+Mode mémoire réduite (config.MEMORY_OPTIMIZED) pour l'entraînement et le scoring
+de fichiers de plusieurs millions de lignes.
+
+- Colonnes entières réduites au plus petit type qui contient leurs valeurs (int8/16/32).
+- Flottants réduits en float32 uniquement si la conversion est exacte. Les colonnes
+  converties en chaînes (bedrooms, floors...) gardent leur type pour que '3.0' reste '3.0'.
+- Adresses (street, city, statezip, country) en dtype `category` : un code par ligne
+  au lieu d'un objet str Python (~60 octets) par ligne.
+- Date de vente analysée une fois en datetime64 (8 octets) au lieu d'une chaîne par ligne.
+
+Toutes les conversions sont sans perte : les caractéristiques et les prédictions sont
+identiques au mode par défaut. L'ingénierie des caractéristiques (src/fast_features.py)
+élargit ses opérandes avant les calculs pour éviter tout dépassement sur les entiers réduits.
+"""
+import logging
+import sys
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from src.fast_features import CATEGORY_LIKE_COLUMNS, parse_sale_dates
+
+ADDRESS_COLUMNS = ['street', 'city', 'statezip', 'country']
+INTEGER_DTYPES = (np.int8, np.int16, np.int32)
+
+
+def downcast_numeric(values: np.ndarray, keep_float: bool = False) -> np.ndarray:
+    """
+    Returns values in the smallest dtype that holds them exactly (values itself if none).
+    """
+    if values.dtype.kind in 'iu' and len(values):
+        low, high = values.min(), values.max()
+        for dtype in INTEGER_DTYPES:
+            if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+                return values.astype(dtype) if np.dtype(dtype).itemsize < values.dtype.itemsize else values
+        return values
+    if values.dtype == np.float64 and not keep_float:
+        narrowed = values.astype(np.float32)
+        if np.array_equal(narrowed, values, equal_nan=True):
+            return narrowed
+    return values
+
+
+def optimize_frame(df: pd.DataFrame, exclude=()) -> pd.DataFrame:
+    """
+    Remplace en place chaque colonne de df par sa version réduite et retourne df.
+    Args:
+        df (pd.DataFrame): Données brutes (schéma de train.csv).
+        exclude (iterable): Colonnes laissées telles quelles (ex. la cible, dont on prend le log).
+    """
+    for col in df.columns:
+        if col in exclude:
+            continue
+        values = df[col]
+        if col == 'date' and not pd.api.types.is_datetime64_any_dtype(values):
+            df[col] = parse_sale_dates(values.to_numpy()).astype('datetime64[s]')
+        elif col in ADDRESS_COLUMNS and values.dtype == object:
+            df[col] = values.astype('category')
+        elif pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            narrowed = downcast_numeric(values.to_numpy(), keep_float=col in CATEGORY_LIKE_COLUMNS)
+            if narrowed.dtype != values.dtype:
+                df[col] = narrowed
+    return df
+
+
+def csv_dtypes() -> dict:
+    """
+    dtypes passés à read_csv en mode mémoire réduite : les adresses sont lues directement
+    en `category`, sans créer un objet str par ligne.
+    """
+    return {col: 'category' for col in ADDRESS_COLUMNS}
+
+
+def concat_optimized(frames) -> pd.DataFrame:
+    """
+    Concatène des morceaux réduits par optimize_frame colonne par colonne : les catégories
+    sont fusionnées (union_categoricals) au lieu de repasser en object, et chaque colonne
+    prend le plus petit type commun aux morceaux.
+    """
+    frames = list(frames)
+    data = {}
+    for col in frames[0].columns:
+        parts = [frame[col] for frame in frames]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            data[col] = union_categoricals(parts, ignore_order=True)
+        else:
+            data[col] = np.concatenate([part.to_numpy() for part in parts])
+    return pd.DataFrame(data, copy=False)
+
+
+def read_csv_optimized(path: str, chunk_size: int, exclude=()) -> pd.DataFrame:
+    """
+    Lit un CSV par morceaux réduits un à un : le pic de mémoire est celui du résultat réduit
+    plus un morceau, au lieu du CSV entier en types par défaut.
+    """
+    chunks = [optimize_frame(chunk, exclude=exclude)
+              for chunk in pd.read_csv(path, dtype=csv_dtypes(), chunksize=chunk_size)]
+    if not chunks: # Fichier sans ligne de données
+        return optimize_frame(pd.read_csv(path, dtype=csv_dtypes()), exclude=exclude)
+    return concat_optimized(chunks)
+
+
+def peak_memory_mb() -> float:
+    """
+    Pic de mémoire résidente (RSS) du processus depuis son démarrage, en Mo.
+    Sous Linux, VmHWM est préféré à ru_maxrss, qui hérite du pic du processus parent
+    au travers de fork/exec. Retourne NaN sur les plateformes sans module resource (Windows).
+    """
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    try:
+        import resource # POSIX uniquement : importé ici pour que le module reste importable ailleurs
+    except ImportError:
+        return float('nan')
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / (1024.0 * 1024.0) if sys.platform == 'darwin' else max_rss / 1024.0
+
+
+def frame_memory_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / (1024.0 * 1024.0)
+
+
+def log_peak_memory(stage: str):
+    logging.info(f"Pic de mémoire (RSS) après {stage} : {peak_memory_mb():.0f} Mo")
@@ -0,0 +1,151 @@
+# src/metrics.py
+"""
+Métriques de performance au format texte Prometheus, sans dépendance externe.
+
+Compteurs, jauges et histogrammes thread-safe, agrégés par processus (chaque worker
+uvicorn expose les siens sur /metrics). Les étapes du chemin de prédiction sont
+chronométrées avec `timed_stage('nom')`.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536)
+
+
+def _format_labels(labelnames, labelvalues, extra=None) -> str:
+    pairs = list(zip(labelnames, labelvalues)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _header(self, name: str = None):
+        name = name or self.name
+        return [f"# HELP {name} {self.documentation}", f"# TYPE {name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def inc(self, amount: float = 1, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        # Les lignes HELP et TYPE portent le nom des échantillons, suffixe _total compris.
+        lines = self._header(f"{self.name}_total")
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f"{self.name}_total{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    type_name = 'gauge'
+
+    def set(self, value: float, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                state = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            for labelvalues, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.labelnames, labelvalues, ('le', _format_value(float(bound))))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, labelvalues)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return '\n'.join(line for metric in self._metrics for line in metric.render()) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.register(Counter(
+    'house_price_http_requests', "Nombre de requêtes HTTP traitées.", ('path', 'status')))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'house_price_http_request_duration_seconds', "Durée totale des requêtes HTTP.", ('path',)))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'house_price_stage_duration_seconds',
+    "Durée de chaque étape du chemin de prédiction (request_parsing, dataframe_construction, "
+    "feature_engineering, preprocessing, booster_predict).", ('stage',)))
+BATCH_SIZE = REGISTRY.register(Histogram(
+    'house_price_model_batch_size', "Nombre de maisons par appel au modèle.", buckets=BATCH_SIZE_BUCKETS))
+MODEL_LOAD_SECONDS = REGISTRY.register(Gauge(
+    'house_price_model_load_seconds', "Durée du dernier chargement du modèle."))
+SHADOW_RELATIVE_DIFF = REGISTRY.register(Histogram(
+    'house_price_shadow_relative_difference', "Écart relatif |ombre - servi| / servi des prix prédits.",
+    buckets=(0.001, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)))
+SHADOW_ERRORS = REGISTRY.register(Counter(
+    'house_price_shadow_errors', "Prédictions en échec du modèle évalué en ombre."))
+CACHE_STATS = REGISTRY.register(Gauge(
+    'house_price_prediction_cache', "Statistiques du cache de prédictions.", ('stat',)))
+
+
+@contextmanager
+def timed_stage(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage)
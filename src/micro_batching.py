@@ -0,0 +1,115 @@
+# src/micro_batching.py
+import asyncio
+import logging
+
+import pandas as pd
+
+from src.metrics import timed_stage
+
+_STOP = object() # Marqueur d'arrêt : les maisons déposées avant lui sont encore prédites
+
+
+class MicroBatcher:
+    """
+    Regroupe les prédictions unitaires concurrentes en un seul appel au modèle.
+
+    Les requêtes soumises via `submit` sont accumulées pendant au plus `max_wait_ms`
+    millisecondes (ou jusqu'à `max_batch_size` maisons), puis prédites ensemble dans
+    un thread séparé pour ne pas bloquer la boucle d'événements. Chaque appelant
+    récupère uniquement sa propre prédiction (ou sa propre erreur).
+    """
+
+    def __init__(self, predict_batch_fn, max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        """
+        Args:
+            predict_batch_fn (callable): Function taking a DataFrame and returning
+                                         (predictions, errors) like make_batch_prediction.
+            max_batch_size (int): Maximum number of houses predicted together.
+            max_wait_ms (float): Maximum time the first request of a batch waits for others.
+        """
+        if max_batch_size <= 0:
+            raise ValueError(f"max_batch_size doit être strictement positif (reçu : {max_batch_size}).")
+        self.predict_batch_fn = predict_batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = None
+        self._worker = None
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+        logging.info(f"Micro-batching démarré (taille max : {self.max_batch_size}, attente max : {self.max_wait * 1000:.1f} ms).")
+
+    async def stop(self):
+        """
+        Stops accepting houses, then drains the queue: every house submitted before the call
+        is still predicted (or receives its error) before the worker exits.
+        """
+        if self._worker is None:
+            return
+        worker, self._worker = self._worker, None
+        self._queue.put_nowait(_STOP)
+        await worker
+
+    async def submit(self, features: dict) -> float:
+        """
+        Queues one house for prediction and waits for its price.
+        Raises ValueError if this particular house could not be scored.
+        """
+        if self._worker is None:
+            raise RuntimeError("Le micro-batching n'a pas été démarré.")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((features, future))
+        return await future
+
+    async def _collect_batch(self):
+        """
+        Returns (batch, stopping): stopping is True once the stop marker has been dequeued.
+        """
+        loop = asyncio.get_running_loop()
+        item = await self._queue.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._collect_batch()
+            # Les appelants déconnectés entre-temps n'ont plus besoin de prédiction.
+            batch = [(features, future) for features, future in batch if not future.done()]
+            if batch:
+                await self._predict(batch)
+
+    async def _predict(self, batch):
+        with timed_stage('dataframe_construction'):
+            input_df = pd.DataFrame([features for features, _ in batch])
+        try:
+            predictions, errors = await asyncio.get_running_loop().run_in_executor(None, self.predict_batch_fn, input_df)
+        except Exception as e:
+            logging.error(f"Échec de la prédiction d'un micro-lot de {len(batch)} maisons : {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for i, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if i in errors:
+                future.set_exception(ValueError(errors[i]))
+            else:
+                future.set_result(float(predictions[i]))
@@ -8,11 +8,23 @@ from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.impute import SimpleImputer
 from sklearn.compose import ColumnTransformer
 import joblib
+import json
 import logging
+import argparse
+import datetime
+
+from sklearn.base import clone
 
 from src import config
-from src.data_preparation import load_data
-from src.features_engineering import feature_engineer_data
+from src.data_preparation import load_data, load_engineered_data
+from src.drift_monitoring import TrafficProfile, save_profile
+from src.dataset_cache import file_sha256
+from src.features_engineering import FeatureEngineer
+from src.lean_model import LEAN_SPEC_FILE, LEAN_BOOSTER_FILE
+from src.native_categorical import NativeCategoricalPreprocessor
+from src.model_registry import ModelRegistry
+from src.memory_optimization import log_peak_memory
+from src.tuning import load_best_params
 
 # Setup logging
 if not os.path.exists(os.path.dirname(config.APP_LOG_FILE)):
@@ -21,9 +33,11 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
                     handlers=[logging.FileHandler(config.APP_LOG_FILE), logging.StreamHandler()])
 
 
-def get_preprocessor(numerical_features, categorical_features):
+def get_preprocessor(numerical_features, categorical_features, categories=None):
     """
     Définit et retourne le pipeline de prétraitement utilisant ColumnTransformer.
+    categories : vocabulaires one-hot imposés (une liste par colonne catégorielle) au lieu
+    de ceux vus au fit, par exemple collectés sur tout un fichier lu par morceaux.
     """
     numerical_transformers = Pipeline(steps=[
         ('imputer', SimpleImputer(strategy=config.NUM_IMPUTER_STRATEGY)),
@@ -32,7 +46,7 @@ def get_preprocessor(numerical_features, categorical_features):
 
     categorical_transformers = Pipeline(steps=[
         ('imputer', SimpleImputer(strategy=config.CAT_IMPUTER_STRATEGY)),
-        ('encoder', OneHotEncoder(handle_unknown='ignore'))
+        ('encoder', OneHotEncoder(handle_unknown='ignore', categories=categories if categories is not None else 'auto'))
     ])
 
     preprocessor = ColumnTransformer(
@@ -44,12 +58,152 @@ def get_preprocessor(numerical_features, categorical_features):
     )
     return preprocessor
 
-def train_and_save_model(model_path=config.MODEL_SAVE_PATH):
+# Hyperparamètres par défaut, remplacés par ceux de config.BEST_PARAMS_PATH après une recherche (src/tuning.py)
+DEFAULT_XGB_PARAMS = {
+    'n_estimators': 500,
+    'learning_rate': 0.05,
+    'max_depth': 5,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+}
+
+def build_model_pipeline(numerical_features, categorical_features, xgb_params=None, mode=None, categories=None):
+    """
+    Construit le pipeline complet (préprocesseur + XGBoost) non entraîné.
+    Sans xgb_params, utilise la meilleure configuration trouvée par src/tuning.py si elle
+    existe, sinon DEFAULT_XGB_PARAMS.
+
+    mode (défaut : config.MODEL_MODE) :
+    - 'onehot' : imputation + StandardScaler | imputation + OneHotEncoder (chemin de référence) ;
+    - 'native_categorical' : colonnes numériques brutes et codes des catégories,
+      déclarées catégorielles à XGBoost (tree_method='hist', enable_categorical=True).
+
+    categories : vocabulaires imposés aux colonnes catégorielles (voir get_preprocessor).
+    """
+    mode = mode or config.MODEL_MODE
+    if xgb_params is None:
+        xgb_params = load_best_params()
+        if xgb_params is not None:
+            logging.info(f"Hyperparamètres chargés depuis {config.BEST_PARAMS_PATH} : {xgb_params}")
+    params = {**DEFAULT_XGB_PARAMS, **(xgb_params or {})}
+
+    if mode == 'native_categorical':
+        preprocessor = NativeCategoricalPreprocessor(numerical_features, categorical_features, categories)
+        params.update(tree_method='hist', enable_categorical=True,
+                      feature_types=['q'] * len(numerical_features) + ['c'] * len(categorical_features))
+    elif mode == 'onehot':
+        preprocessor = get_preprocessor(numerical_features, categorical_features, categories)
+    else:
+        raise ValueError(f"Mode de modèle inconnu : {mode} (attendu : 'onehot' ou 'native_categorical').")
+
+    return Pipeline(steps=[
+        ('preprocessor', preprocessor),
+        ('regressor', xgb.XGBRegressor(objective='reg:squarederror',
+                                       random_state=42,
+                                       n_jobs=-1,
+                                       **params))
+    ])
+
+def pipeline_mode(model_pipeline) -> str:
+    """Mode du pipeline ajusté ('onehot' ou 'native_categorical'), déduit de son préprocesseur."""
+    preprocessor = model_pipeline.named_steps['preprocessor']
+    return 'native_categorical' if isinstance(preprocessor, NativeCategoricalPreprocessor) else 'onehot'
+
+def export_lean_model(model_pipeline, feature_engineer=None, output_dir=config.LEAN_MODEL_DIR):
+    """
+    Aplatit le préprocesseur du pipeline en tableaux simples (moyennes d'imputation,
+    moyenne/écart-type du scaler, vocabulaires one-hot) et sauvegarde le booster au
+    format natif XGBoost (UBJ). Le résultat se charge avec load_lean_model (NumPy + XGBoost).
+    En mode 'native_categorical', seuls les vocabulaires des colonnes catégorielles sont exportés.
+    """
+    preprocessor = model_pipeline.named_steps['preprocessor']
+    regressor = model_pipeline.named_steps['regressor']
+    if feature_engineer is None:
+        feature_engineer = FeatureEngineer.from_pipeline(model_pipeline)
+    try:
+        iteration_range = [0, int(regressor.best_iteration) + 1]
+    except AttributeError: # Pas d'arrêt précoce : toutes les itérations sont utilisées
+        iteration_range = [0, 0]
+    missing = None if np.isnan(regressor.missing) else regressor.missing
+
+    if isinstance(preprocessor, NativeCategoricalPreprocessor):
+        spec = {
+            'mode': 'native_categorical',
+            'numerical_features': preprocessor.numerical_features_,
+            'categorical_features': preprocessor.categorical_features_,
+            'categories': preprocessor.categories_,
+            'iteration_range': iteration_range,
+            'missing': missing,
+            'input_dtypes': feature_engineer.input_dtypes_,
+            'neighbourhood': _neighbourhood_spec(feature_engineer),
+        }
+        _write_lean_model(spec, regressor, output_dir)
+        return
+
+    columns = dict((name, list(cols)) for name, _, cols in preprocessor.transformers_)
+    num_imputer = preprocessor.named_transformers_['num_pipeline'].named_steps['imputer']
+    scaler = preprocessor.named_transformers_['num_pipeline'].named_steps['scaler']
+    cat_imputer = preprocessor.named_transformers_['cat_pipeline'].named_steps['imputer']
+    encoder = preprocessor.named_transformers_['cat_pipeline'].named_steps['encoder']
+
+    if encoder.drop is not None or getattr(encoder, 'min_frequency', None) is not None or getattr(encoder, 'max_categories', None) is not None:
+        raise ValueError("L'export allégé ne supporte que OneHotEncoder sans drop ni catégories peu fréquentes.")
+    if len(num_imputer.statistics_) != len(columns['num_pipeline']):
+        raise ValueError("L'export allégé ne supporte pas les colonnes numériques entièrement vides à l'entraînement.")
+
+    spec = {
+        'mode': 'onehot',
+        'numerical_features': columns['num_pipeline'],
+        'num_fill': num_imputer.statistics_.tolist(),
+        'num_mean': scaler.mean_.tolist() if scaler.with_mean else None,
+        'num_scale': scaler.scale_.tolist() if scaler.with_std else None,
+        'categorical_features': columns['cat_pipeline'],
+        'cat_fill': [str(value) for value in cat_imputer.statistics_],
+        'categories': [[str(value) for value in categories] for categories in encoder.categories_],
+        'sparse_output': bool(preprocessor.sparse_output_),
+        'iteration_range': iteration_range,
+        'missing': missing,
+        'input_dtypes': feature_engineer.input_dtypes_,
+        'neighbourhood': _neighbourhood_spec(feature_engineer),
+    }
+    _write_lean_model(spec, regressor, output_dir)
+
+def _export_lean_model_or_skip(model_pipeline, feature_engineer, output_dir) -> bool:
+    """
+    Exporte le modèle allégé ; si le pipeline ne s'y prête pas, journalise un avertissement et
+    retire l'export précédent, qui ne correspond plus au modèle sauvegardé. Retourne True si exporté.
+    """
+    try:
+        export_lean_model(model_pipeline, feature_engineer, output_dir)
+        return True
+    except ValueError as e:
+        logging.warning(f"Export du modèle allégé ignoré : {e}")
+    for name in (LEAN_SPEC_FILE, LEAN_BOOSTER_FILE):
+        path = os.path.join(output_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+    return False
+
+def _neighbourhood_spec(feature_engineer):
+    index = getattr(feature_engineer, 'neighbourhood_index_', None)
+    return index.to_dict() if index is not None else None
+
+def _write_lean_model(spec, regressor, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, LEAN_SPEC_FILE), 'w', encoding='utf-8') as f:
+        json.dump(spec, f, indent=2)
+    regressor.get_booster().save_model(os.path.join(output_dir, LEAN_BOOSTER_FILE))
+    logging.info(f"Modèle allégé exporté dans {output_dir}")
+
+def train_and_save_model(model_path=config.MODEL_SAVE_PATH, feature_engineer_path=config.FEATURE_ENGINEER_SAVE_PATH,
+                         lean_model_dir=config.LEAN_MODEL_DIR, lineage_path=config.MODEL_LINEAGE_PATH,
+                         registry_dir=config.MODEL_REGISTRY_DIR, reference_profile_path=config.DRIFT_REFERENCE_PATH):
     logging.info("--- Démarrage de l'entraînement du modèle ---")
     logging.info("Chargement des données...")
     X_train_raw, y_train, X_test_raw, y_test = load_data()
     logging.info(f"Forme de X_train_raw : {X_train_raw.shape}, y_train : {y_train.shape}")
     logging.info(f"Forme de X_test_raw : {X_test_raw.shape}, y_test : {y_test.shape}")
+    log_peak_memory("le chargement des données")
 
 
     # --- Application de la transformation logarithmique à la variable cible ---
@@ -58,35 +212,31 @@ def train_and_save_model(model_path=config.MODEL_SAVE_PATH):
     y_test_transformed = np.log1p(y_test)
 
     logging.info("Application de l'ingénierie des caractéristiques aux données d'entraînement...")
-    X_train_fe = feature_engineer_data(X_train_raw)
+    feature_engineer = FeatureEngineer()
+    if config.USE_DATA_CACHE:
+        # Caractéristiques déjà calculées et mises en cache avec les données brutes
+        X_train_engineered = load_engineered_data(config.TRAIN_DATA_PATH)
+        X_train_fe = feature_engineer.fit_transform(X_train_raw, y_train, engineered=X_train_engineered)
+    else:
+        X_train_fe = feature_engineer.fit_transform(X_train_raw, y_train)
     logging.info(f"Forme de X_train_fe après ingénierie (avant préprocesseur) : {X_train_fe.shape}")
+    log_peak_memory("l'ingénierie des caractéristiques")
 
-    final_numerical_features = config._final_numerical_features
-    final_categorical_features = config._final_categorical_features
+    final_numerical_features = feature_engineer.numerical_features_
+    final_categorical_features = feature_engineer.categorical_features_
 
     logging.info(f"Caractéristiques Numériques Finales pour le Préprocesseur ({len(final_numerical_features)}): {final_numerical_features}")
     logging.info(f"Caractéristiques Catégorielles Finales pour le Préprocesseur ({len(final_categorical_features)}): {final_categorical_features}")
 
-    preprocessor = get_preprocessor(final_numerical_features, final_categorical_features)
-
-    model_pipeline = Pipeline(steps=[
-        ('preprocessor', preprocessor),
-        ('regressor', xgb.XGBRegressor(objective='reg:squarederror',
-                                       n_estimators=500,
-                                       learning_rate=0.05,
-                                       max_depth=5,
-                                       subsample=0.8,
-                                       colsample_bytree=0.8,
-                                       random_state=42,
-                                       n_jobs=-1))
-    ])
+    model_pipeline = build_model_pipeline(final_numerical_features, final_categorical_features)
 
     logging.info("Entraînement du modèle XGBoost sur la cible transformée...")
     model_pipeline.fit(X_train_fe, y_train_transformed)
     logging.info("Entraînement du modèle XGBoost terminé.")
+    log_peak_memory("l'entraînement")
 
     logging.info("\nApplication de l'ingénierie des caractéristiques aux données de test...")
-    X_test_fe = feature_engineer_data(X_test_raw)
+    X_test_fe = feature_engineer.transform(X_test_raw)
     logging.info(f"Forme de X_test_fe après ingénierie (avant préprocesseur) : {X_test_fe.shape}")
 
     logging.info("\nPrédiction sur l'ensemble de test...")
@@ -96,23 +246,203 @@ def train_and_save_model(model_path=config.MODEL_SAVE_PATH):
     y_pred = np.expm1(y_pred_transformed)
 
     logging.info("\nÉvaluation du modèle sur l'ensemble de test (avec les prix réels)...")
+    metrics = None
     if y_test is not None:
-        mae = mean_absolute_error(y_test, y_pred)
-        mse = mean_squared_error(y_test, y_pred)
-        rmse = np.sqrt(mse)
-        r2 = r2_score(y_test, y_pred)
-
-        logging.info(f"Erreur Absolue Moyenne (MAE) : {mae:.2f}")
-        logging.info(f"Erreur Quadratique Moyenne (MSE) : {mse:.2f}")
-        logging.info(f"Racine Carrée de l'Erreur Quadratique Moyenne (RMSE) : {rmse:.2f}")
-        logging.info(f"R-carré (R2) : {r2:.2f}")
+        metrics = regression_metrics(y_test, y_pred)
+
+        logging.info(f"Erreur Absolue Moyenne (MAE) : {metrics['mae']:.2f}")
+        logging.info(f"Erreur Quadratique Moyenne (MSE) : {metrics['mse']:.2f}")
+        logging.info(f"Racine Carrée de l'Erreur Quadratique Moyenne (RMSE) : {metrics['rmse']:.2f}")
+        logging.info(f"R-carré (R2) : {metrics['r2']:.2f}")
     else:
         logging.warning("y_test non disponible pour l'évaluation.")
 
+    reference_profile = TrafficProfile.from_training_data(X_train_raw, y_train)
+    save_trained_model(model_pipeline, feature_engineer, metrics, 'full', config.TRAIN_DATA_PATH, len(X_train_raw),
+                       model_path, feature_engineer_path, lean_model_dir, lineage_path, registry_dir,
+                       reference_profile, reference_profile_path)
+    logging.info("--- Entraînement du modèle terminé ---")
+
+def save_trained_model(model_pipeline, feature_engineer, metrics, kind, training_path, n_training_rows, model_path,
+                       feature_engineer_path, lean_model_dir, lineage_path, registry_dir,
+                       reference_profile=None, reference_profile_path=config.DRIFT_REFERENCE_PATH):
+    """
+    Sauvegarde le pipeline, le FeatureEngineer, le modèle allégé et le profil de référence de
+    la surveillance de dérive d'un entraînement complet, puis l'inscrit dans le journal de
+    lignée et le registre de modèles.
+    """
     os.makedirs(os.path.dirname(model_path), exist_ok=True)
-    joblib.dump(model_pipeline, model_path)
+    _atomic_joblib_dump(model_pipeline, model_path)
     logging.info(f"Modèle sauvegardé avec succès dans {model_path}")
-    logging.info("--- Entraînement du modèle terminé ---")
+    _atomic_joblib_dump(feature_engineer, feature_engineer_path)
+    logging.info(f"FeatureEngineer sauvegardé avec succès dans {feature_engineer_path}")
+    lean_exported = _export_lean_model_or_skip(model_pipeline, feature_engineer, lean_model_dir)
+    if reference_profile is not None:
+        save_profile(reference_profile, reference_profile_path)
+        logging.info(f"Profil de référence de la surveillance de dérive sauvegardé dans {reference_profile_path}")
+    lineage = record_lineage({
+        'kind': kind,
+        'model_path': os.path.abspath(model_path),
+        'model_sha256': file_sha256(model_path),
+        'parent_sha256': None,
+        'n_trees': model_pipeline.named_steps['regressor'].get_booster().num_boosted_rounds(),
+        'training_data': [_data_reference(training_path, n_training_rows)],
+        'holdout_metrics': metrics,
+        'promoted': True,
+    }, lineage_path)
+    if registry_dir is not None:
+        ModelRegistry(registry_dir).register(model_path, feature_engineer_path,
+                                             lean_model_dir if lean_exported else None, metrics=metrics,
+                                             extra={'lineage': lineage}, reference_profile_path=reference_profile_path,
+                                             model_mode=pipeline_mode(model_pipeline))
+
+def regression_metrics(y_true, y_pred) -> dict:
+    """
+    MAE, MSE, RMSE et R2 calculés sur les prix réels (après inversion du log).
+    """
+    mse = mean_squared_error(y_true, y_pred)
+    return {'mae': float(mean_absolute_error(y_true, y_pred)), 'mse': float(mse),
+            'rmse': float(np.sqrt(mse)), 'r2': float(r2_score(y_true, y_pred))}
+
+def _atomic_joblib_dump(obj, path):
+    # Écriture dans un fichier temporaire puis renommage : l'API ne lit jamais un modèle à moitié écrit.
+    tmp_path = f"{path}.tmp"
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+def _data_reference(path, n_rows) -> dict:
+    return {'path': os.path.abspath(path), 'sha256': file_sha256(path), 'n_rows': int(n_rows)}
+
+def record_lineage(entry: dict, lineage_path=config.MODEL_LINEAGE_PATH):
+    """
+    Ajoute une entrée au journal de lignée des modèles (une ligne JSON par entraînement).
+    """
+    entry = {'timestamp': datetime.datetime.now().isoformat(timespec='seconds'), **entry}
+    os.makedirs(os.path.dirname(os.path.abspath(lineage_path)), exist_ok=True)
+    with open(lineage_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry) + '\n')
+    return entry
+
+def update_model(new_data_path, model_path=config.MODEL_SAVE_PATH,
+                 feature_engineer_path=config.FEATURE_ENGINEER_SAVE_PATH, lean_model_dir=config.LEAN_MODEL_DIR,
+                 holdout_path=config.TEST_DATA_PATH, n_new_estimators=config.INCREMENTAL_N_ESTIMATORS,
+                 learning_rate=None, min_rmse_improvement=0.0, lineage_path=config.MODEL_LINEAGE_PATH,
+                 registry_dir=config.MODEL_REGISTRY_DIR, reference_profile_path=config.DRIFT_REFERENCE_PATH):
+    """
+    Incremental training: continues boosting the saved model on new sales only, instead
+    of refitting the whole pipeline on the full history.
+
+    The fitted FeatureEngineer and preprocessor are reused as they are (the scaler and
+    one-hot vocabularies are not refitted; unseen categories are ignored) and
+    n_new_estimators trees are added to the saved booster through XGBoost's xgb_model
+    continuation. The updated model replaces the saved one only if its RMSE on the
+    hold-out set is at least min_rmse_improvement (relative) better than the base model's.
+    Every attempt, promoted or not, is recorded in the lineage file.
+
+    Args:
+        new_data_path (str): CSV of new sales, with the target column.
+        model_path (str): Saved pipeline to continue from, replaced on promotion.
+        feature_engineer_path (str): Saved FeatureEngineer (rebuilt from the pipeline if absent).
+        lean_model_dir (str): Lean artifact re-exported on promotion.
+        holdout_path (str): CSV used to compare the base and updated models.
+        n_new_estimators (int): Number of boosting rounds added.
+        learning_rate (float): Learning rate of the new rounds (defaults to the base model's).
+        min_rmse_improvement (float): Minimum relative RMSE decrease required to promote.
+        lineage_path (str): JSON Lines file receiving the lineage entry.
+        registry_dir (str): Model registry receiving the promoted model as a new version (None = not registered).
+        reference_profile_path (str): Drift reference profile of the base model, copied into the new version.
+    Returns:
+        dict: The lineage entry (metrics of both models and promotion decision).
+    """
+    logging.info(f"--- Entraînement incrémental à partir de {model_path} ---")
+    base_pipeline = joblib.load(model_path)
+    if os.path.exists(feature_engineer_path):
+        feature_engineer = joblib.load(feature_engineer_path)
+    else:
+        feature_engineer = FeatureEngineer.from_pipeline(base_pipeline)
+    base_sha256 = file_sha256(model_path)
+
+    X_new_raw, y_new, _, _ = load_data(train_path=new_data_path, load_test=False)
+    X_holdout_raw, y_holdout, _, _ = load_data(train_path=holdout_path, load_test=False)
+
+    preprocessor = base_pipeline.named_steps['preprocessor']
+    base_regressor = base_pipeline.named_steps['regressor']
+    X_new_fe = feature_engineer.transform(X_new_raw)
+    X_new_transformed = preprocessor.transform(X_new_fe)
+    y_new_transformed = np.log1p(y_new.loc[X_new_fe.index])
+
+    regressor = clone(base_regressor).set_params(n_estimators=n_new_estimators)
+    if learning_rate is not None:
+        regressor.set_params(learning_rate=learning_rate)
+    logging.info(f"Ajout de {n_new_estimators} arbres au booster existant sur {len(X_new_fe)} nouvelles ventes...")
+    regressor.fit(X_new_transformed, y_new_transformed, xgb_model=base_regressor.get_booster())
+    updated_pipeline = Pipeline(steps=[('preprocessor', preprocessor), ('regressor', regressor)])
+
+    X_holdout_fe = feature_engineer.transform(X_holdout_raw)
+    y_holdout = y_holdout.loc[X_holdout_fe.index]
+    base_metrics = regression_metrics(y_holdout, np.expm1(base_pipeline.predict(X_holdout_fe)))
+    updated_metrics = regression_metrics(y_holdout, np.expm1(updated_pipeline.predict(X_holdout_fe)))
+    logging.info(f"RMSE hold-out : modèle de base {base_metrics['rmse']:.2f}, modèle mis à jour {updated_metrics['rmse']:.2f}")
+
+    promoted = updated_metrics['rmse'] <= base_metrics['rmse'] * (1 - min_rmse_improvement)
+    if promoted:
+        _atomic_joblib_dump(updated_pipeline, model_path)
+        lean_exported = _export_lean_model_or_skip(updated_pipeline, feature_engineer, lean_model_dir)
+        logging.info(f"Modèle mis à jour promu et sauvegardé dans {model_path}")
+    else:
+        logging.warning("Le modèle mis à jour n'améliore pas le hold-out : le modèle de base est conservé.")
+
+    lineage = record_lineage({
+        'kind': 'incremental',
+        'model_path': os.path.abspath(model_path),
+        'model_sha256': file_sha256(model_path) if promoted else None,
+        'parent_sha256': base_sha256,
+        'n_trees': regressor.get_booster().num_boosted_rounds(),
+        'added_trees': n_new_estimators,
+        'learning_rate': regressor.get_params()['learning_rate'],
+        'training_data': [_data_reference(new_data_path, len(X_new_fe))],
+        'holdout': _data_reference(holdout_path, len(X_holdout_fe)),
+        'base_holdout_metrics': base_metrics,
+        'holdout_metrics': updated_metrics,
+        'promoted': bool(promoted),
+    }, lineage_path)
+    if promoted and registry_dir is not None:
+        registry = ModelRegistry(registry_dir)
+        # Version du modèle réellement continué (model_path), pas la version active : elles diffèrent
+        # après un épinglage ou un retour arrière.
+        parent_version = registry.find_version(base_sha256)
+        if parent_version is None:
+            logging.warning(f"Le modèle de base {model_path} n'est pas dans le registre : version sans parent.")
+        # La référence de dérive reste celle de l'entraînement complet dont ce modèle descend
+        registry.register(model_path, feature_engineer_path, lean_model_dir if lean_exported else None,
+                          metrics=updated_metrics, parent_version=parent_version, extra={'lineage': lineage},
+                          reference_profile_path=reference_profile_path, model_mode=pipeline_mode(updated_pipeline))
+    return lineage
 
 if __name__ == "__main__":
-    train_and_save_model()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Entraînement du modèle de prédiction des prix.")
+    parser.add_argument('--incremental', metavar='NEW_SALES_CSV',
+                        help="Continue le modèle sauvegardé sur ces nouvelles ventes au lieu de tout réentraîner.")
+    parser.add_argument('--n-estimators', type=int, default=config.INCREMENTAL_N_ESTIMATORS,
+                        help="Nombre d'arbres ajoutés en mode incrémental.")
+    parser.add_argument('--learning-rate', type=float, default=None, help="Taux d'apprentissage des arbres ajoutés.")
+    parser.add_argument('--holdout', default=config.TEST_DATA_PATH, help="CSV de validation pour décider de la promotion.")
+    parser.add_argument('--min-improvement', type=float, default=0.0,
+                        help="Baisse relative minimale du RMSE hold-out pour promouvoir le modèle mis à jour.")
+    parser.add_argument('--out-of-core', metavar='TRAIN_FILE', nargs='?', const=config.TRAIN_DATA_PATH,
+                        help="Entraîne en lisant le fichier (CSV ou Parquet) par morceaux, sans le charger en mémoire.")
+    parser.add_argument('--chunk-size', type=int, default=config.OUT_OF_CORE_CHUNK_SIZE,
+                        help="Nombre de lignes par morceau en mode hors mémoire.")
+    parser.add_argument('--external-memory', action='store_true', default=config.OUT_OF_CORE_EXTERNAL_MEMORY,
+                        help="Garde la matrice d'entraînement quantifiée sur disque en mode hors mémoire.")
+    args = parser.parse_args()
+
+    if args.incremental:
+        update_model(args.incremental, holdout_path=args.holdout, n_new_estimators=args.n_estimators,
+                     learning_rate=args.learning_rate, min_rmse_improvement=args.min_improvement)
+    elif args.out_of_core:
+        from src.out_of_core import train_out_of_core
+        train_out_of_core(train_path=args.out_of_core, test_path=args.holdout, chunk_size=args.chunk_size,
+                          external_memory=args.external_memory)
+    else:
+        train_and_save_model()
\ No newline at end of file
@@ -0,0 +1,295 @@
+# src/model_registry.py
+"""
+Registre versionné des modèles et rechargement à chaud pour l'API.
+
+Chaque entraînement enregistre une version dans models/registry/<version>/ :
+    model.pkl, feature_engineer.pkl, lean/ (artefact allégé), reference_profile.json
+    (profil des données d'entraînement pour la surveillance de dérive), manifest.json
+Le manifeste contient le numéro de version, la date, les métriques hold-out, le schéma
+des caractéristiques et la version parente. Le fichier models/registry/state.json
+indique la version épinglée (sinon la plus récente est servie) et la version candidate
+évaluée en ombre (shadow scoring).
+
+ModelServer charge la version active, puis vérifie périodiquement le registre : une
+nouvelle version est chargée dans un thread en arrière-plan puis remplace l'ancienne
+par une simple affectation. Les requêtes en cours gardent leur référence à l'ancien
+modèle et se terminent normalement. Un chargement en échec laisse l'ancien modèle en
+service et sera retenté. Sans registre, le modèle historique (MODEL_SAVE_PATH) est servi
+et rechargé quand le fichier change.
+"""
+import datetime
+import json
+import logging
+import os
+import shutil
+import threading
+
+import joblib
+
+from src import config
+from src.lean_model import LEAN_SPEC_FILE
+
+MANIFEST_FILE = 'manifest.json'
+STATE_FILE = 'state.json'
+MODEL_FILE = 'model.pkl'
+FEATURE_ENGINEER_FILE = 'feature_engineer.pkl'
+LEAN_DIR = 'lean'
+REFERENCE_PROFILE_FILE = 'reference_profile.json'
+
+
+def _write_json_atomic(path: str, data: dict):
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _lean_model_mode(lean_dir: str):
+    spec_path = os.path.join(lean_dir, LEAN_SPEC_FILE)
+    if not os.path.exists(spec_path):
+        return None
+    with open(spec_path, encoding='utf-8') as f:
+        return json.load(f).get('mode', 'onehot')
+
+
+class ModelRegistry:
+    """
+    Versions de modèles sous un répertoire (config.MODEL_REGISTRY_DIR), nommées v0001, v0002...
+    """
+
+    def __init__(self, root: str = config.MODEL_REGISTRY_DIR):
+        self.root = root
+
+    def list_versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if name.startswith('v') and os.path.exists(os.path.join(self.root, name, MANIFEST_FILE)))
+
+    def latest_version(self):
+        versions = self.list_versions()
+        return versions[-1] if versions else None
+
+    def version_dir(self, version: str) -> str:
+        return os.path.join(self.root, version)
+
+    def get_manifest(self, version: str) -> dict:
+        path = os.path.join(self.version_dir(version), MANIFEST_FILE)
+        if not os.path.exists(path):
+            raise KeyError(f"Version de modèle inconnue : {version}")
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def find_version(self, model_sha256: str):
+        """
+        Most recent version whose model file has this SHA-256, or None if it was never registered.
+        """
+        from src.dataset_cache import file_sha256
+
+        for version in reversed(self.list_versions()):
+            model_path = os.path.join(self.version_dir(version), MODEL_FILE)
+            if os.path.exists(model_path) and file_sha256(model_path) == model_sha256:
+                return version
+        return None
+
+    def register(self, model_path: str, feature_engineer_path: str = None, lean_model_dir: str = None,
+                 metrics: dict = None, parent_version: str = None, extra: dict = None,
+                 reference_profile_path: str = None, model_mode: str = None) -> dict:
+        """
+        Copies the model artifacts into a new version directory and writes its manifest.
+        The directory is renamed into place at the end, so pollers never see a partial version.
+        model_mode is the preprocessor mode of the registered model ('onehot' or
+        'native_categorical'); when omitted it is read from the lean spec, if any.
+        Returns the manifest.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        latest = self.latest_version()
+        version = f"v{(int(latest[1:]) + 1) if latest else 1:04d}"
+        tmp_dir = os.path.join(self.root, f".{version}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        shutil.copy2(model_path, os.path.join(tmp_dir, MODEL_FILE))
+        feature_schema = None
+        if feature_engineer_path and os.path.exists(feature_engineer_path):
+            shutil.copy2(feature_engineer_path, os.path.join(tmp_dir, FEATURE_ENGINEER_FILE))
+            feature_engineer = joblib.load(feature_engineer_path)
+            feature_schema = {'numerical_features': feature_engineer.numerical_features_,
+                              'categorical_features': feature_engineer.categorical_features_,
+                              'input_dtypes': feature_engineer.input_dtypes_}
+        if lean_model_dir and os.path.isdir(lean_model_dir):
+            shutil.copytree(lean_model_dir, os.path.join(tmp_dir, LEAN_DIR))
+            if model_mode is None:
+                model_mode = _lean_model_mode(os.path.join(tmp_dir, LEAN_DIR))
+        if reference_profile_path and os.path.exists(reference_profile_path):
+            shutil.copy2(reference_profile_path, os.path.join(tmp_dir, REFERENCE_PROFILE_FILE))
+
+        manifest = {
+            'version': version,
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'metrics': metrics,
+            'feature_schema': feature_schema,
+            'model_mode': model_mode,
+            'parent_version': parent_version,
+            **(extra or {}),
+        }
+        _write_json_atomic(os.path.join(tmp_dir, MANIFEST_FILE), manifest)
+        os.replace(tmp_dir, self.version_dir(version))
+        logging.info(f"Modèle enregistré dans le registre en version {version}")
+        return manifest
+
+    # --- État : épinglage, retour arrière, version en ombre ---
+
+    def read_state(self) -> dict:
+        path = os.path.join(self.root, STATE_FILE)
+        state = {'pinned': None, 'shadow': None}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                state.update(json.load(f))
+        return state
+
+    def _write_state(self, state: dict):
+        os.makedirs(self.root, exist_ok=True)
+        _write_json_atomic(os.path.join(self.root, STATE_FILE), state)
+
+    def active_version(self):
+        """
+        The pinned version if any, otherwise the latest registered version.
+        """
+        pinned = self.read_state()['pinned']
+        return pinned if pinned is not None else self.latest_version()
+
+    def pin(self, version: str):
+        self.get_manifest(version) # Vérifie que la version existe
+        state = self.read_state()
+        state['pinned'] = version
+        self._write_state(state)
+        logging.info(f"Version de modèle épinglée : {version}")
+
+    def unpin(self):
+        state = self.read_state()
+        state['pinned'] = None
+        self._write_state(state)
+        logging.info("Épinglage retiré : la version la plus récente sera servie.")
+
+    def rollback(self) -> str:
+        """
+        Pins the version registered just before the active one and returns it.
+        """
+        versions = self.list_versions()
+        active = self.active_version()
+        if active not in versions or versions.index(active) == 0:
+            raise ValueError(f"Aucune version antérieure à {active} pour revenir en arrière.")
+        previous = versions[versions.index(active) - 1]
+        self.pin(previous)
+        return previous
+
+    def set_shadow(self, version):
+        if version is not None:
+            self.get_manifest(version)
+        state = self.read_state()
+        state['shadow'] = version
+        self._write_state(state)
+        logging.info(f"Version évaluée en ombre : {version}")
+
+    def load(self, version: str, use_lean: bool = config.USE_LEAN_MODEL):
+        """
+        Loads (model, feature_engineer) of a registered version.
+        """
+        from src.predict import load_model, load_feature_engineer
+
+        version_dir = self.version_dir(version)
+        lean_dir = os.path.join(version_dir, LEAN_DIR)
+        model_path = lean_dir if use_lean and os.path.isdir(lean_dir) else os.path.join(version_dir, MODEL_FILE)
+        model = load_model(model_path)
+        return model, load_feature_engineer(os.path.join(version_dir, FEATURE_ENGINEER_FILE), model=model)
+
+
+class ServedModel:
+    """
+    Un modèle chargé et sa version. Les requêtes en gardent une référence du début à la fin.
+    """
+
+    def __init__(self, version: str, model, feature_engineer, manifest: dict = None, reference_profile=None):
+        self.version = version
+        self.model = model
+        self.feature_engineer = feature_engineer
+        self.manifest = manifest or {}
+        self.reference_profile = reference_profile # Profil d'entraînement (src/drift_monitoring.py) ou None
+
+
+class ModelServer:
+    """
+    Sert la version active du registre (ou le modèle historique) et la recharge à chaud.
+    """
+
+    def __init__(self, registry: ModelRegistry = None, fallback_model_path: str = config.MODEL_SAVE_PATH):
+        self.registry = registry or ModelRegistry()
+        self.fallback_model_path = fallback_model_path
+        self.current = None
+        self.shadow = None
+        self.last_error = None
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def version(self):
+        current = self.current
+        return current.version if current is not None else None
+
+    def _fallback_version(self):
+        from src.prediction_cache import get_model_version
+        return f"legacy-{get_model_version(self.fallback_model_path)}"
+
+    def _load(self, version: str) -> ServedModel:
+        from src.drift_monitoring import load_profile
+        if version.startswith('legacy-'):
+            from src.predict import load_model, load_feature_engineer
+            model = load_model(self.fallback_model_path)
+            return ServedModel(version, model, load_feature_engineer(model=model), {'version': version},
+                               load_profile(config.DRIFT_REFERENCE_PATH))
+        model, feature_engineer = self.registry.load(version)
+        return ServedModel(version, model, feature_engineer, self.registry.get_manifest(version),
+                           load_profile(os.path.join(self.registry.version_dir(version), REFERENCE_PROFILE_FILE)))
+
+    def refresh(self) -> bool:
+        """
+        Loads the active (and shadow) version if it changed, then swaps it in.
+        Meant to run in a background thread; the served model keeps answering meanwhile.
+        Returns True if the served model changed.
+        """
+        with self._refresh_lock:
+            changed = False
+            target = self.registry.active_version() or self._fallback_version()
+            if target != self.version:
+                try:
+                    served = self._load(target)
+                except Exception as e:
+                    self.last_error = f"{target}: {e}"
+                    logging.error(f"Échec du chargement de la version {target}, la version {self.version} reste en service : {e}")
+                else:
+                    previous, self.current, self.last_error = self.version, served, None # Échange atomique
+                    logging.info(f"Modèle servi : {previous} -> {target}")
+                    changed = True
+
+            shadow_version = self.registry.read_state()['shadow']
+            if shadow_version is None or shadow_version == self.version:
+                self.shadow = None
+            elif self.shadow is None or self.shadow.version != shadow_version:
+                try:
+                    self.shadow = self._load(shadow_version)
+                    logging.info(f"Version {shadow_version} chargée pour l'évaluation en ombre.")
+                except Exception as e:
+                    self.shadow = None
+                    logging.error(f"Échec du chargement de la version en ombre {shadow_version} : {e}")
+            return changed
+
+    def status(self) -> dict:
+        state = self.registry.read_state()
+        return {
+            'served_version': self.version,
+            'served_manifest': self.current.manifest if self.current is not None else None,
+            'pinned': state['pinned'],
+            'shadow_version': self.shadow.version if self.shadow is not None else None,
+            'available_versions': self.registry.list_versions(),
+            'last_error': self.last_error,
+        }
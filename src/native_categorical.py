@@ -0,0 +1,61 @@
+# src/native_categorical.py
+"""
+Préprocesseur du mode « catégories natives » (config.MODEL_MODE = 'native_categorical').
+
+Au lieu du ColumnTransformer imputation + StandardScaler | imputation + OneHotEncoder,
+les colonnes numériques sont passées telles quelles (XGBoost gère les NaN et n'a pas
+besoin de mise à l'échelle) et les colonnes catégorielles sont remplacées par le code de leur
+catégorie dans un vocabulaire figé au fit. XGBoost les traite comme catégorielles
+(feature_types='c', tree_method='hist', enable_categorical=True). Une matrice NumPy de
+codes évite la conversion des colonnes `category` pandas à chaque prédiction.
+"""
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+
+
+class NativeCategoricalPreprocessor(BaseEstimator, TransformerMixin):
+    """
+    Sélectionne les colonnes du modèle et encode les catégorielles par leur code.
+    Les catégories inconnues au fit (ou absentes de `categories` s'il est fourni) deviennent
+    des valeurs manquantes.
+    """
+
+    categories = None # Préprocesseurs sauvegardés avant le paramètre categories
+
+    def __init__(self, numerical_features=None, categorical_features=None, categories=None):
+        self.numerical_features = numerical_features
+        self.categorical_features = categorical_features
+        self.categories = categories
+
+    def fit(self, X, y=None):
+        self.numerical_features_ = list(self.numerical_features or [])
+        self.categorical_features_ = list(self.categorical_features or [])
+        if self.categories is not None:
+            self.categories_ = [sorted(str(value) for value in categories) for categories in self.categories]
+        else:
+            self.categories_ = []
+            for col in self.categorical_features_:
+                values = X[col].dropna().astype(str)
+                self.categories_.append(sorted(values.unique().tolist()))
+        self.dtypes_ = [pd.CategoricalDtype(categories) for categories in self.categories_]
+        return self
+
+    def transform(self, X) -> np.ndarray:
+        """
+        Retourne une matrice float64 : colonnes numériques brutes puis codes des catégories
+        (rang dans le vocabulaire du fit, NaN si manquante ou inconnue).
+        """
+        n_rows = len(X)
+        output = np.empty((n_rows, len(self.numerical_features_) + len(self.categorical_features_)), dtype=np.float64)
+        for j, col in enumerate(self.numerical_features_):
+            output[:, j] = np.asarray(X[col], dtype=np.float64)
+        offset = len(self.numerical_features_)
+        for j, (col, dtype) in enumerate(zip(self.categorical_features_, self.dtypes_)):
+            values = pd.Series(np.asarray(X[col], dtype=object))
+            codes = pd.Categorical(values.where(values.isna(), values.astype(str)), dtype=dtype).codes
+            output[:, offset + j] = np.where(codes < 0, np.nan, codes)
+        return output
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray(self.numerical_features_ + self.categorical_features_, dtype=object)
@@ -0,0 +1,207 @@
+# src/neighbourhood.py
+"""
+Index de voisinage construit sur les ventes d'entraînement.
+
+Le jeu de données ne contient pas de coordonnées (lat/long) mais la ville et le code
+postal (statezip) de chaque vente. Pour chaque niveau, du plus large au plus fin
+(city puis statezip), l'index conserve des tableaux triés de clés et les statistiques
+des ventes correspondantes :
+- encodage de la cible : moyenne lissée de log1p(prix), tirée vers l'encodage du niveau
+  supérieur quand le niveau compte peu de ventes ;
+- prix médian au pied carré habitable (celui du niveau supérieur en dessous de min_sales ventes) ;
+- nombre de ventes du code postal.
+
+Les recherches sont vectorisées (np.searchsorted sur les clés triées) : un lot entier
+est traité en une passe, sans dict Python par ligne. L'index ne dépend que de NumPy
+et se sérialise en JSON avec le modèle allégé.
+"""
+import numpy as np
+
+LEVELS = ('city', 'statezip')
+
+
+def _as_keys(values) -> np.ndarray:
+    values = np.asarray(values, dtype=object)
+    missing = (values != values) | (values == None) # noqa: E711 (comparaison élément par élément)
+    return np.where(missing, '', values).astype(str)
+
+
+def encode_keys(values):
+    """
+    Clés triées et position de la clé de chaque vente parmi elles.
+    """
+    unique_keys, inverse = np.unique(_as_keys(values), return_inverse=True)
+    return unique_keys, inverse.reshape(-1)
+
+
+def _group_stats(unique_keys: np.ndarray, inverse: np.ndarray, log_price: np.ndarray, price_per_sqft: np.ndarray) -> dict:
+    """
+    Nombre de ventes, somme des log-prix et médiane du prix au pied carré par clé.
+    Les clés sans vente (absentes d'un sous-ensemble) sont retirées.
+    """
+    count = np.bincount(inverse, minlength=len(unique_keys))
+    log_price_sum = np.bincount(inverse, weights=log_price, minlength=len(unique_keys))
+
+    valid = ~np.isnan(price_per_sqft)
+    order = np.lexsort((price_per_sqft[valid], inverse[valid]))
+    sorted_values = price_per_sqft[valid][order]
+    valid_count = np.bincount(inverse[valid], minlength=len(unique_keys))
+    starts = np.concatenate(([0], np.cumsum(valid_count)[:-1]))
+    median = np.full(len(unique_keys), np.nan)
+    has_values = valid_count > 0
+    low = starts[has_values] + (valid_count[has_values] - 1) // 2
+    high = starts[has_values] + valid_count[has_values] // 2
+    median[has_values] = (sorted_values[low] + sorted_values[high]) / 2
+    present = count > 0
+    return {'keys': unique_keys[present], 'count': count[present], 'log_price_sum': log_price_sum[present],
+            'price_per_sqft': median[present]}
+
+
+class NeighbourhoodIndex:
+    """
+    Statistiques de prix par ville et par code postal, recherchées par lot.
+    """
+
+    feature_names = ['city_log_price_te', 'city_price_per_sqft',
+                     'statezip_log_price_te', 'statezip_price_per_sqft', 'statezip_n_sales']
+    # Caractéristiques qui ne dépendent pas du prix : calculées sur toutes les ventes, même hors-pli
+    full_data_features = ['statezip_n_sales']
+    key_columns = list(LEVELS)
+    # Colonne brute (clé du niveau) à l'origine de chaque caractéristique
+    feature_sources = {name: (name.split('_')[0],) for name in feature_names}
+
+    def __init__(self, levels: dict, global_log_price: float, global_price_per_sqft: float,
+                 smoothing: float, min_sales: int):
+        self.levels = levels
+        self.global_log_price = global_log_price
+        self.global_price_per_sqft = global_price_per_sqft
+        self.smoothing = smoothing
+        self.min_sales = min_sales
+
+    @classmethod
+    def fit(cls, keys: dict, price, sqft_living, smoothing: float, min_sales: int):
+        """
+        Args:
+            keys (dict): {'city': array, 'statezip': array} des ventes d'entraînement.
+            price: Prix de vente réels (avant transformation logarithmique).
+            sqft_living: Superficie habitable de chaque vente.
+        """
+        return cls.fit_encoded({level: encode_keys(keys[level]) for level in LEVELS}, price, sqft_living,
+                               smoothing, min_sales)
+
+    @classmethod
+    def fit_encoded(cls, encoded_keys: dict, price, sqft_living, smoothing: float, min_sales: int):
+        """
+        Comme fit, avec des clés déjà encodées : encoded_keys[level] = (clés triées, position de
+        la clé de chaque vente). Évite une chaîne par vente (entraînement hors mémoire).
+        """
+        log_price = np.log1p(np.asarray(price, dtype=np.float64))
+        sqft_living = np.asarray(sqft_living, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            price_per_sqft = np.where(sqft_living > 0, np.expm1(log_price) / sqft_living, np.nan)
+        levels = {level: _group_stats(unique_keys, inverse, log_price, price_per_sqft)
+                  for level, (unique_keys, inverse) in encoded_keys.items()}
+        return cls(levels, float(log_price.mean()), float(np.nanmedian(price_per_sqft)), smoothing, min_sales)
+
+    @classmethod
+    def fit_folds(cls, encoded_keys: dict, price, sqft_living, smoothing: float, min_sales: int,
+                  folds: np.ndarray, n_folds: int) -> list:
+        """
+        Un index par pli, ajusté sur les ventes des autres plis (folds[i] = pli de la vente i).
+        """
+        price = np.asarray(price, dtype=np.float64)
+        sqft_living = np.asarray(sqft_living, dtype=np.float64)
+        indexes = []
+        for fold in range(n_folds):
+            kept = folds != fold
+            indexes.append(cls.fit_encoded({level: (unique_keys, inverse[kept])
+                                            for level, (unique_keys, inverse) in encoded_keys.items()},
+                                           price[kept], sqft_living[kept], smoothing, min_sales))
+        return indexes
+
+    def lookup_out_of_fold(self, indexes: list, folds: np.ndarray, columns) -> dict:
+        """
+        Caractéristiques de chaque vente recherchées dans l'index qui ne l'a pas vue (indexes[folds[i]]).
+        Les caractéristiques sans la cible (full_data_features) viennent de cet index, ajusté sur
+        toutes les ventes, comme au service : calculées sur (k-1)/k des ventes, elles seraient
+        décalées entre l'entraînement et la prédiction.
+        """
+        features = {name: np.empty(len(folds)) for name in self.feature_names}
+        for fold, index in enumerate(indexes):
+            held_out = folds == fold
+            if not held_out.any():
+                continue
+            for name, values in index.lookup({level: np.asarray(columns[level], dtype=object)[held_out]
+                                              for level in LEVELS}).items():
+                features[name][held_out] = values
+        full_data = self.lookup(columns)
+        features.update({name: full_data[name] for name in self.full_data_features})
+        return features
+
+    def out_of_fold_features(self, keys: dict, price, sqft_living, n_folds: int, seed: int) -> dict:
+        """
+        Caractéristiques des ventes d'entraînement (celles sur lesquelles cet index a été ajusté)
+        calculées par un index ajusté sur les autres plis : le prix d'une vente n'entre jamais dans
+        sa propre caractéristique.
+        """
+        folds = np.random.RandomState(seed).permutation(len(price)) % n_folds
+        encoded_keys = {level: encode_keys(keys[level]) for level in LEVELS}
+        indexes = self.fit_folds(encoded_keys, price, sqft_living, self.smoothing, self.min_sales, folds, n_folds)
+        return self.lookup_out_of_fold(indexes, folds, keys)
+
+    def _positions(self, level: str, values) -> np.ndarray:
+        """
+        Position de chaque valeur dans les clés triées du niveau, -1 si inconnue.
+        """
+        keys = self.levels[level]['keys']
+        values = _as_keys(values)
+        if len(keys) == 0:
+            return np.full(len(values), -1)
+        positions = np.clip(np.searchsorted(keys, values), 0, len(keys) - 1)
+        return np.where(keys[positions] == values, positions, -1)
+
+    def lookup(self, columns) -> dict:
+        """
+        Args:
+            columns: DataFrame ou dict {colonne: array} contenant 'city' et 'statezip'.
+        Returns:
+            dict: {nom de caractéristique: np.ndarray float64}, dans l'ordre de feature_names.
+        """
+        n_rows = len(columns[LEVELS[0]])
+        log_price_te = np.full(n_rows, self.global_log_price)
+        price_per_sqft = np.full(n_rows, self.global_price_per_sqft)
+        features = {}
+        for level in LEVELS:
+            stats = self.levels[level]
+            positions = self._positions(level, columns[level])
+            found = positions >= 0
+            count = np.where(found, np.asarray(stats['count'])[positions], 0)
+            log_price_sum = np.where(found, np.asarray(stats['log_price_sum'], dtype=np.float64)[positions], 0.0)
+            # Lissage vers le niveau supérieur : (somme + m * a_priori) / (n + m)
+            log_price_te = (log_price_sum + self.smoothing * log_price_te) / (count + self.smoothing)
+            median = np.where(found, np.asarray(stats['price_per_sqft'], dtype=np.float64)[positions], np.nan)
+            price_per_sqft = np.where((count >= self.min_sales) & ~np.isnan(median), median, price_per_sqft)
+            features[f'{level}_log_price_te'] = log_price_te
+            features[f'{level}_price_per_sqft'] = price_per_sqft
+        features['statezip_n_sales'] = count.astype(np.float64)
+        return {name: features[name] for name in self.feature_names}
+
+    def to_dict(self) -> dict:
+        return {
+            'levels': {level: {name: np.asarray(values).tolist() for name, values in stats.items()}
+                       for level, stats in self.levels.items()},
+            'global_log_price': self.global_log_price,
+            'global_price_per_sqft': self.global_price_per_sqft,
+            'smoothing': self.smoothing,
+            'min_sales': self.min_sales,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        levels = {level: {'keys': np.asarray(stats['keys'], dtype=str),
+                          'count': np.asarray(stats['count'], dtype=np.int64),
+                          'log_price_sum': np.asarray(stats['log_price_sum'], dtype=np.float64),
+                          'price_per_sqft': np.asarray(stats['price_per_sqft'], dtype=np.float64)}
+                  for level, stats in data['levels'].items()}
+        return cls(levels, data['global_log_price'], data['global_price_per_sqft'],
+                   data['smoothing'], data['min_sales'])
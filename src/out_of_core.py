@@ -0,0 +1,308 @@
+# src/out_of_core.py
+"""
+Entraînement hors mémoire : le jeu d'entraînement n'est jamais chargé en entier.
+
+Le fichier (CSV ou Parquet) est relu par morceaux de config.OUT_OF_CORE_CHUNK_SIZE lignes :
+1. Une première passe résume les données pour ajuster le FeatureEngineer sans les garder :
+   types des colonnes, vocabulaires complets des catégorielles, échantillon réservoir de
+   config.OUT_OF_CORE_SAMPLE_ROWS lignes et, pour l'index de voisinage, les seules colonnes
+   utiles sous forme compacte (codes des clés, prix, superficie, pli : ~25 octets par vente).
+2. Le préprocesseur est ajusté sur l'échantillon (imputation, mise à l'échelle), avec les
+   vocabulaires one-hot complets de la première passe.
+3. Un xgb.DataIter relit les morceaux et transmet à XGBoost la matrice prétraitée de chacun.
+   XGBoost en construit une QuantileDMatrix (valeurs quantifiées sur config.OUT_OF_CORE_MAX_BIN
+   seuils, compressées en mémoire) ou, avec config.OUT_OF_CORE_EXTERNAL_MEMORY, une
+   ExtMemQuantileDMatrix dont les pages sont écrites sur disque.
+
+Le résultat est le même Pipeline scikit-learn (préprocesseur + XGBRegressor) que celui de
+train_and_save_model, sauvegardé aux mêmes emplacements avec le FeatureEngineer et le modèle
+allégé : load_model le charge de la même façon. Comme dans FeatureEngineer.fit_transform, les
+caractéristiques de voisinage des ventes d'entraînement sont calculées hors-pli ; le pli d'une
+vente est tiré d'un hachage de son numéro de ligne, donc identique à chaque relecture.
+"""
+import logging
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb # type: ignore
+
+from src import config
+from src.model import build_model_pipeline, regression_metrics, save_trained_model
+from src.batch_scoring import iter_input_chunks
+from src.drift_monitoring import TrafficProfile
+from src.fast_features import fast_feature_engineer_data
+from src.features_engineering import FeatureEngineer, get_final_feature_lists
+from src.memory_optimization import log_peak_memory
+from src.neighbourhood import LEVELS, NeighbourhoodIndex, encode_keys
+
+FOLD_SEED = 42
+
+
+def _row_folds(row_numbers: np.ndarray, n_folds: int) -> np.ndarray:
+    """
+    Pli de chaque ligne, tiré d'un hachage multiplicatif de son numéro dans le fichier.
+    """
+    hashed = (row_numbers.astype(np.uint64) + np.uint64(FOLD_SEED)) * np.uint64(0x9E3779B97F4A7C15)
+    return ((hashed >> np.uint64(32)) % np.uint64(n_folds)).astype(np.int8)
+
+
+def _iter_training_chunks(path: str, chunk_size: int, target_column: str):
+    """
+    Yields (X, y, X_fe, folds) for each chunk of the file. y and folds are aligned on X_fe:
+    rows with an invalid sale date are dropped by the feature engineering.
+    """
+    first_row = 0
+    for chunk in iter_input_chunks(path, chunk_size):
+        if target_column not in chunk.columns:
+            raise ValueError(f"Target column '{target_column}' not found in {path}.")
+        y = chunk.pop(target_column)
+        X_fe = fast_feature_engineer_data(chunk)
+        positions = chunk.index.get_indexer(X_fe.index)
+        yield chunk, y.loc[X_fe.index], X_fe, _row_folds(first_row + positions, config.NEIGHBOURHOOD_N_FOLDS)
+        first_row += len(chunk)
+
+
+class _TrainingSummary:
+    """
+    Ce que la première passe retient des morceaux d'entraînement.
+    """
+
+    def __init__(self, sample_rows: int, seed: int = FOLD_SEED):
+        self.n_rows = 0
+        self.engineered_dtypes = None
+        self.input_dtypes = {}
+        self.categorical_features = []
+        self.vocabularies = {}
+        self.uses_neighbourhood = False
+        self.sample = None
+        self.reference_sample = None # Champs bruts surveillés et prix des mêmes lignes (profil de dérive)
+        self.sample_rows = sample_rows
+        self._priority_threshold = 1.0
+        self._rng = np.random.RandomState(seed)
+        self._key_codes = {level: {} for level in LEVELS}
+        self._codes = {level: [] for level in LEVELS}
+        self._price, self._sqft_living, self._folds = [], [], []
+
+    def update(self, X, y, X_fe, folds):
+        self.n_rows += len(X)
+        for col in X.columns:
+            if pd.api.types.is_numeric_dtype(X[col]):
+                self.input_dtypes[col] = _merge_dtypes(self.input_dtypes.get(col), X[col].dtype)
+        if X_fe.empty:
+            return
+        if self.engineered_dtypes is None:
+            self.engineered_dtypes = {}
+            _, self.categorical_features = get_final_feature_lists(X_fe.columns)
+            self.vocabularies = {col: set() for col in self.categorical_features}
+            self.uses_neighbourhood = FeatureEngineer.uses_neighbourhood(X.columns, X_fe.columns)
+        for col in X_fe.columns:
+            self.engineered_dtypes[col] = _merge_dtypes(self.engineered_dtypes.get(col), X_fe[col].dtype)
+        for col in self.categorical_features:
+            self.vocabularies[col].update(str(value) for value in pd.unique(X_fe[col].dropna()))
+        keys = X.loc[X_fe.index, list(LEVELS)] if self.uses_neighbourhood else None
+        if self.uses_neighbourhood:
+            self._update_neighbourhood(keys, y, X_fe, folds)
+        self._update_sample(X, y, X_fe, keys, folds)
+
+    def _update_neighbourhood(self, keys, y, X_fe, folds):
+        for level in LEVELS:
+            unique_keys, inverse = encode_keys(keys[level].to_numpy())
+            key_codes = self._key_codes[level]
+            codes = np.array([key_codes.setdefault(key, len(key_codes)) for key in unique_keys], dtype=np.int32)
+            self._codes[level].append(codes[inverse])
+        self._price.append(y.to_numpy(dtype=np.float64))
+        self._sqft_living.append(X_fe['sqft_living'].to_numpy(dtype=np.float64))
+        self._folds.append(folds)
+
+    def _update_sample(self, X, y, X_fe, keys, folds):
+        """
+        Échantillon réservoir : chaque ligne reçoit une priorité aléatoire et l'échantillon
+        garde les sample_rows plus petites, sans connaître à l'avance le nombre de lignes.
+        """
+        priority = self._rng.random_sample(len(X_fe))
+        selected = priority < self._priority_threshold
+        candidates = X_fe if keys is None else pd.concat([X_fe, keys], axis=1)
+        candidates = candidates.assign(_fold=folds, _priority=priority)[selected]
+        monitored = [col for col in config.DRIFT_NUMERICAL_FEATURES + config.DRIFT_CATEGORICAL_FEATURES if col in X]
+        reference = X.loc[X_fe.index, monitored].assign(_price=y.loc[X_fe.index], _priority=priority)[selected]
+        self.sample = self._append_sample(self.sample, candidates)
+        self.reference_sample = self._append_sample(self.reference_sample, reference)
+        self._priority_threshold = self.sample['_priority'].max() if len(self.sample) >= self.sample_rows else 1.0
+
+    def _append_sample(self, sample, candidates):
+        sample = candidates.reset_index(drop=True) if sample is None else pd.concat([sample, candidates], ignore_index=True)
+        if len(sample) >= self.sample_rows:
+            sample = sample.nsmallest(self.sample_rows, '_priority').reset_index(drop=True)
+        return sample
+
+    def encoded_keys(self) -> dict:
+        """
+        Clés triées de chaque niveau et position de la clé de chaque vente (NeighbourhoodIndex.fit_encoded).
+        """
+        encoded = {}
+        for level in LEVELS:
+            keys = np.array(list(self._key_codes[level]), dtype=str)
+            order = np.argsort(keys, kind='stable')
+            rank = np.empty(len(keys), dtype=np.int64)
+            rank[order] = np.arange(len(keys))
+            encoded[level] = (keys[order], rank[np.concatenate(self._codes[level])])
+        return encoded
+
+    def fit_neighbourhood(self):
+        """
+        Returns (index fitted on every sale, one index per fold fitted without that fold).
+        """
+        encoded_keys = self.encoded_keys()
+        price, sqft_living, folds = (np.concatenate(values) for values in (self._price, self._sqft_living, self._folds))
+        index = NeighbourhoodIndex.fit_encoded(encoded_keys, price, sqft_living, config.NEIGHBOURHOOD_SMOOTHING,
+                                               config.NEIGHBOURHOOD_MIN_SALES)
+        fold_indexes = NeighbourhoodIndex.fit_folds(encoded_keys, price, sqft_living, config.NEIGHBOURHOOD_SMOOTHING,
+                                                    config.NEIGHBOURHOOD_MIN_SALES, folds, config.NEIGHBOURHOOD_N_FOLDS)
+        return index, fold_indexes
+
+
+def _merge_dtypes(current, dtype) -> str:
+    """
+    Type commun à deux morceaux (int16 et int32 -> int32, entier et flottant -> flottant...).
+    """
+    dtype = np.dtype(object) if isinstance(dtype, pd.CategoricalDtype) else np.dtype(dtype)
+    return dtype.str if current is None else np.promote_types(np.dtype(current), dtype).str
+
+
+class _TrainingDataIter(xgb.DataIter):
+    """
+    Relit le fichier d'entraînement morceau par morceau pour XGBoost : chaque appel de next
+    transmet la matrice prétraitée d'un seul morceau et sa cible log1p(prix).
+    """
+
+    def __init__(self, path, chunk_size, target_column, feature_engineer, preprocessor, fold_indexes,
+                 feature_types=None, cache_prefix=None):
+        super().__init__(cache_prefix=cache_prefix)
+        self.path = path
+        self.chunk_size = chunk_size
+        self.target_column = target_column
+        self.feature_engineer = feature_engineer
+        self.preprocessor = preprocessor
+        self.fold_indexes = fold_indexes
+        self.feature_types = feature_types
+        self._chunks = None
+
+    def reset(self):
+        self._chunks = None
+
+    def next(self, input_data) -> bool:
+        if self._chunks is None:
+            self._chunks = _iter_training_chunks(self.path, self.chunk_size, self.target_column)
+        for X, y, X_fe, folds in self._chunks:
+            if X_fe.empty:
+                continue
+            X_train_fe = self.feature_engineer.transform_out_of_fold(X, self.fold_indexes, folds, engineered=X_fe)
+            input_data(data=self.preprocessor.transform(X_train_fe), label=np.log1p(y.to_numpy(dtype=np.float64)),
+                       feature_types=self.feature_types)
+            return True
+        return False
+
+
+def _evaluate(model_pipeline, feature_engineer, path, chunk_size, target_column):
+    """
+    Hold-out metrics on the real prices, computed chunk by chunk (None without the target).
+    """
+    y_true, y_pred = [], []
+    for chunk in iter_input_chunks(path, chunk_size):
+        if target_column not in chunk.columns:
+            logging.warning("y_test non disponible pour l'évaluation.")
+            return None
+        y = chunk.pop(target_column)
+        X_fe = feature_engineer.transform(chunk)
+        if X_fe.empty:
+            continue
+        y_true.append(y.loc[X_fe.index].to_numpy(dtype=np.float64))
+        y_pred.append(np.expm1(model_pipeline.predict(X_fe)))
+    return regression_metrics(np.concatenate(y_true), np.concatenate(y_pred)) if y_true else None
+
+
+def train_out_of_core(train_path=config.TRAIN_DATA_PATH, test_path=config.TEST_DATA_PATH,
+                      chunk_size=config.OUT_OF_CORE_CHUNK_SIZE, external_memory=config.OUT_OF_CORE_EXTERNAL_MEMORY,
+                      sample_rows=config.OUT_OF_CORE_SAMPLE_ROWS, model_path=config.MODEL_SAVE_PATH,
+                      feature_engineer_path=config.FEATURE_ENGINEER_SAVE_PATH, lean_model_dir=config.LEAN_MODEL_DIR,
+                      lineage_path=config.MODEL_LINEAGE_PATH, registry_dir=config.MODEL_REGISTRY_DIR,
+                      target_column=config.TARGET_COLUMN, reference_profile_path=config.DRIFT_REFERENCE_PATH):
+    """
+    Out-of-core equivalent of train_and_save_model: the training file is streamed in chunks
+    and peak memory no longer grows with its number of rows (see the module docstring).
+
+    Args:
+        train_path (str): Training CSV or Parquet file, with the target column.
+        test_path (str): Hold-out file used for the metrics, also streamed (None to skip).
+        chunk_size (int): Number of rows read and transformed at a time.
+        external_memory (bool): Keep the quantized training matrix on disk (ExtMemQuantileDMatrix)
+                                instead of in memory (QuantileDMatrix).
+        sample_rows (int): Size of the reservoir sample the preprocessor is fitted on.
+    Returns:
+        dict: Hold-out metrics (None if test_path has no target).
+    """
+    logging.info(f"--- Entraînement hors mémoire sur {train_path} (morceaux de {chunk_size} lignes) ---")
+    summary = _TrainingSummary(sample_rows)
+    for X, y, X_fe, folds in _iter_training_chunks(train_path, chunk_size, target_column):
+        summary.update(X, y, X_fe, folds)
+    if summary.engineered_dtypes is None:
+        raise ValueError(f"Aucune vente exploitable dans {train_path}.")
+    logging.info(f"Première passe terminée : {summary.n_rows} ventes, échantillon de {len(summary.sample)} lignes.")
+    log_peak_memory("la première passe")
+
+    neighbourhood_index, fold_indexes = None, None
+    if summary.uses_neighbourhood:
+        neighbourhood_index, fold_indexes = summary.fit_neighbourhood()
+    feature_engineer = FeatureEngineer().fit_summary(summary.engineered_dtypes, summary.input_dtypes,
+                                                     neighbourhood_index)
+    sample_fe = feature_engineer.transform_out_of_fold(summary.sample, fold_indexes,
+                                                       summary.sample['_fold'].to_numpy(), engineered=summary.sample)
+    categories = [sorted(summary.vocabularies[col]) for col in feature_engineer.categorical_features_]
+    model_pipeline = build_model_pipeline(feature_engineer.numerical_features_, feature_engineer.categorical_features_,
+                                          categories=categories)
+    preprocessor = model_pipeline.named_steps['preprocessor']
+    regressor = model_pipeline.named_steps['regressor']
+    preprocessor.fit(sample_fe)
+    n_rows = summary.n_rows
+    # Profil de référence de la surveillance de dérive, calculé sur l'échantillon réservoir
+    reference_profile = TrafficProfile.from_training_data(summary.reference_sample, summary.reference_sample['_price'])
+    summary = sample_fe = None # L'échantillon n'est plus utile : libéré avant la construction de la matrice
+
+    params = {key: value for key, value in regressor.get_xgb_params().items() if value is not None}
+    params['tree_method'] = 'hist' # Seule méthode compatible avec les matrices quantifiées
+    params.setdefault('max_bin', config.OUT_OF_CORE_MAX_BIN)
+    feature_types = regressor.get_params().get('feature_types')
+    cache_dir = None
+    if external_memory:
+        os.makedirs(config.OUT_OF_CORE_CACHE_DIR, exist_ok=True)
+        cache_dir = tempfile.mkdtemp(dir=config.OUT_OF_CORE_CACHE_DIR)
+    try:
+        data_iter = _TrainingDataIter(train_path, chunk_size, target_column, feature_engineer, preprocessor,
+                                      fold_indexes, feature_types,
+                                      cache_prefix=os.path.join(cache_dir, 'train') if cache_dir else None)
+        matrix_class = xgb.ExtMemQuantileDMatrix if external_memory else xgb.QuantileDMatrix
+        dtrain = matrix_class(data_iter, missing=regressor.missing, max_bin=params['max_bin'],
+                              enable_categorical=feature_types is not None)
+        log_peak_memory("la construction de la matrice quantifiée")
+        logging.info(f"Entraînement du modèle XGBoost ({regressor.get_num_boosting_rounds()} arbres)...")
+        booster = xgb.train(params, dtrain, num_boost_round=regressor.get_num_boosting_rounds())
+        del dtrain
+    finally:
+        if cache_dir is not None:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+    regressor.load_model(booster.save_raw(raw_format='ubj'))
+    log_peak_memory("l'entraînement")
+
+    metrics = None
+    if test_path is not None:
+        metrics = _evaluate(model_pipeline, feature_engineer, test_path, chunk_size, target_column)
+        if metrics is not None:
+            logging.info(f"Hold-out : MAE {metrics['mae']:.2f}, RMSE {metrics['rmse']:.2f}, R2 {metrics['r2']:.2f}")
+    save_trained_model(model_pipeline, feature_engineer, metrics, 'out_of_core', train_path, n_rows,
+                       model_path, feature_engineer_path, lean_model_dir, lineage_path, registry_dir,
+                       reference_profile, reference_profile_path)
+    logging.info("--- Entraînement hors mémoire terminé ---")
+    return metrics
@@ -4,12 +4,21 @@ import pandas as pd
 import numpy as np
 import os
 import logging
+import logging.handlers
+import queue
+import atexit
 import sys
+import argparse
+import time
 
 # Ajoutez le répertoire parent au sys.path pour permettre les imports depuis src
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.features_engineering import feature_engineer_data
+from src.contributions import compute_contributions, top_contributions
+from src.fast_features import fast_feature_engineer_data, parse_sale_dates
+from src.features_engineering import FeatureEngineer
+from src.lean_model import load_lean_model
+from src.metrics import BATCH_SIZE, MODEL_LOAD_SECONDS, timed_stage
 from src import config as config
 from src.data_preparation import load_data # <--- C'EST CETTE LIGNE QUI DOIT ÊTRE MODIFIÉE/AJOUTÉE
 
@@ -21,31 +30,93 @@ log_dir = os.path.dirname(PREDICTION_LOG_FILE)
 if not os.path.exists(log_dir):
     os.makedirs(log_dir)
 
-# Setup logging for the prediction script
+# Setup logging for the prediction script.
+# Les handlers fichier et console tournent dans le thread d'un QueueListener : le chemin
+# de prédiction se contente de déposer l'enregistrement dans une file, sans E/S bloquante.
+log_queue = queue.SimpleQueue()
+log_listener = logging.handlers.QueueListener(log_queue, logging.FileHandler(PREDICTION_LOG_FILE),
+                                              logging.StreamHandler())
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
-                    handlers=[logging.FileHandler(PREDICTION_LOG_FILE), logging.StreamHandler()])
+                    handlers=[logging.handlers.QueueHandler(log_queue)])
+log_listener.start()
+atexit.register(log_listener.stop)
 
 def load_model(model_path=config.MODEL_SAVE_PATH):
     """
     Loads the trained machine learning model from the specified path.
     Args:
-        model_path (str): The path to the saved model file.
+        model_path (str): The path to the saved model file, or to a lean model directory
+                          exported by export_lean_model.
     Returns:
-        sklearn.pipeline.Pipeline: The loaded machine learning model.
+        sklearn.pipeline.Pipeline or LeanModel: The loaded machine learning model.
     """
     if not os.path.exists(model_path):
         logging.error(f"Le fichier modèle n'a pas été trouvé à {model_path}. Veuillez vous assurer que le modèle est entraîné et sauvegardé.")
         raise FileNotFoundError(f"Le fichier modèle n'a pas été trouvé à {model_path}. Veuillez vous assurer que le modèle est entraîné et sauvegardé.")
     logging.info(f"Chargement du modèle depuis {model_path}...")
     try:
-        model = joblib.load(model_path)
+        start = time.perf_counter()
+        model = load_lean_model(model_path) if os.path.isdir(model_path) else joblib.load(model_path)
+        MODEL_LOAD_SECONDS.set(time.perf_counter() - start)
         logging.info("Modèle chargé avec succès.")
         return model
     except Exception as e:
         logging.error(f"Erreur lors du chargement du modèle depuis {model_path}: {e}")
         raise
 
-def make_prediction(model, input_data: pd.DataFrame, target_log_transformed: bool = True):
+def load_feature_engineer(feature_engineer_path=config.FEATURE_ENGINEER_SAVE_PATH, model=None):
+    """
+    Loads the fitted FeatureEngineer saved next to the model.
+    Args:
+        feature_engineer_path (str): The path to the saved FeatureEngineer.
+        model: The loaded model, used to rebuild the feature lists from its preprocessor
+               when no FeatureEngineer was saved (models trained before it existed).
+    Returns:
+        FeatureEngineer: The fitted feature engineer.
+    """
+    if os.path.exists(feature_engineer_path):
+        logging.info(f"Chargement du FeatureEngineer depuis {feature_engineer_path}...")
+        return joblib.load(feature_engineer_path)
+    if model is not None and not hasattr(model, 'named_steps'):
+        # Modèle allégé : il sélectionne lui-même ses colonnes parmi les caractéristiques ingéniérées.
+        if getattr(model, 'neighbourhood_index', None) is not None:
+            raise FileNotFoundError(f"Le FeatureEngineer n'a pas été trouvé à {feature_engineer_path} "
+                                    "(nécessaire pour les caractéristiques de voisinage).")
+        return None
+    if model is None:
+        raise FileNotFoundError(f"Le FeatureEngineer n'a pas été trouvé à {feature_engineer_path}.")
+    logging.warning(f"FeatureEngineer absent de {feature_engineer_path}, reconstruction depuis le préprocesseur du modèle.")
+    return FeatureEngineer.from_pipeline(model)
+
+def _predict_by_stage(model, input_data_fe):
+    """
+    Same result as model.predict, with the preprocessor and the booster timed separately.
+    """
+    if hasattr(model, 'named_steps'):
+        with timed_stage('preprocessing'):
+            transformed = model[:-1].transform(input_data_fe)
+        with timed_stage('booster_predict'):
+            return model[-1].predict(transformed)
+    if hasattr(model, 'predict_transformed'): # LeanModel
+        with timed_stage('preprocessing'):
+            transformed = model.transform(input_data_fe)
+        with timed_stage('booster_predict'):
+            return model.predict_transformed(transformed)
+    with timed_stage('booster_predict'):
+        return model.predict(input_data_fe)
+
+def _engineer_features(input_data, feature_engineer=None):
+    logging.info("Application de l'ingénierie des caractéristiques aux données d'entrée...")
+    try:
+        with timed_stage('feature_engineering'):
+            if feature_engineer is not None:
+                return feature_engineer.transform(input_data)
+            return fast_feature_engineer_data(input_data)
+    except Exception as e:
+        logging.error(f"Erreur lors de l'ingénierie des caractéristiques pour la prédiction : {e}")
+        raise ValueError(f"L'ingénierie des caractéristiques a échoué pour les données d'entrée : {e}")
+
+def make_prediction(model, input_data: pd.DataFrame, target_log_transformed: bool = True, feature_engineer=None):
     """
     Makes predictions using the loaded model.
     Args:
@@ -55,6 +126,8 @@ def make_prediction(model, input_data: pd.DataFrame, target_log_transformed: boo
                                    before feature engineering.
         target_log_transformed (bool): True if the model was trained on a log-transformed target,
                                        False otherwise. Defaults to True.
+        feature_engineer (FeatureEngineer): The fitted feature engineer saved with the model.
+                                            If None, all engineered columns are passed to the model.
     Returns:
         np.array: An array of predicted values.
     """
@@ -62,16 +135,12 @@ def make_prediction(model, input_data: pd.DataFrame, target_log_transformed: boo
         logging.warning("Les données d'entrée pour la prédiction sont vides.")
         raise ValueError("Les données d'entrée pour la prédiction ne peuvent pas être vides.")
 
-    logging.info("Application de l'ingénierie des caractéristiques aux données d'entrée...")
-    try:
-        input_data_fe = feature_engineer_data(input_data.copy())
-    except Exception as e:
-        logging.error(f"Erreur lors de l'ingénierie des caractéristiques pour la prédiction : {e}")
-        raise ValueError(f"L'ingénierie des caractéristiques a échoué pour les données d'entrée : {e}")
+    BATCH_SIZE.observe(len(input_data))
+    input_data_fe = _engineer_features(input_data, feature_engineer)
 
     logging.info("Réalisation de la prédiction...")
     try:
-        predictions_transformed = model.predict(input_data_fe)
+        predictions_transformed = _predict_by_stage(model, input_data_fe)
         logging.info("Prédiction terminée.")
 
         if target_log_transformed:
@@ -87,9 +156,135 @@ def make_prediction(model, input_data: pd.DataFrame, target_log_transformed: boo
         logging.error(f"Erreur lors de la prédiction du modèle : {e}")
         raise ValueError(f"La prédiction du modèle a échoué : {e}")
 
+def make_batch_prediction(model, input_data: pd.DataFrame, chunk_size: int = config.BATCH_CHUNK_SIZE,
+                          target_log_transformed: bool = True, feature_engineer=None):
+    """
+    Makes predictions for a large batch of houses, running feature engineering and
+    model.predict once per chunk instead of once per house.
+    Args:
+        model: The trained machine learning model (Pipeline).
+        input_data (pd.DataFrame): A DataFrame containing the raw features for prediction.
+        chunk_size (int): Maximum number of rows sent to the model in a single call.
+        target_log_transformed (bool): True if the model was trained on a log-transformed target.
+        feature_engineer (FeatureEngineer): The fitted feature engineer saved with the model.
+    Returns:
+        tuple: (np.array of predictions in input order, NaN for rows that failed,
+                dict mapping the row position to its error message).
+    """
+    if input_data.empty:
+        raise ValueError("Les données d'entrée pour la prédiction ne peuvent pas être vides.")
+    if chunk_size <= 0:
+        raise ValueError(f"chunk_size doit être strictement positif (reçu : {chunk_size}).")
+
+    # Une erreur de schéma ferait échouer chaque ligne : elle est signalée avant de rejouer quoi que ce soit.
+    if feature_engineer is not None:
+        feature_engineer.check_input_schema(input_data)
+
+    predictions = np.full(len(input_data), np.nan)
+    errors = {}
+
+    for start in range(0, len(input_data), chunk_size):
+        chunk = input_data.iloc[start:start + chunk_size]
+        positions = np.arange(start, start + len(chunk))
+
+        # L'ingénierie des caractéristiques supprime les lignes dont la date est invalide :
+        # on les écarte ici pour conserver l'alignement avec l'ordre d'entrée.
+        valid_mask = np.ones(len(chunk), dtype=bool)
+        if 'date' in chunk.columns:
+            valid_mask = ~np.isnat(parse_sale_dates(chunk['date'].to_numpy()))
+            for pos in positions[~valid_mask]:
+                errors[int(pos)] = "Date de vente invalide."
+
+        valid_chunk = chunk[valid_mask]
+        if valid_chunk.empty:
+            continue
+
+        try:
+            predictions[positions[valid_mask]] = make_prediction(model, valid_chunk, target_log_transformed, feature_engineer)
+        except ValueError as e:
+            # Un lot en échec est rejoué ligne par ligne pour isoler les lignes fautives.
+            logging.warning(f"Échec de la prédiction du lot {start}-{start + len(chunk)} ({e}), reprise ligne par ligne.")
+            for i, pos in enumerate(positions[valid_mask]):
+                try:
+                    predictions[pos] = make_prediction(model, valid_chunk.iloc[[i]], target_log_transformed, feature_engineer)[0]
+                except ValueError as row_error:
+                    errors[int(pos)] = str(row_error)
+
+    logging.info(f"Prédiction par lots terminée : {len(input_data) - len(errors)} réussies, {len(errors)} en erreur.")
+    return predictions, errors
+
+def explain(model, input_data: pd.DataFrame, feature_engineer=None, top_k: int = None, approximate: bool = False,
+            chunk_size: int = config.BATCH_CHUNK_SIZE, target_log_transformed: bool = True):
+    """
+    Explains predictions with per-field contributions computed by XGBoost (pred_contribs).
+    Contributions are grouped back from the model columns (scaled and one-hot) to the raw input
+    fields, see src/contributions.py. They are on the model scale: for each house,
+    base_value + sum(contributions) + other = log1p(predicted_price).
+    Args:
+        model: The trained model (Pipeline or LeanModel).
+        input_data (pd.DataFrame): Raw features, as for make_batch_prediction.
+        feature_engineer (FeatureEngineer): The fitted feature engineer saved with the model.
+        top_k (int): Keep only the k largest contributions (in absolute value) per house;
+                     the sum of the others is returned as 'other'.
+        approximate (bool): Use the faster Saabas approximation (approx_contribs) instead of exact TreeSHAP.
+        chunk_size (int): Maximum number of rows explained in a single booster call.
+    Returns:
+        tuple: (list of explanations in input order, None for rows that failed,
+                dict mapping the row position to its error message).
+    """
+    if input_data.empty:
+        raise ValueError("Les données d'entrée pour l'explication ne peuvent pas être vides.")
+    if chunk_size <= 0:
+        raise ValueError(f"chunk_size doit être strictement positif (reçu : {chunk_size}).")
+    if top_k is not None and top_k <= 0:
+        raise ValueError(f"top_k doit être strictement positif (reçu : {top_k}).")
+
+    explanations = [None] * len(input_data)
+    errors = {}
+    for start in range(0, len(input_data), chunk_size):
+        chunk = input_data.iloc[start:start + chunk_size]
+        positions = np.arange(start, start + len(chunk))
+        valid_mask = np.ones(len(chunk), dtype=bool)
+        if 'date' in chunk.columns:
+            valid_mask = ~np.isnat(parse_sale_dates(chunk['date'].to_numpy()))
+            for pos in positions[~valid_mask]:
+                errors[int(pos)] = "Date de vente invalide."
+        valid_chunk = chunk[valid_mask]
+        if valid_chunk.empty:
+            continue
+
+        input_data_fe = _engineer_features(valid_chunk, feature_engineer)
+        # Les entrées sont déjà validées par l'ingénierie : une erreur ici vient du modèle, pas de la requête.
+        with timed_stage('contributions'):
+            fields, contributions, base_values, raw_predictions = compute_contributions(model, input_data_fe, approximate)
+        prices = np.expm1(raw_predictions) if target_log_transformed else raw_predictions.astype(np.float64)
+        prices[prices < 0] = 0
+        for i, pos in enumerate(positions[valid_mask]):
+            explanations[pos] = {'predicted_price': float(prices[i]), 'base_value': float(base_values[i]),
+                                 **top_contributions(fields, contributions[i], top_k)}
+
+    logging.info(f"Explication terminée : {len(input_data) - len(errors)} réussies, {len(errors)} en erreur.")
+    return explanations, errors
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prédiction des prix des maisons.")
+    parser.add_argument('--input', help="Fichier CSV ou Parquet à scorer en flux (sans cet argument : démonstration sur 5 lignes).")
+    parser.add_argument('--output', default='predictions/batch_predictions.csv', help="Fichier CSV de sortie.")
+    parser.add_argument('--chunk-size', type=int, default=config.SCORING_CHUNK_SIZE, help="Nombre de lignes par morceau.")
+    parser.add_argument('--no-resume', action='store_true', help="Ignorer un point de reprise existant et tout rescorer.")
+    parser.add_argument('--workers', type=int, default=1, help="Nombre de processus de scoring (0 = un par cœur).")
+    parser.add_argument('--nthread', type=int, default=None, help="Threads XGBoost par processus (défaut : cœurs / workers).")
+    args = parser.parse_args()
+
+    if args.input:
+        from src.batch_scoring import score_file
+        score_file(args.input, args.output, chunk_size=args.chunk_size, resume=not args.no_resume,
+                   workers=args.workers, nthread=args.nthread)
+        sys.exit()
+
     try:
         loaded_model = load_model()
+        loaded_feature_engineer = load_feature_engineer(model=loaded_model)
     except (FileNotFoundError, Exception) as e:
         logging.critical(f"Échec du chargement du modèle, impossible de poursuivre la prédiction : {e}")
         exit()
@@ -116,7 +311,8 @@ if __name__ == "__main__":
         exit()
 
     try:
-        predicted_prices = make_prediction(loaded_model, sample_input_data, target_log_transformed=True)
+        predicted_prices = make_prediction(loaded_model, sample_input_data, target_log_transformed=True,
+                                           feature_engineer=loaded_feature_engineer)
         logging.info(f"Prix prédits : {predicted_prices}")
 
         predictions_df = pd.DataFrame({
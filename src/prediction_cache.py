@@ -0,0 +1,235 @@
+# src/prediction_cache.py
+"""
+Cache des prédictions placé devant make_prediction.
+
+Les clés sont un hash stable des caractéristiques normalisées d'une maison et de la
+version du modèle (date de modification et taille du fichier modèle) : un nouveau
+modèle sauvegardé à MODEL_SAVE_PATH invalide automatiquement toutes les entrées.
+Le cache mémoire est borné (LRU) et chaque entrée expire après un TTL. Un stockage
+SQLite optionnel permet de partager le cache entre plusieurs workers uvicorn ; ses
+écritures sont mises en tampon et écrites par lots par flush (une tâche de fond de
+l'API), jamais sur le chemin de la requête.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def get_model_version(model_path: str) -> str:
+    """
+    Returns a cheap identifier of the model on disk (mtime + size), or of the lean model directory.
+    """
+    paths = [model_path]
+    if os.path.isdir(model_path):
+        paths = [os.path.join(model_path, name) for name in sorted(os.listdir(model_path))]
+    try:
+        stats = [os.stat(path) for path in paths]
+    except FileNotFoundError:
+        return 'missing'
+    return '-'.join(f"{st.st_mtime_ns}:{st.st_size}" for st in stats)
+
+
+def make_cache_key(features: dict, model_version: str) -> str:
+    """
+    Hash stable des caractéristiques : l'ordre des champs n'a pas d'importance,
+    mais le type des valeurs oui (3 et 3.0 ne donnent pas la même catégorie).
+    """
+    canonical = json.dumps(features, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(f"{model_version}|{canonical}".encode('utf-8')).hexdigest()
+
+
+class _SQLiteBackend:
+    """
+    Stockage partagé entre processus ; chaque thread utilise sa propre connexion.
+    set ne fait qu'ajouter l'entrée à un tampon borné, écrit en une transaction par flush.
+    """
+
+    def __init__(self, path: str, max_size: int):
+        self.path = path
+        self.max_size = max_size
+        self._local = threading.local()
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._writes = 0
+        self.dropped = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS predictions (key TEXT PRIMARY KEY, value REAL, created REAL)")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, min_created: float):
+        row = self._connection().execute(
+            "SELECT value FROM predictions WHERE key = ? AND created >= ?", (key, min_created)).fetchone()
+        return None if row is None else row[0]
+
+    def set(self, key: str, value: float):
+        with self._pending_lock:
+            if len(self._pending) >= self.max_size: # Écritures en retard : l'entrée reste en mémoire seulement
+                self.dropped += 1
+                return
+            self._pending.append((key, value, time.time()))
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> int:
+        """
+        Writes the buffered entries in one transaction. Returns the number written.
+        """
+        with self._pending_lock:
+            entries, self._pending = self._pending, []
+        if not entries:
+            return 0
+        with self._connection() as conn:
+            conn.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)", entries)
+            previous, self._writes = self._writes, self._writes + len(entries)
+            if previous // 1000 != self._writes // 1000: # Élagage périodique pour rester sous max_size
+                conn.execute("DELETE FROM predictions WHERE key NOT IN "
+                             "(SELECT key FROM predictions ORDER BY created DESC LIMIT ?)", (self.max_size,))
+        return len(entries)
+
+    def clear(self):
+        with self._pending_lock:
+            self._pending = []
+        with self._connection() as conn:
+            conn.execute("DELETE FROM predictions")
+
+
+class PredictionCache:
+    """
+    Cache LRU + TTL des prix prédits, thread-safe, avec compteurs de hits/misses.
+    """
+
+    def __init__(self, model_path: str, max_size: int = 10000, ttl_seconds: float = 3600, disk_path: str = None,
+                 version_fn=None):
+        """
+        Args:
+            model_path (str): Path of the served model; its changes invalidate the cache.
+            max_size (int): Maximum number of predictions kept in memory (and on disk).
+            ttl_seconds (float): Lifetime of a cached prediction.
+            disk_path (str): Optional SQLite file shared by several workers.
+            version_fn (callable): Returns the served model version, used instead of the
+                                   model file's mtime and size (e.g. ModelServer with a registry).
+        """
+        self.model_path = model_path
+        self._version_fn = version_fn
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = _SQLiteBackend(disk_path, max_size) if disk_path else None
+        self._model_version = self._current_model_version()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def disk_backed(self) -> bool:
+        """True when get may read the SQLite file (call it from a worker thread in async code)."""
+        return self._disk is not None
+
+    def _current_model_version(self) -> str:
+        if self._version_fn is not None:
+            return str(self._version_fn())
+        return get_model_version(self.model_path)
+
+    def _refresh_model_version(self):
+        version = self._current_model_version()
+        if version != self._model_version:
+            logging.info(f"Nouveau modèle détecté ({version}), invalidation du cache de prédictions.")
+            self._model_version = version
+            self._entries.clear()
+            self.invalidations += 1
+        return version
+
+    def get(self, features: dict, model_version: str = None):
+        """
+        Returns the cached price for these features, or None.
+        Args:
+            model_version (str): Version of the model that will answer the request (the one the
+                                 request holds a reference to); default: the current version.
+        """
+        now = time.time()
+        with self._lock:
+            current_version = self._refresh_model_version()
+            key = make_cache_key(features, current_version if model_version is None else str(model_version))
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, created = entry
+                if now - created <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        value = self._disk.get(key, now - self.ttl_seconds) if self._disk is not None else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, value, now)
+            return value
+
+    def set(self, features: dict, value: float, model_version: str = None):
+        """
+        Caches the price predicted by model_version (default: the current version). A price computed
+        by a model replaced during the prediction is not stored.
+        """
+        with self._lock:
+            current_version = self._refresh_model_version()
+            if model_version is not None and str(model_version) != current_version:
+                return
+            key = make_cache_key(features, current_version)
+            self._store(key, value, time.time())
+        if self._disk is not None:
+            self._disk.set(key, value)
+
+    def flush(self) -> int:
+        """
+        Writes the predictions buffered for the SQLite file. Returns the number written.
+        """
+        return self._disk.flush() if self._disk is not None else 0
+
+    def _store(self, key: str, value: float, created: float):
+        self._entries[key] = (value, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'model_version': self._model_version,
+                'disk_backend': self._disk.path if self._disk is not None else None,
+                'disk_pending': self._disk.pending() if self._disk is not None else 0,
+                'disk_dropped': self._disk.dropped if self._disk is not None else 0,
+            }
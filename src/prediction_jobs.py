@@ -0,0 +1,391 @@
+# src/prediction_jobs.py
+"""
+Tâches de prédiction asynchrones pour les très gros lots.
+
+Un fichier (CSV ou Parquet) est déposé sous config.JOBS_DIR/<id>/ et une ligne est ajoutée à la
+file persistante (SQLite, config.JOBS_DB_PATH). Des processus workers prennent les tâches une à une
+(réservation atomique en transaction), les scorent avec batch_scoring.score_file (lecture par
+morceaux, make_batch_prediction, point de reprise après chaque morceau) et publient leur avancement
+dans la file après chaque morceau.
+
+- Annulation : une tâche en attente est annulée immédiatement ; une tâche en cours s'arrête après
+  le morceau courant. Les fichiers d'une tâche annulée sont supprimés.
+- Reprise : chaque worker réserve ses tâches avec un jeton qui lui est propre et renouvelle un bail
+  (heartbeat) toutes les config.JOBS_HEARTBEAT_INTERVAL_SECONDS. Une tâche 'running' dont le bail a
+  expiré (arrêt de l'API, worker tué) est remise en attente puis reprend au dernier point de reprise
+  de score_file. Les PID ne servent pas à cette détection : ils sont réutilisés, en particulier
+  dans un conteneur. Un worker dont le bail a été repris par un autre s'arrête au morceau suivant.
+
+Usage : python -m src.prediction_jobs [--workers N] lance des workers hors de l'API.
+"""
+import argparse
+import contextlib
+import logging
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+from src import config
+
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+OUTPUT_FILE = 'predictions.csv'
+
+_COLUMNS = ('id', 'status', 'input_path', 'output_path', 'created', 'started', 'finished', 'rows_total',
+            'rows_done', 'rows_in_error', 'error', 'cancel_requested', 'worker_pid', 'worker_token', 'heartbeat',
+            'model_version')
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobLeaseLost(Exception):
+    """Le bail de la tâche a expiré et elle a été remise en file (ou réservée par un autre worker)."""
+
+
+def count_input_rows(input_path: str) -> int:
+    """
+    Nombre de lignes de données (métadonnées Parquet, ou lignes du CSV moins l'en-tête).
+    Sert uniquement à l'avancement : un champ CSV sur plusieurs lignes le fausse légèrement.
+    """
+    if input_path.lower().endswith(('.parquet', '.pq')):
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(input_path).metadata.num_rows
+    n_lines, last_byte = 0, b'\n'
+    with open(input_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            n_lines += block.count(b'\n')
+            last_byte = block[-1:]
+    if last_byte != b'\n':
+        n_lines += 1 # Dernière ligne sans retour à la ligne final
+    return max(n_lines - 1, 0)
+
+
+class JobStore:
+    """
+    File de tâches persistante partagée entre l'API et les workers (une connexion par appel, fermée à sa fin).
+    """
+
+    def __init__(self, path: str = config.JOBS_DB_PATH, jobs_dir: str = config.JOBS_DIR):
+        self.path = path
+        self.jobs_dir = jobs_dir
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+                         "input_path TEXT NOT NULL, output_path TEXT NOT NULL, created REAL NOT NULL, started REAL, "
+                         "finished REAL, rows_total INTEGER, rows_done INTEGER NOT NULL DEFAULT 0, "
+                         "rows_in_error INTEGER NOT NULL DEFAULT 0, error TEXT, "
+                         "cancel_requested INTEGER NOT NULL DEFAULT 0, worker_pid INTEGER, model_version TEXT, "
+                         "worker_token TEXT, heartbeat REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in (('worker_token', 'TEXT'), ('heartbeat', 'REAL')): # Files créées avant le bail
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+
+    @contextlib.contextmanager
+    def _connection(self, autocommit: bool = False):
+        """
+        Connexion fermée en sortie de bloc ; sans autocommit, le bloc est une transaction validée
+        (ou annulée en cas d'exception). autocommit : transactions explicites (BEGIN IMMEDIATE).
+        """
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None if autocommit else '')
+        try:
+            if autocommit:
+                yield conn
+            else:
+                with conn:
+                    yield conn
+        finally:
+            conn.close()
+
+    def job_dir(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, job_id)
+
+    def new_job_dir(self):
+        """
+        Identifiant et répertoire d'une nouvelle tâche, où déposer son fichier d'entrée avant submit.
+        """
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.job_dir(job_id))
+        return job_id, self.job_dir(job_id)
+
+    def submit(self, job_id: str, input_path: str) -> dict:
+        with self._connection() as conn:
+            conn.execute("INSERT INTO jobs (id, status, input_path, output_path, created) VALUES (?, 'queued', ?, ?, ?)",
+                         (job_id, input_path, os.path.join(self.job_dir(job_id), OUTPUT_FILE), time.time()))
+        logging.info(f"Tâche de prédiction {job_id} mise en file ({input_path}).")
+        return self.get(job_id)
+
+    def get(self, job_id: str):
+        with self._connection() as conn:
+            row = conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return None if row is None else dict(zip(_COLUMNS, row))
+
+    def list(self, limit: int = 100) -> list:
+        with self._connection() as conn:
+            rows = conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs ORDER BY created DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def claim_next(self, worker_token: str, worker_pid: int = None):
+        """
+        Réserve la plus ancienne tâche en attente pour le worker worker_token, ou retourne None.
+        BEGIN IMMEDIATE prend le verrou d'écriture : deux workers ne réservent jamais la même tâche.
+        """
+        with self._connection(autocommit=True) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1").fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                now = time.time()
+                conn.execute("UPDATE jobs SET status = 'running', worker_token = ?, worker_pid = ?, heartbeat = ?, "
+                             "started = COALESCE(started, ?) WHERE id = ?", (worker_token, worker_pid, now, now, row[0]))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return self.get(row[0])
+
+    def update(self, job_id: str, owner: str = None, **fields) -> bool:
+        """
+        Met à jour une tâche ; avec owner (jeton d'un worker), seulement si ce worker la détient encore.
+        Retourne False si aucune ligne n'a été modifiée.
+        """
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        query, params = f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id)
+        if owner is not None:
+            query, params = query + " AND status = 'running' AND worker_token = ?", params + (owner,)
+        with self._connection() as conn:
+            return conn.execute(query, params).rowcount > 0
+
+    def finish(self, job_id: str, status: str, error: str = None, worker_token: str = None) -> bool:
+        return self.update(job_id, worker_token, status=status, error=error, finished=time.time(),
+                           worker_pid=None, worker_token=None, heartbeat=None)
+
+    def renew_leases(self, worker_token: str):
+        """
+        Prolonge le bail des tâches détenues par ce worker.
+        """
+        with self._connection() as conn:
+            conn.execute("UPDATE jobs SET heartbeat = ? WHERE status = 'running' AND worker_token = ?",
+                         (time.time(), worker_token))
+
+    def cancel(self, job_id: str):
+        """
+        Annule une tâche en attente, ou demande l'arrêt d'une tâche en cours.
+        Retourne la tâche, ou None si elle n'existe pas.
+        """
+        with self._connection() as conn:
+            conn.execute("UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'",
+                         (time.time(), job_id))
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        return self.get(job_id)
+
+    def cancel_requested(self, job_id: str) -> bool:
+        with self._connection() as conn:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def requeue_orphans(self, lease_seconds: float = config.JOBS_LEASE_SECONDS, live_tokens=None) -> int:
+        """
+        Remet en attente les tâches 'running' dont le bail n'a pas été renouvelé depuis lease_seconds
+        (ou les annule si leur annulation avait été demandée).
+        Args:
+            live_tokens (iterable): Jetons de tous les workers vivants, quand l'appelant est le seul
+                                    consommateur de la file : les tâches détenues par un autre jeton
+                                    sont reprises sans attendre l'expiration de leur bail.
+        """
+        expired = time.time() - lease_seconds
+        live_tokens = None if live_tokens is None else set(live_tokens)
+        with self._connection(autocommit=True) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute("SELECT id, cancel_requested, worker_token, heartbeat FROM jobs "
+                                    "WHERE status = 'running'").fetchall()
+                orphans = [(job_id, bool(cancel)) for job_id, cancel, token, heartbeat in rows
+                           if heartbeat is None or heartbeat < expired
+                           or (live_tokens is not None and token not in live_tokens)]
+                for job_id, cancel in orphans:
+                    conn.execute("UPDATE jobs SET status = ?, finished = ?, worker_pid = NULL, worker_token = NULL, "
+                                 "heartbeat = NULL WHERE id = ?",
+                                 ('cancelled' if cancel else 'queued', time.time() if cancel else None, job_id))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        for job_id, cancel in orphans:
+            if cancel:
+                self.delete_files(job_id)
+            else:
+                logging.warning(f"Tâche de prédiction {job_id} interrompue : remise en file, reprise au dernier point de reprise.")
+        return len(orphans)
+
+    def delete_files(self, job_id: str):
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+
+
+def run_job(store: JobStore, job: dict, served):
+    """
+    Score une tâche réservée avec le modèle servi, en publiant l'avancement après chaque morceau.
+    Une tâche commencée par une autre version du modèle reprend depuis le début : un fichier de
+    résultats ne mélange jamais les prédictions de deux versions.
+    """
+    from src.batch_scoring import score_file
+
+    job_id, token = job['id'], job['worker_token']
+    if job['rows_total'] is None:
+        store.update(job_id, token, rows_total=count_input_rows(job['input_path']))
+    resume = job['model_version'] is None or job['model_version'] == served.version
+    if not resume:
+        logging.warning(f"Tâche de prédiction {job_id} commencée avec la version {job['model_version']}, "
+                        f"reprise depuis le début avec la version {served.version}.")
+    store.update(job_id, token, model_version=served.version,
+                 **({} if resume else {'rows_done': 0, 'rows_in_error': 0}))
+
+    def on_chunk(checkpoint):
+        if not store.update(job_id, token, rows_done=checkpoint['rows_done'],
+                            rows_in_error=checkpoint['rows_in_error'], heartbeat=time.time()):
+            raise JobLeaseLost()
+        if store.cancel_requested(job_id):
+            raise JobCancelled()
+
+    try:
+        summary = score_file(job['input_path'], job['output_path'], model=served.model,
+                             feature_engineer=served.feature_engineer, chunk_size=config.JOBS_CHUNK_SIZE,
+                             resume=resume, on_chunk=on_chunk)
+    except JobLeaseLost:
+        logging.warning(f"Bail de la tâche de prédiction {job_id} perdu : elle est reprise par un autre worker.")
+        return
+    except JobCancelled:
+        store.finish(job_id, 'cancelled', worker_token=token)
+        store.delete_files(job_id) # Entrée et prédictions partielles : seule la ligne de la file est gardée
+        logging.info(f"Tâche de prédiction {job_id} annulée.")
+        return
+    except Exception as e:
+        store.finish(job_id, 'failed', error=str(e), worker_token=token)
+        logging.error(f"Échec de la tâche de prédiction {job_id} : {e}")
+        return
+    store.update(job_id, token, rows_done=summary['rows_scored'] + summary['rows_in_error'],
+                 rows_in_error=summary['rows_in_error'])
+    if not store.finish(job_id, 'succeeded', worker_token=token):
+        logging.warning(f"Bail de la tâche de prédiction {job_id} perdu avant la fin : résultat ignoré.")
+        return
+    logging.info(f"Tâche de prédiction {job_id} terminée : {summary}")
+
+
+def worker_loop(fallback_model_path: str, db_path: str = config.JOBS_DB_PATH, jobs_dir: str = config.JOBS_DIR,
+                poll_interval: float = config.JOBS_POLL_INTERVAL_SECONDS, stop_event=None, worker_token: str = None):
+    """
+    Boucle d'un processus worker : charge la version active du registre (rechargée entre deux
+    tâches si elle change), puis traite les tâches en attente jusqu'à stop_event.
+    """
+    from src.model_registry import ModelServer
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    store = JobStore(db_path, jobs_dir)
+    server = ModelServer(fallback_model_path=fallback_model_path)
+    token = worker_token or uuid.uuid4().hex # Propre à ce processus : un PID réutilisé ne peut pas le reprendre
+    heartbeat_stop = threading.Event()
+    heartbeat = threading.Thread(target=_renew_leases, args=(store, token, heartbeat_stop),
+                                 name='job-heartbeat', daemon=True)
+    heartbeat.start()
+    while stop_event is None or not stop_event.is_set():
+        job = store.claim_next(token, os.getpid())
+        if job is None:
+            store.requeue_orphans() # Tâches d'un worker mort (bail expiré)
+            if stop_event is not None:
+                stop_event.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+            continue
+        server.refresh()
+        if server.current is None:
+            store.update(job['id'], token, status='queued', worker_pid=None, worker_token=None, heartbeat=None)
+            logging.error(f"Aucun modèle chargé ({server.last_error}) : tâche {job['id']} remise en file.")
+            time.sleep(poll_interval)
+            continue
+        run_job(store, job, server.current)
+    heartbeat_stop.set()
+
+
+def _renew_leases(store: JobStore, token: str, stop_event: threading.Event):
+    """
+    Thread du worker : renouvelle le bail de sa tâche, y compris pendant un long morceau
+    ou le chargement d'un modèle.
+    """
+    while not stop_event.wait(config.JOBS_HEARTBEAT_INTERVAL_SECONDS):
+        try:
+            store.renew_leases(token)
+        except sqlite3.Error as e:
+            logging.warning(f"Échec du renouvellement du bail des tâches : {e}")
+
+
+class JobWorkerPool:
+    """
+    Processus workers lancés avec 'spawn' (aucun état du serveur hérité), arrêtés avec stop.
+
+    exclusive=True déclare ce pool seul consommateur de la file : au démarrage, les tâches 'running'
+    qu'il n'a pas émises sont reprises immédiatement. Sinon (plusieurs processus API partagent la
+    file), seules les tâches au bail expiré le sont.
+    """
+
+    def __init__(self, n_workers: int, fallback_model_path: str, db_path: str = config.JOBS_DB_PATH,
+                 jobs_dir: str = config.JOBS_DIR, exclusive: bool = False):
+        self.n_workers = n_workers
+        self.exclusive = exclusive
+        self.fallback_model_path = fallback_model_path
+        self.db_path = db_path
+        self.jobs_dir = jobs_dir
+        self._context = multiprocessing.get_context('spawn')
+        self._stop_event = self._context.Event()
+        self._processes = []
+        self.tokens = []
+
+    def start(self):
+        self.tokens = [uuid.uuid4().hex for _ in range(self.n_workers)]
+        # Tâches en cours lors du dernier arrêt
+        JobStore(self.db_path, self.jobs_dir).requeue_orphans(live_tokens=self.tokens if self.exclusive else None)
+        for token in self.tokens:
+            process = self._context.Process(target=worker_loop, daemon=True,
+                                            args=(self.fallback_model_path, self.db_path, self.jobs_dir),
+                                            kwargs={'stop_event': self._stop_event, 'worker_token': token})
+            process.start()
+            self._processes.append(process)
+        logging.info(f"{self.n_workers} worker(s) de tâches de prédiction démarré(s).")
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Demande l'arrêt des workers ; une tâche encore en cours après timeout est interrompue
+        et reprendra depuis son point de reprise une fois son bail expiré.
+        """
+        self._stop_event.set()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self._processes = []
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lance des workers de tâches de prédiction.")
+    parser.add_argument('--workers', type=int, default=max(config.JOBS_WORKERS, 1), help="Nombre de processus workers")
+    parser.add_argument('--exclusive', action='store_true',
+                        help="Seuls workers de la file : reprend au démarrage les tâches interrompues sans attendre leur bail.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    model_path = config.LEAN_MODEL_DIR if config.USE_LEAN_MODEL else config.MODEL_SAVE_PATH
+    pool = JobWorkerPool(args.workers, model_path, exclusive=args.exclusive)
+    pool.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pool.stop()
@@ -0,0 +1,115 @@
+# src/traffic_capture.py
+"""
+Capture échantillonnée du trafic de /predict/ pour le rejouer contre une nouvelle version
+(benchmarks/replay_traffic.py).
+
+Le chemin de la requête ne fait qu'un tirage aléatoire et un ajout en mémoire : les requêtes
+capturées sont écrites par lots (une ligne JSON par requête, un seul write en mode ajout) par
+une tâche de fond de l'API. Le tampon et le fichier sont bornés : au-delà, les requêtes ne sont
+plus capturées et seulement comptées.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from src import config
+
+
+class TrafficRecorder:
+    """
+    Tampon des requêtes échantillonnées, vidé dans un fichier JSON Lines par flush.
+    """
+
+    def __init__(self, path: str = config.TRAFFIC_CAPTURE_PATH,
+                 sample_rate: float = config.TRAFFIC_CAPTURE_SAMPLE_RATE,
+                 max_buffer: int = config.TRAFFIC_CAPTURE_MAX_BUFFER,
+                 max_bytes: int = config.TRAFFIC_CAPTURE_MAX_BYTES):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_buffer = max_buffer
+        self.max_bytes = max_bytes
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._full = False # Fichier ayant atteint max_bytes
+        self.captured = 0
+        self.dropped = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def record(self, endpoint: str, payload, predicted_price=None, model_version: str = None) -> bool:
+        """
+        Captures a request with probability sample_rate. Returns True if it was kept.
+        """
+        if self.sample_rate <= 0 or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+            return False
+        entry = {'ts': time.time(), 'endpoint': endpoint, 'payload': payload,
+                 'predicted_price': predicted_price, 'model_version': model_version}
+        # Test et ajout sous le même verrou : des requêtes concurrentes ne dépassent pas max_buffer
+        with self._lock:
+            if self._full or len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                return False
+            self._buffer.append(entry)
+        return True
+
+    def flush(self) -> int:
+        """
+        Appends the buffered requests to the capture file in one write. Returns the number written.
+        """
+        with self._lock:
+            entries, self._buffer = self._buffer, []
+        if not entries:
+            return 0
+        data = ''.join(json.dumps(entry, separators=(',', ':'), default=str) + '\n' for entry in entries)
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            size = 0
+        if size + len(data) > self.max_bytes:
+            with self._lock:
+                if not self._full:
+                    logging.warning(f"Fichier de capture {self.path} plein ({size} octets) : capture du trafic suspendue.")
+                self._full = True
+                self.dropped += len(entries)
+            return 0
+        # Mode ajout (O_APPEND) : les lots de plusieurs workers uvicorn ne s'écrasent pas.
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(data)
+        self.captured += len(entries)
+        return len(entries)
+
+    def stats(self) -> dict:
+        return {'path': self.path, 'sample_rate': self.sample_rate, 'captured': self.captured,
+                'pending': len(self._buffer), 'dropped': self.dropped, 'full': self._full}
+
+
+def read_captured(path: str = config.TRAFFIC_CAPTURE_PATH, endpoint: str = None, limit: int = None) -> list:
+    """
+    Reads a capture file, skipping malformed lines (e.g. a line cut by a crash during a write).
+    Args:
+        path (str): JSON Lines file written by TrafficRecorder.
+        endpoint (str): Keep only the requests sent to this endpoint (default: all).
+        limit (int): Maximum number of requests returned.
+    Returns:
+        list: The captured entries, in capture order.
+    """
+    entries, skipped = [], 0
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if limit is not None and len(entries) >= limit:
+                break
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                skipped += 1
+                continue
+            if not isinstance(entry, dict) or 'payload' not in entry:
+                skipped += 1
+                continue
+            if endpoint is None or entry.get('endpoint') == endpoint:
+                entries.append(entry)
+    if skipped:
+        logging.warning(f"{skipped} ligne(s) illisible(s) ignorée(s) dans {path}.")
+    return entries
@@ -0,0 +1,286 @@
+# src/tuning.py
+"""
+Recherche d'hyperparamètres XGBoost par validation croisée K-fold et successive halving
+(ou Hyperband, plusieurs tournois de successive halving avec des budgets différents).
+
+- Les matrices prétraitées de chaque fold (préprocesseur ajusté sur la partie entraînement
+  du fold uniquement) sont calculées une seule fois et mises en cache sur disque ; chaque
+  essai les relit en mémoire mappée au lieu de refaire l'ingénierie et le prétraitement.
+- Chaque configuration est évaluée avec xgb.train et un arrêt précoce sur le fold de validation.
+- Les configurations d'un même tour sont évaluées en parallèle par un pool de processus.
+
+La meilleure configuration est écrite dans config.BEST_PARAMS_PATH, lue ensuite par
+build_model_pipeline (src/model.py).
+
+Usage :
+    python -m src.tuning --n-configs 27 --folds 5 --max-rounds 1000 --workers 0
+"""
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import scipy.sparse as sp
+import xgboost as xgb # type: ignore
+from sklearn.model_selection import KFold
+
+from src import config
+from src.data_preparation import load_data, load_engineered_data
+from src.dataset_cache import FAST_FEATURES_SOURCE, file_sha256
+from src.features_engineering import FeatureEngineer
+
+NEIGHBOURHOOD_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'neighbourhood.py')
+
+# Espace de recherche : (nom du paramètre XGBoost, borne basse, borne haute, échelle)
+SEARCH_SPACE = [
+    ('learning_rate', 0.01, 0.3, 'log'),
+    ('max_depth', 3, 9, 'int'),
+    ('min_child_weight', 1.0, 10.0, 'log'),
+    ('subsample', 0.6, 1.0, 'linear'),
+    ('colsample_bytree', 0.5, 1.0, 'linear'),
+    ('reg_lambda', 0.1, 10.0, 'log'),
+]
+
+
+def sample_config(rng: np.random.Generator) -> dict:
+    params = {}
+    for name, low, high, scale in SEARCH_SPACE:
+        if scale == 'int':
+            params[name] = int(rng.integers(low, high + 1))
+        elif scale == 'log':
+            params[name] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+        else:
+            params[name] = float(rng.uniform(low, high))
+    return params
+
+
+def build_fold_matrices(X_fe, y, numerical_features, categorical_features, n_splits: int = 5,
+                        seed: int = 42, cache_dir: str = None, mode: str = None) -> str:
+    """
+    Fits the preprocessor on each training fold and saves the transformed train and
+    validation matrices (log target) in cache_dir, unless they are already there.
+    Returns the directory of the fold matrices.
+    """
+    from src.model import build_model_pipeline
+
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest_path = os.path.join(cache_dir, 'folds.json')
+    if os.path.exists(manifest_path):
+        logging.info(f"Matrices des folds réutilisées depuis {cache_dir}")
+        return cache_dir
+
+    logging.info(f"Prétraitement des {n_splits} folds (mis en cache dans {cache_dir})...")
+    y_log = np.log1p(np.asarray(y, dtype=np.float64))
+    for i, (train_idx, valid_idx) in enumerate(KFold(n_splits, shuffle=True, random_state=seed).split(X_fe)):
+        pipeline = build_model_pipeline(numerical_features, categorical_features, xgb_params={}, mode=mode)
+        preprocessor = pipeline.named_steps['preprocessor']
+        for part, X_part in (('train', preprocessor.fit_transform(X_fe.iloc[train_idx])),
+                             ('valid', preprocessor.transform(X_fe.iloc[valid_idx]))):
+            # Une sortie creuse reste creuse : XGBoost y traite les zéros absents comme manquants,
+            # exactement comme lors de l'entraînement final du Pipeline.
+            if sp.issparse(X_part):
+                sp.save_npz(os.path.join(cache_dir, f"fold{i}_{part}_X.npz"), sp.csr_matrix(X_part))
+            else:
+                np.save(os.path.join(cache_dir, f"fold{i}_{part}_X.npy"), np.asarray(X_part, dtype=np.float32))
+        np.save(os.path.join(cache_dir, f"fold{i}_train_y.npy"), y_log[train_idx])
+        np.save(os.path.join(cache_dir, f"fold{i}_valid_y.npy"), y_log[valid_idx])
+
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        # Mode catégories natives : XGBoost doit savoir quelles colonnes contiennent des codes de catégories.
+        json.dump({'n_splits': n_splits, 'seed': seed, 'n_rows': len(X_fe),
+                   'feature_types': pipeline.named_steps['regressor'].get_params()['feature_types']}, f)
+    return cache_dir
+
+
+# DMatrix des folds, construites une seule fois par processus worker
+_fold_matrices = {}
+
+
+def _load_fold(fold_dir: str, i: int, part: str):
+    key = (fold_dir, i, part)
+    if key not in _fold_matrices:
+        prefix = os.path.join(fold_dir, f"fold{i}_{part}")
+        if os.path.exists(f"{prefix}_X.npz"):
+            X = sp.load_npz(f"{prefix}_X.npz")
+        else:
+            X = np.load(f"{prefix}_X.npy", mmap_mode='r')
+        with open(os.path.join(fold_dir, 'folds.json'), encoding='utf-8') as f:
+            feature_types = json.load(f)['feature_types']
+        _fold_matrices[key] = xgb.DMatrix(X, label=np.load(f"{prefix}_y.npy"), feature_types=feature_types,
+                                          enable_categorical=feature_types is not None)
+    return _fold_matrices[key]
+
+
+def evaluate_config(fold_dir: str, n_splits: int, params: dict, num_boost_round: int,
+                    early_stopping_rounds: int, nthread: int = None) -> dict:
+    """
+    K-fold CV of one configuration with early stopping on each validation fold.
+    Returns the mean validation RMSE (on the log target) and the mean best number of rounds.
+    """
+    train_params = {'objective': 'reg:squarederror', 'eval_metric': 'rmse', 'tree_method': 'hist',
+                    'seed': 42, **params}
+    if nthread:
+        train_params['nthread'] = nthread
+    scores, rounds = [], []
+    for i in range(n_splits):
+        dtrain, dvalid = _load_fold(fold_dir, i, 'train'), _load_fold(fold_dir, i, 'valid')
+        evals_result = {}
+        booster = xgb.train(train_params, dtrain, num_boost_round=num_boost_round, evals=[(dvalid, 'valid')],
+                            early_stopping_rounds=early_stopping_rounds, evals_result=evals_result,
+                            verbose_eval=False)
+        scores.append(evals_result['valid']['rmse'][booster.best_iteration])
+        rounds.append(booster.best_iteration + 1)
+    return {'params': params, 'num_boost_round': num_boost_round, 'cv_rmse': float(np.mean(scores)),
+            'cv_rmse_std': float(np.std(scores)), 'best_rounds': int(round(np.mean(rounds)))}
+
+
+def _evaluate_in_worker(args):
+    return evaluate_config(*args)
+
+
+def successive_halving(pool, fold_dir: str, n_splits: int, configs, min_rounds: int, max_rounds: int,
+                       eta: int, early_stopping_rounds: int, nthread: int):
+    """
+    Evaluates all configs with min_rounds boosting rounds, keeps the best 1/eta, multiplies
+    the budget by eta, and so on until max_rounds. Returns every trial result.
+    """
+    trials = []
+    budget = min_rounds
+    while configs:
+        budget = min(budget, max_rounds)
+        jobs = [(fold_dir, n_splits, params, budget, early_stopping_rounds, nthread) for params in configs]
+        results = list(pool.map(_evaluate_in_worker, jobs)) if pool is not None else [evaluate_config(*job) for job in jobs]
+        trials.extend(results)
+        best = min(results, key=lambda r: r['cv_rmse'])
+        logging.info(f"Tour à {budget} arbres : {len(configs)} configurations, meilleur RMSE CV (log) {best['cv_rmse']:.5f}")
+        if budget >= max_rounds or len(configs) == 1:
+            break
+        results.sort(key=lambda r: r['cv_rmse'])
+        configs = [r['params'] for r in results[:max(1, len(configs) // eta)]]
+        budget *= eta
+    return trials
+
+
+def hyperband(pool, fold_dir: str, n_splits: int, rng, max_rounds: int, eta: int, early_stopping_rounds: int,
+              nthread: int, min_rounds: int = 50):
+    """
+    Runs several successive-halving brackets, from many configs on a small budget to a few
+    configs on the full budget, to hedge against a poor choice of min_rounds.
+    """
+    s_max = max(0, int(math.log(max_rounds / min_rounds, eta)))
+    trials = []
+    for s in range(s_max, -1, -1):
+        n_configs = int(math.ceil((s_max + 1) / (s + 1) * eta ** s))
+        configs = [sample_config(rng) for _ in range(n_configs)]
+        trials.extend(successive_halving(pool, fold_dir, n_splits, configs, max(1, max_rounds // eta ** s),
+                                         max_rounds, eta, early_stopping_rounds, nthread))
+    return trials
+
+
+def tune(n_configs: int = 27, n_splits: int = 5, min_rounds: int = 50, max_rounds: int = 1000, eta: int = 3,
+         early_stopping_rounds: int = 50, workers: int = 1, strategy: str = 'halving', seed: int = 42,
+         train_path: str = config.TRAIN_DATA_PATH, output_path: str = config.BEST_PARAMS_PATH):
+    """
+    Runs the hyperparameter search and writes the best configuration to output_path.
+    Args:
+        n_configs (int): Number of random configurations of the successive-halving search.
+        n_splits (int): Number of cross-validation folds.
+        min_rounds (int): Boosting rounds given to every configuration in the first round.
+        max_rounds (int): Boosting rounds given to the finalists.
+        eta (int): Only 1/eta of the configurations survive each round.
+        early_stopping_rounds (int): Early stopping patience on the validation fold.
+        workers (int): Number of evaluation processes (0 = one per CPU core, 1 = no pool).
+        strategy (str): 'halving' or 'hyperband'.
+        seed (int): Seed of the folds and of the configuration sampling.
+        train_path (str): Training CSV.
+        output_path (str): JSON file receiving the best configuration.
+    Returns:
+        dict: The best configuration, as written to output_path.
+    """
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    nthread = max(1, (os.cpu_count() or 1) // workers)
+
+    X_train_raw, y_train, _, _ = load_data(train_path=train_path, load_test=False)
+    feature_engineer = FeatureEngineer()
+    if config.USE_DATA_CACHE:
+        X_engineered = load_engineered_data(train_path)
+        X_fe = feature_engineer.fit_transform(X_train_raw, y_train, engineered=X_engineered)
+    else:
+        X_fe = feature_engineer.fit_transform(X_train_raw, y_train)
+    y_train = y_train.loc[X_fe.index]
+
+    # Les folds dépendent des données, du code d'ingénierie et du découpage : tous entrent dans la clé du cache.
+    key = hashlib.sha256(f"{file_sha256(train_path)}|{file_sha256(FAST_FEATURES_SOURCE)}|{n_splits}|{seed}|"
+                         f"{config.MODEL_MODE}|{file_sha256(NEIGHBOURHOOD_SOURCE)}|"
+                         f"{config.USE_NEIGHBOURHOOD_FEATURES}".encode()).hexdigest()[:16]
+    fold_dir = build_fold_matrices(X_fe, y_train, feature_engineer.numerical_features_,
+                                   feature_engineer.categorical_features_, n_splits, seed,
+                                   os.path.join(config.TUNING_CACHE_DIR, key), config.MODEL_MODE)
+
+    rng = np.random.default_rng(seed)
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        if strategy == 'hyperband':
+            trials = hyperband(pool, fold_dir, n_splits, rng, max_rounds, eta, early_stopping_rounds, nthread, min_rounds)
+        else:
+            configs = [sample_config(rng) for _ in range(n_configs)]
+            trials = successive_halving(pool, fold_dir, n_splits, configs, min_rounds, max_rounds, eta,
+                                        early_stopping_rounds, nthread)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    # Seuls les essais au budget maximal sont comparables entre eux (un RMSE à 50 arbres n'est pas final).
+    finalists = [t for t in trials if t['num_boost_round'] == max_rounds] or trials
+    best = min(finalists, key=lambda t: t['cv_rmse'])
+    result = {
+        'params': {**best['params'], 'n_estimators': best['best_rounds']},
+        'cv_rmse_log': best['cv_rmse'],
+        'cv_rmse_log_std': best['cv_rmse_std'],
+        'n_splits': n_splits,
+        'strategy': strategy,
+        'n_trials': len(trials),
+        'train_data_sha256': file_sha256(train_path),
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    logging.info(f"Meilleure configuration (RMSE CV log {best['cv_rmse']:.5f}) écrite dans {output_path} : {result['params']}")
+    return result
+
+
+def load_best_params(path: str = config.BEST_PARAMS_PATH):
+    """
+    Returns the XGBRegressor parameters found by tune, or None if no search was run.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['params']
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Recherche d'hyperparamètres XGBoost (CV K-fold + successive halving).")
+    parser.add_argument('--n-configs', type=int, default=27, help="Configurations tirées au hasard (successive halving).")
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--min-rounds', type=int, default=50, help="Arbres par configuration au premier tour.")
+    parser.add_argument('--max-rounds', type=int, default=1000, help="Arbres par configuration au dernier tour.")
+    parser.add_argument('--eta', type=int, default=3, help="Facteur de réduction entre deux tours.")
+    parser.add_argument('--early-stopping-rounds', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=1, help="Processus d'évaluation (0 = un par cœur).")
+    parser.add_argument('--strategy', choices=['halving', 'hyperband'], default='halving')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=config.BEST_PARAMS_PATH)
+    args = parser.parse_args()
+
+    tune(args.n_configs, args.folds, args.min_rounds, args.max_rounds, args.eta, args.early_stopping_rounds,
+         args.workers, args.strategy, args.seed, output_path=args.output)
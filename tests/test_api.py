@@ -0,0 +1,196 @@
+import functools
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from src import config
+import api.main as main
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Ni cache, ni tâches de fond : chaque requête passe par le modèle servi.
+    monkeypatch.setattr(main, 'prediction_cache', None)
+    monkeypatch.setattr(config, 'MODEL_POLL_INTERVAL_SECONDS', 0)
+    monkeypatch.setattr(config, 'DRIFT_MONITORING_ENABLED', False)
+    monkeypatch.setattr(config, 'JOBS_WORKERS', 0)
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def houses():
+    df = pd.read_csv(config.TEST_DATA_PATH).drop(columns=[config.TARGET_COLUMN]).head(20)
+    df['grade'] = 7
+    df['lat'] = 47.6
+    df['long'] = -122.3
+    df['zipcode'] = '98101'
+    return df
+
+
+def _with_integer_values(df):
+    """Écrit 3 plutôt que 3.0 pour les champs flottants entiers, comme le font beaucoup de clients."""
+    df = df.copy()
+    for name in ('bedrooms', 'bathrooms', 'floors'):
+        df[name] = [int(v) if float(v).is_integer() else v for v in df[name]]
+    return df
+
+
+def _single_prices(client, df):
+    prices = []
+    for house in df.to_dict(orient='records'):
+        response = client.post('/predict/', json=house)
+        assert response.status_code == 200, response.text
+        prices.append(response.json()['predicted_price'])
+    return prices
+
+
+def test_batch_bodies_match_single_prediction(client, houses):
+    expected = _single_prices(client, houses)
+    int_houses = _with_integer_values(houses)
+
+    bodies = {
+        'json': dict(json=int_houses.to_dict(orient='records')),
+        'columns': dict(json={'columns': int_houses.to_dict(orient='list')}),
+        'csv': dict(content=int_houses.to_csv(index=False), headers={'content-type': 'text/csv'}),
+    }
+    for body_format, kwargs in bodies.items():
+        response = client.post('/predict/batch', **kwargs)
+        assert response.status_code == 200, response.text
+        assert response.json()['errors'] == [], body_format
+        assert response.json()['predicted_prices'] == pytest.approx(expected, rel=1e-9), body_format
+
+
+def test_columnar_batch_rejects_fractional_integer_fields(client, houses):
+    df = houses.head(3).copy()
+    df['sqft_living'] = df['sqft_living'].astype(float)
+    df.loc[1, 'sqft_living'] = 2.5
+    response = client.post('/predict/batch', content=df.to_csv(index=False), headers={'content-type': 'text/csv'})
+    assert response.status_code == 200
+    body = response.json()
+    assert [error['index'] for error in body['errors']] == [1]
+    assert 'sqft_living' in body['errors'][0]['detail']
+    assert body['predicted_prices'][1] is None
+    assert body['predicted_prices'][0] is not None and body['predicted_prices'][2] is not None
+
+
+def _arrow_body(df):
+    pa = pytest.importorskip('pyarrow')
+    sink = pa.BufferOutputStream()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def test_arrow_batch_matches_single_prediction(client, houses):
+    expected = _single_prices(client, houses)
+    df = houses.copy()
+    whole = df['floors'] % 1 == 0
+    df = df[whole].reset_index(drop=True) # Colonnes int64 : bedrooms et floors sans décimale
+    df['bedrooms'] = df['bedrooms'].astype('int64')
+    df['floors'] = df['floors'].astype('int64')
+    response = client.post('/predict/batch', content=_arrow_body(df),
+                           headers={'content-type': main.ARROW_STREAM_CONTENT_TYPE, 'accept': 'application/json'})
+    assert response.status_code == 200, response.text
+    assert response.json()['predicted_prices'] == pytest.approx(list(np.asarray(expected)[whole.to_numpy()]), rel=1e-9)
+
+
+def test_arrow_batch_schema_errors(client, houses):
+    df = houses.head(3).copy()
+    df['sqft_living'] = df['sqft_living'].astype(float)
+    df.loc[1, 'sqft_living'] = 2.5
+    response = client.post('/predict/batch', content=_arrow_body(df),
+                           headers={'content-type': main.ARROW_STREAM_CONTENT_TYPE, 'accept': 'application/json'})
+    assert response.status_code == 200, response.text
+    assert [error['index'] for error in response.json()['errors']] == [1]
+
+    df = houses.head(3).copy()
+    df['waterfront'] = df['waterfront'].astype(bool)
+    response = client.post('/predict/batch', content=_arrow_body(df),
+                           headers={'content-type': main.ARROW_STREAM_CONTENT_TYPE, 'accept': 'application/json'})
+    assert response.status_code == 422
+    assert 'waterfront' in response.json()['detail']
+
+
+def test_batch_error_positions_across_chunks(client, houses, monkeypatch):
+    # Morceaux de 3 maisons : les erreurs de l'ingénierie doivent garder leur position dans la requête.
+    monkeypatch.setattr(main, 'make_batch_prediction', functools.partial(main.make_batch_prediction, chunk_size=3))
+    records = houses.head(8).to_dict(orient='records')
+    expected = _single_prices(client, houses.head(8))
+    del records[1]['sqft_lot'] # Rejetée par la validation
+    records[4]['date'] = 'not a date' # Rejetée par l'ingénierie des caractéristiques (2e morceau)
+    records[6]['bedrooms'] = 'three' # Rejetée par la validation
+
+    response = client.post('/predict/batch', json=records)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert [error['index'] for error in body['errors']] == [1, 4, 6]
+    assert 'sqft_lot' in body['errors'][0]['detail']
+    assert 'bedrooms' in body['errors'][2]['detail']
+    for i, price in enumerate(body['predicted_prices']):
+        if i in (1, 4, 6):
+            assert price is None
+        else:
+            assert price == pytest.approx(expected[i], rel=1e-9)
+
+
+def test_msgpack_batch_matches_json(client, houses):
+    msgpack = pytest.importorskip('msgpack')
+    records = houses.to_dict(orient='records')
+    expected = client.post('/predict/batch', json=records).json()
+    response = client.post('/predict/batch', content=msgpack.packb(records),
+                           headers={'content-type': 'application/msgpack'})
+    assert response.status_code == 200
+    assert msgpack.unpackb(response.content) == expected
+
+
+def test_batch_size_limit(client, houses, monkeypatch):
+    monkeypatch.setattr(config, 'BATCH_MAX_ROWS', 5)
+    assert client.post('/predict/batch', json=houses.head(5).to_dict(orient='records')).status_code == 200
+
+    def not_validated(*args):
+        raise AssertionError("Un lot trop grand ne doit pas être validé.")
+    monkeypatch.setattr(main, '_validate_records', not_validated)
+    monkeypatch.setattr(main, '_validate_columnar', not_validated)
+    response = client.post('/predict/batch', json=houses.head(6).to_dict(orient='records'))
+    assert response.status_code == 413
+    response = client.post('/predict/batch', content=houses.to_csv(index=False), headers={'content-type': 'text/csv'})
+    assert response.status_code == 413
+
+    monkeypatch.setattr(config, 'BATCH_MAX_BYTES', 100)
+    response = client.post('/predict/batch', json=houses.head(2).to_dict(orient='records'))
+    assert response.status_code == 413
+    assert '100 octets' in response.json()['detail']
+
+
+def test_explain_internal_error_is_500(client, houses, monkeypatch):
+    import src.predict
+
+    assert client.post('/explain', json=houses.head(2).to_dict(orient='records')).status_code == 200
+
+    def broken(*args, **kwargs):
+        raise KeyError('regressor')
+    monkeypatch.setattr(src.predict, 'compute_contributions', broken)
+    response = client.post('/explain', json=houses.head(2).to_dict(orient='records'))
+    assert response.status_code == 500
+    assert 'internal error' in response.json()['detail']
+
+
+def test_metrics_headers_match_sample_names(client, houses):
+    client.post('/predict/', json=houses.iloc[0].to_dict())
+    lines = client.get('/metrics').text.splitlines()
+    declared = {line.split()[2] for line in lines if line.startswith('# TYPE')}
+    assert 'house_price_http_requests_total' in declared
+    for line in lines:
+        if line and not line.startswith('#'):
+            name = line.split('{')[0].split()[0]
+            assert any(name == family or name.startswith(f"{family}_") for family in declared), name
+            if name.endswith('_total'):
+                assert name in declared
@@ -0,0 +1,106 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+import pytest
+
+from src import config
+from src.batch_scoring import score_file
+from src.predict import load_model, load_feature_engineer
+
+CHUNK_SIZE = 50
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture(scope='module')
+def served():
+    model = load_model(config.MODEL_SAVE_PATH)
+    return model, load_feature_engineer(config.FEATURE_ENGINEER_SAVE_PATH, model=model)
+
+
+@pytest.fixture(params=['csv', 'parquet'])
+def input_path(request, tmp_path):
+    df = pd.read_csv(config.TEST_DATA_PATH).head(300)
+    df.loc[120, 'date'] = 'not a date' # Une ligne en erreur après la reprise
+    if request.param == 'csv':
+        path = tmp_path / 'houses.csv'
+        df.to_csv(path, index=False)
+    else:
+        pq = pytest.importorskip('pyarrow.parquet')
+        import pyarrow as pa
+        path = tmp_path / 'houses.parquet'
+        # Groupes de 70 lignes : la reprise après 100 lignes saute un groupe puis découpe le suivant.
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path, row_group_size=70)
+    return str(path)
+
+
+def _interrupt_after(n_chunks):
+    def on_chunk(checkpoint):
+        if checkpoint['chunks_done'] == n_chunks:
+            raise Interrupted()
+    return on_chunk
+
+
+def test_resume_after_interruption_is_byte_identical(served, input_path, tmp_path):
+    model, feature_engineer = served
+    reference_path = str(tmp_path / 'reference.csv')
+    reference = score_file(input_path, reference_path, model, feature_engineer, chunk_size=CHUNK_SIZE, resume=False)
+    assert reference['rows_in_error'] == 1
+
+    output_path = str(tmp_path / 'resumed.csv')
+    with pytest.raises(Interrupted):
+        score_file(input_path, output_path, model, feature_engineer, chunk_size=CHUNK_SIZE,
+                   on_chunk=_interrupt_after(2))
+    assert os.path.exists(f"{output_path}.checkpoint.json")
+    with open(output_path, 'ab') as f:
+        f.write(b'150,') # Morceau à moitié écrit au moment de l'interruption
+
+    chunks_seen = []
+    summary = score_file(input_path, output_path, model, feature_engineer, chunk_size=CHUNK_SIZE,
+                         on_chunk=lambda checkpoint: chunks_seen.append(checkpoint['chunks_done']))
+    assert chunks_seen == [3, 4, 5, 6] # Les deux premiers morceaux ne sont pas rescorés
+    assert summary['rows_scored'] == reference['rows_scored']
+    assert summary['rows_in_error'] == reference['rows_in_error']
+    assert not os.path.exists(f"{output_path}.checkpoint.json")
+    with open(reference_path, 'rb') as f, open(output_path, 'rb') as g:
+        assert f.read() == g.read()
+
+
+def test_parallel_scoring_keeps_input_order(served, input_path, tmp_path):
+    model, feature_engineer = served
+    sequential_path = str(tmp_path / 'sequential.csv')
+    parallel_path = str(tmp_path / 'parallel.csv')
+    score_file(input_path, sequential_path, model, feature_engineer, chunk_size=CHUNK_SIZE, resume=False)
+    score_file(input_path, parallel_path, chunk_size=CHUNK_SIZE, resume=False, workers=2, nthread=1)
+
+    with open(sequential_path, 'rb') as f, open(parallel_path, 'rb') as g:
+        assert f.read() == g.read()
+    assert pd.read_csv(parallel_path)['row'].tolist() == list(range(300))
+
+
+def test_checkpoint_of_a_changed_input_is_discarded(served, tmp_path):
+    model, feature_engineer = served
+    df = pd.read_csv(config.TEST_DATA_PATH).head(200)
+    input_path = str(tmp_path / 'houses.csv')
+    df.to_csv(input_path, index=False)
+    output_path = str(tmp_path / 'scored.csv')
+    with pytest.raises(Interrupted):
+        score_file(input_path, output_path, model, feature_engineer, chunk_size=CHUNK_SIZE,
+                   on_chunk=_interrupt_after(2))
+
+    df.iloc[::-1].to_csv(input_path, index=False) # Même taille, autre contenu
+    os.utime(input_path, ns=(0, os.stat(input_path).st_mtime_ns + 10 ** 9))
+    chunks_seen = []
+    score_file(input_path, output_path, model, feature_engineer, chunk_size=CHUNK_SIZE,
+               on_chunk=lambda checkpoint: chunks_seen.append(checkpoint['chunks_done']))
+    assert chunks_seen == [1, 2, 3, 4] # Tout est rescoré
+
+    expected_path = str(tmp_path / 'expected.csv')
+    score_file(input_path, expected_path, model, feature_engineer, chunk_size=CHUNK_SIZE, resume=False)
+    with open(expected_path, 'rb') as f, open(output_path, 'rb') as g:
+        assert f.read() == g.read()
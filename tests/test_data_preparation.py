@@ -0,0 +1,66 @@
+import functools
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import config
+from src import batch_scoring
+from src.batch_scoring import score_file
+from src.data_preparation import load_data
+from src.memory_optimization import frame_memory_mb
+from src.predict import load_feature_engineer, load_model
+
+
+@pytest.fixture(scope='module')
+def served():
+    model = load_model(config.MODEL_SAVE_PATH)
+    return model, load_feature_engineer(config.FEATURE_ENGINEER_SAVE_PATH, model=model)
+
+
+@pytest.fixture(scope='module')
+def loaded():
+    default = load_data(use_cache=False, memory_optimized=False)
+    optimized = load_data(use_cache=False, memory_optimized=True)
+    return default, optimized
+
+
+def test_memory_optimized_load_is_lossless(loaded):
+    (X_train, y_train, X_test, y_test), (X_train_opt, y_train_opt, X_test_opt, y_test_opt) = loaded
+    pd.testing.assert_series_equal(y_train_opt, y_train) # La cible n'est pas réduite
+    pd.testing.assert_series_equal(y_test_opt, y_test)
+    assert frame_memory_mb(X_train_opt) < frame_memory_mb(X_train) / 2
+    for default, optimized in ((X_train, X_train_opt), (X_test, X_test_opt)):
+        assert list(optimized.columns) == list(default.columns)
+        for col in default.columns.drop('date'):
+            np.testing.assert_array_equal(optimized[col].to_numpy(dtype=default[col].dtype), default[col].to_numpy())
+        assert (optimized['date'] == pd.to_datetime(default['date'])).all()
+
+
+def test_memory_optimized_predictions_are_identical(loaded, served, monkeypatch):
+    model, feature_engineer = served
+    (_, _, X_test, _), (_, _, X_test_opt, _) = loaded
+    expected = model.predict(feature_engineer.transform(X_test))
+    monkeypatch.setattr(config, 'MEMORY_OPTIMIZED', True) # Catégorielles en dtype `category`
+    X_fe = feature_engineer.transform(X_test_opt)
+    assert all(isinstance(X_fe[col].dtype, pd.CategoricalDtype) for col in feature_engineer.categorical_features_)
+    np.testing.assert_array_equal(model.predict(X_fe), expected)
+
+
+def test_memory_optimized_batch_scoring_is_byte_identical(served, tmp_path, monkeypatch):
+    model, feature_engineer = served
+    iter_input_chunks = batch_scoring.iter_input_chunks
+    outputs = []
+    for memory_optimized in (False, True):
+        monkeypatch.setattr(config, 'MEMORY_OPTIMIZED', memory_optimized)
+        monkeypatch.setattr(batch_scoring, 'iter_input_chunks',
+                            functools.partial(iter_input_chunks, memory_optimized=memory_optimized))
+        output_path = str(tmp_path / f'scored_{memory_optimized}.csv')
+        score_file(config.TEST_DATA_PATH, output_path, model, feature_engineer, chunk_size=200, resume=False)
+        with open(output_path, 'rb') as f:
+            outputs.append(f.read())
+    assert outputs[0] == outputs[1]
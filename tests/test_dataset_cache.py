@@ -0,0 +1,95 @@
+import os
+import shutil
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import config
+from src import dataset_cache
+from src import fast_features
+from src.dataset_cache import DatasetCache
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    df = pd.read_csv(config.TEST_DATA_PATH).head(100)
+    df.loc[[3, 7], 'city'] = np.nan # Masque des valeurs manquantes des colonnes texte
+    path = tmp_path / 'houses.csv'
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DatasetCache(str(tmp_path / 'cache'))
+
+
+@pytest.fixture
+def read_csv_calls(monkeypatch):
+    calls = []
+    read_csv = pd.read_csv
+    monkeypatch.setattr(dataset_cache.pd, 'read_csv', lambda *args, **kwargs: calls.append(args[0]) or read_csv(*args, **kwargs))
+    return calls
+
+
+def test_raw_cache_round_trip_and_hit(cache, csv_path, read_csv_calls):
+    expected = pd.read_csv(csv_path)
+    read_csv_calls.clear()
+    pd.testing.assert_frame_equal(cache.load_raw(csv_path), expected)
+    pd.testing.assert_frame_equal(cache.load_raw(csv_path), expected)
+    assert read_csv_calls == [csv_path] # Le second chargement vient du cache
+    assert cache.load_raw(csv_path)['city'].isna().sum() == 2
+
+
+def test_raw_cache_invalidated_when_csv_changes(cache, csv_path, read_csv_calls):
+    cache.load_raw(csv_path)
+    df = pd.read_csv(csv_path)
+    df.loc[0, 'price'] = 1.0
+    df.to_csv(csv_path, index=False)
+    read_csv_calls.clear()
+    assert cache.load_raw(csv_path).loc[0, 'price'] == 1.0
+    assert read_csv_calls == [csv_path]
+
+
+def test_engineered_cache_invalidated_when_fast_features_changes(cache, csv_path, tmp_path, monkeypatch):
+    source = tmp_path / 'fast_features.py'
+    shutil.copy(dataset_cache.FAST_FEATURES_SOURCE, source)
+    monkeypatch.setattr(dataset_cache, 'FAST_FEATURES_SOURCE', str(source))
+    calls = []
+    engineer = fast_features.fast_feature_engineer_data
+    monkeypatch.setattr(fast_features, 'fast_feature_engineer_data', lambda df: calls.append(len(df)) or engineer(df))
+
+    expected = engineer(pd.read_csv(csv_path).drop(columns=[config.TARGET_COLUMN]))
+    pd.testing.assert_frame_equal(cache.load_engineered(csv_path), expected)
+    cache.load_engineered(csv_path)
+    assert len(calls) == 1
+    with open(source, 'a') as f:
+        f.write('\n# Graphe modifié\n')
+    pd.testing.assert_frame_equal(cache.load_engineered(csv_path), expected)
+    assert len(calls) == 2
+
+
+def test_categorical_strings(cache, csv_path):
+    expected = pd.read_csv(csv_path)
+    df = cache.load_raw(csv_path, categorical_strings=True)
+    assert isinstance(df['city'].dtype, pd.CategoricalDtype)
+    pd.testing.assert_series_equal(df['city'].astype(object), expected['city'])
+    pd.testing.assert_series_equal(df['sqft_living'], expected['sqft_living'])
+
+
+def test_uncacheable_frame_falls_back_to_csv(cache, csv_path, monkeypatch):
+    read_csv = pd.read_csv
+
+    def mixed_types(*args, **kwargs):
+        df = read_csv(*args, **kwargs)
+        df['street'] = df['street'].astype(object)
+        df.loc[0, 'street'] = 12 # Colonne mêlant nombres et chaînes, comme un gros CSV lu par blocs
+        return df
+    monkeypatch.setattr(dataset_cache.pd, 'read_csv', mixed_types)
+    df = cache.load_raw(csv_path)
+    assert df.loc[0, 'street'] == 12 and len(df) == 100
+    assert not os.path.exists(os.path.join(cache._source_dir(csv_path), 'raw'))
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+import pytest
+
+from src import config
+from src import drift_monitoring
+from src.drift_monitoring import DriftMonitor, TrafficProfile
+
+NOW = 1_800_000_000.0
+
+
+@pytest.fixture
+def reference():
+    train = pd.read_csv(config.TRAIN_DATA_PATH).head(500)
+    return TrafficProfile.from_training_data(train, train[config.TARGET_COLUMN])
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [NOW]
+    monkeypatch.setattr(drift_monitoring.time, 'time', lambda: now[0])
+    return now
+
+
+def _house():
+    return pd.read_csv(config.TEST_DATA_PATH).iloc[0].to_dict()
+
+
+def test_reused_pid_does_not_overwrite_counts(reference, clock, tmp_path):
+    # Deux moniteurs du même processus (même hôte et même PID) : aucun n'écrase l'autre.
+    for _ in range(2):
+        monitor = DriftMonitor('v1', reference, str(tmp_path))
+        monitor.record(_house(), 300000.0)
+        monitor.flush()
+    assert monitor.report()['n_houses'] == 2
+
+
+def test_report_window_and_pruning(reference, clock, tmp_path):
+    monitor = DriftMonitor('v1', reference, str(tmp_path), window_hours=2, retention_hours=3)
+    monitor.record(_house(), 300000.0)
+    clock[0] += 3600
+    monitor.record(_house(), 300000.0)
+    monitor.record(_house(), 300000.0)
+    monitor.flush()
+    assert monitor.report()['n_houses'] == 3
+    assert monitor.report(window_hours=1)['n_houses'] == 2
+
+    clock[0] += 2 * 3600 # La première heure sort de la fenêtre, pas encore de la rétention
+    assert monitor.report()['n_houses'] == 0
+    assert len(os.listdir(tmp_path / 'v1')) == 2
+    clock[0] += 3600
+    monitor.flush()
+    hours = os.listdir(tmp_path / 'v1')
+    assert hours == [time.strftime(drift_monitoring.HOUR_FORMAT, time.gmtime(NOW + 3600))]
@@ -0,0 +1,57 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import config
+from src import memory_optimization
+from src.memory_optimization import downcast_numeric, optimize_frame
+
+
+@pytest.mark.parametrize('values, dtype', [
+    ([-128, 127], np.int8),
+    ([-129, 0], np.int16),
+    ([0, 40000], np.int32),
+    ([-2 ** 31, 2 ** 31 - 1], np.int32),
+    ([0, 2 ** 31], np.int64), # Hors de int32 : type inchangé
+])
+def test_integers_take_the_smallest_dtype_that_holds_them(values, dtype):
+    values = np.array(values, dtype=np.int64)
+    narrowed = downcast_numeric(values)
+    assert narrowed.dtype == dtype
+    np.testing.assert_array_equal(narrowed.astype(np.int64), values)
+
+
+def test_floats_become_float32_only_when_exact():
+    exact = np.array([1.5, 250000.0, np.nan, 0.25])
+    narrowed = downcast_numeric(exact)
+    assert narrowed.dtype == np.float32
+    np.testing.assert_array_equal(narrowed.astype(np.float64), exact)
+
+    inexact = np.array([1.5, 0.1]) # 0.1 n'est pas représentable exactement en float32
+    assert downcast_numeric(inexact).dtype == np.float64
+    assert downcast_numeric(exact, keep_float=True).dtype == np.float64
+
+
+def test_optimize_frame_is_lossless():
+    df = pd.read_csv(config.TRAIN_DATA_PATH).head(500)
+    optimized = optimize_frame(df.copy(), exclude=[config.TARGET_COLUMN])
+    assert optimized[config.TARGET_COLUMN].dtype == np.float64
+    assert optimized['bedrooms'].dtype == df['bedrooms'].dtype # Colonne convertie en chaîne ('3.0')
+    assert isinstance(optimized['city'].dtype, pd.CategoricalDtype)
+    for col in df.columns.drop('date'):
+        np.testing.assert_array_equal(optimized[col].to_numpy(dtype=df[col].dtype), df[col].to_numpy())
+    assert (optimized['date'] == pd.to_datetime(df['date'])).all()
+
+
+def test_peak_memory_without_resource_module(monkeypatch):
+    def no_proc(*args, **kwargs):
+        raise OSError('pas de /proc')
+    # Comme sous Windows : ni /proc ni module resource
+    monkeypatch.setattr(memory_optimization, 'open', no_proc, raising=False)
+    monkeypatch.setitem(sys.modules, 'resource', None)
+    assert np.isnan(memory_optimization.peak_memory_mb())
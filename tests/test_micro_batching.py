@@ -0,0 +1,125 @@
+import asyncio
+import os
+import sys
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from src.micro_batching import MicroBatcher
+
+
+class StubModel:
+    """Prédit le prix 'sqft_living * 10' et refuse les maisons sans superficie ; garde la taille des lots."""
+
+    def __init__(self, release=None):
+        self.batch_sizes = []
+        self.release = release
+
+    def __call__(self, input_df):
+        if self.release is not None:
+            self.release.wait(5)
+        self.batch_sizes.append(len(input_df))
+        predictions, errors = {}, {}
+        for i, sqft_living in enumerate(input_df['sqft_living']):
+            if sqft_living is None or sqft_living != sqft_living:
+                errors[i] = 'sqft_living manquant'
+            else:
+                predictions[i] = sqft_living * 10
+        return predictions, errors
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_batches_by_max_size_and_maps_results_back():
+    model = StubModel()
+
+    async def scenario():
+        batcher = MicroBatcher(model, max_batch_size=4, max_wait_ms=200)
+        await batcher.start()
+        results = await asyncio.gather(*(batcher.submit({'sqft_living': n}) for n in range(10)))
+        await batcher.stop()
+        return results
+
+    assert _run(scenario()) == [n * 10.0 for n in range(10)] # Chaque appelant reçoit sa maison
+    assert model.batch_sizes == [4, 4, 2] # Deux lots pleins sans attendre, le reste après le délai
+
+
+def test_batches_by_deadline():
+    model = StubModel()
+
+    async def scenario():
+        batcher = MicroBatcher(model, max_batch_size=64, max_wait_ms=20)
+        await batcher.start()
+        first = asyncio.ensure_future(batcher.submit({'sqft_living': 1}))
+        await asyncio.sleep(0.2) # Bien après le délai : le premier lot est parti seul
+        second = await asyncio.gather(batcher.submit({'sqft_living': 2}), batcher.submit({'sqft_living': 3}))
+        result = await first
+        await batcher.stop()
+        return result, second
+
+    assert _run(scenario()) == (10.0, [20.0, 30.0])
+    assert model.batch_sizes == [1, 2]
+
+
+def test_failing_house_is_isolated():
+    model = StubModel()
+
+    async def scenario():
+        batcher = MicroBatcher(model, max_batch_size=8, max_wait_ms=50)
+        await batcher.start()
+        results = await asyncio.gather(batcher.submit({'sqft_living': 1}), batcher.submit({'sqft_living': None}),
+                                       batcher.submit({'sqft_living': 3}), return_exceptions=True)
+        await batcher.stop()
+        return results
+
+    ok, error, other = _run(scenario())
+    assert (ok, other) == (10.0, 30.0)
+    assert isinstance(error, ValueError) and 'sqft_living' in str(error)
+    assert model.batch_sizes == [3]
+
+
+def test_failing_batch_fails_only_its_callers():
+    calls = []
+
+    def predict(input_df):
+        calls.append(len(input_df))
+        if len(calls) == 1:
+            raise RuntimeError('modèle indisponible')
+        return StubModel()(input_df)
+
+    async def scenario():
+        batcher = MicroBatcher(predict, max_batch_size=2, max_wait_ms=200)
+        await batcher.start()
+        results = await asyncio.gather(*(batcher.submit({'sqft_living': n}) for n in range(3)), return_exceptions=True)
+        await batcher.stop()
+        return results
+
+    first, second, third = _run(scenario())
+    assert isinstance(first, RuntimeError) and isinstance(second, RuntimeError)
+    assert third == 20.0
+
+
+def test_stop_drains_pending_houses():
+    release = threading.Event()
+    model = StubModel(release)
+
+    async def scenario():
+        batcher = MicroBatcher(model, max_batch_size=2, max_wait_ms=1000)
+        await batcher.start()
+        pending = [asyncio.ensure_future(batcher.submit({'sqft_living': n})) for n in range(5)]
+        await asyncio.sleep(0.05) # Premier lot en cours de prédiction, trois maisons en file
+        stopping = asyncio.ensure_future(batcher.stop())
+        await asyncio.sleep(0.05)
+        assert not stopping.done()
+        with pytest.raises(RuntimeError):
+            await batcher.submit({'sqft_living': 9}) # Plus de nouvelles maisons pendant l'arrêt
+        release.set()
+        await stopping
+        return [future.result() for future in pending]
+
+    assert _run(scenario()) == [0.0, 10.0, 20.0, 30.0, 40.0]
+    assert model.batch_sizes == [2, 2, 1]
@@ -0,0 +1,242 @@
+import json
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import config
+from src.features_engineering import feature_engineer_data
+from src.fast_features import fast_feature_engineer_data
+
+
+@pytest.fixture
+def raw_houses():
+    df = pd.read_csv(config.TEST_DATA_PATH).drop(columns=[config.TARGET_COLUMN])
+    return df.head(200).copy()
+
+
+def test_fast_feature_engineering_matches_pandas(raw_houses):
+    expected = feature_engineer_data(raw_houses)
+    pd.testing.assert_frame_equal(fast_feature_engineer_data(raw_houses), expected)
+
+
+def test_fast_feature_engineering_matches_pandas_on_edge_cases(raw_houses):
+    raw_houses.loc[3, 'date'] = 'not a date'
+    raw_houses['yr_built'] = raw_houses['yr_built'].astype(float)
+    raw_houses.loc[5, 'yr_built'] = np.nan
+    raw_houses['grade'] = 7
+    raw_houses['lat'] = 47.6
+    raw_houses['long'] = -122.3
+
+    expected = feature_engineer_data(raw_houses)
+    pd.testing.assert_frame_equal(fast_feature_engineer_data(raw_houses), expected)
+
+
+def test_fast_feature_engineering_single_house_dict(raw_houses):
+    expected = feature_engineer_data(raw_houses.head(1)).reset_index(drop=True)
+    house = raw_houses.iloc[0].to_dict()
+    pd.testing.assert_frame_equal(fast_feature_engineer_data(house), expected, check_dtype=False)
+
+
+def test_fast_feature_engineering_structured_array(raw_houses):
+    expected = feature_engineer_data(raw_houses).reset_index(drop=True)
+    records = raw_houses.to_records(index=False)
+    pd.testing.assert_frame_equal(fast_feature_engineer_data(records), expected, check_dtype=False)
+
+
+def test_rebuilt_feature_engineer_casts_integer_inputs(raw_houses):
+    from src.features_engineering import FeatureEngineer
+    from src.predict import load_model, make_batch_prediction
+
+    model = load_model(config.MODEL_SAVE_PATH)
+    feature_engineer = FeatureEngineer.from_pipeline(model)
+    houses = raw_houses[raw_houses['floors'] % 1 == 0].copy()
+    int_houses = houses.astype({'bedrooms': 'int64', 'floors': 'int64'}) # Comme un CSV qui écrit 3 au lieu de 3.0
+
+    pd.testing.assert_frame_equal(feature_engineer.transform(int_houses), feature_engineer.transform(houses))
+    expected, _ = make_batch_prediction(model, houses, feature_engineer=feature_engineer)
+    predictions, _ = make_batch_prediction(model, int_houses, feature_engineer=feature_engineer)
+    np.testing.assert_array_equal(predictions, expected)
+
+
+@pytest.mark.parametrize('mode', ['onehot', 'native_categorical'])
+def test_lean_model_matches_pipeline(mode, raw_houses, tmp_path):
+    from src.features_engineering import FeatureEngineer
+    from src.lean_model import load_lean_model
+    from src.model import build_model_pipeline, export_lean_model
+
+    train = pd.read_csv(config.TRAIN_DATA_PATH)
+    feature_engineer = FeatureEngineer()
+    X_train_fe = feature_engineer.fit_transform(train.drop(columns=[config.TARGET_COLUMN]))
+    pipeline = build_model_pipeline(feature_engineer.numerical_features_, feature_engineer.categorical_features_,
+                                    xgb_params={'n_estimators': 30}, mode=mode)
+    pipeline.fit(X_train_fe, np.log1p(train.loc[X_train_fe.index, config.TARGET_COLUMN]))
+    export_lean_model(pipeline, feature_engineer, str(tmp_path))
+    lean_model = load_lean_model(str(tmp_path))
+
+    raw_houses.loc[0, 'city'] = 'Atlantis' # Catégories jamais vues à l'entraînement
+    raw_houses.loc[1, 'statezip'] = 'WA 00000'
+    raw_houses.loc[2, 'city'] = np.nan
+    X_fe = feature_engineer.transform(raw_houses)
+    expected = pipeline.predict(X_fe)
+    np.testing.assert_array_equal(lean_model.predict(X_fe), expected)
+    np.testing.assert_array_equal(lean_model.predict_raw(raw_houses.to_dict(orient='list')), expected)
+
+
+def test_unsupported_lean_export_is_skipped(tmp_path):
+    from src.features_engineering import FeatureEngineer
+    from src.lean_model import LEAN_SPEC_FILE
+    from src.model import _export_lean_model_or_skip, build_model_pipeline, export_lean_model
+
+    train = pd.read_csv(config.TRAIN_DATA_PATH).head(500)
+    feature_engineer = FeatureEngineer()
+    X_train_fe = feature_engineer.fit_transform(train.drop(columns=[config.TARGET_COLUMN]))
+    pipeline = build_model_pipeline(feature_engineer.numerical_features_, feature_engineer.categorical_features_,
+                                    xgb_params={'n_estimators': 5}, mode='onehot')
+    pipeline.fit(X_train_fe, np.log1p(train.loc[X_train_fe.index, config.TARGET_COLUMN]))
+    assert _export_lean_model_or_skip(pipeline, feature_engineer, str(tmp_path))
+
+    pipeline.set_params(preprocessor__cat_pipeline__encoder__drop='first')
+    pipeline.fit(X_train_fe, np.log1p(train.loc[X_train_fe.index, config.TARGET_COLUMN]))
+    with pytest.raises(ValueError):
+        export_lean_model(pipeline, feature_engineer, str(tmp_path))
+    assert not _export_lean_model_or_skip(pipeline, feature_engineer, str(tmp_path))
+    assert not os.path.exists(tmp_path / LEAN_SPEC_FILE) # L'export précédent ne correspond plus au modèle
+
+
+def test_batch_prediction_fails_fast_on_schema_errors(raw_houses, monkeypatch):
+    import src.predict
+    from src.predict import load_model, load_feature_engineer, make_batch_prediction
+
+    model = load_model(config.MODEL_SAVE_PATH)
+    feature_engineer = load_feature_engineer(config.FEATURE_ENGINEER_SAVE_PATH, model=model)
+    calls = []
+    monkeypatch.setattr(src.predict, 'make_prediction',
+                        lambda *args: calls.append(args) or pytest.fail("Aucune ligne ne doit être rejouée."))
+
+    with pytest.raises(ValueError, match='sqft_living'):
+        make_batch_prediction(model, raw_houses.drop(columns=['sqft_living']), feature_engineer=feature_engineer)
+    wrong_type = raw_houses.assign(bedrooms='three')
+    with pytest.raises(ValueError, match='bedrooms'):
+        make_batch_prediction(model, wrong_type, feature_engineer=feature_engineer)
+    assert calls == []
+
+
+@pytest.fixture
+def base_model(tmp_path, monkeypatch):
+    """Petit modèle de base sauvegardé et enregistré (v0001), puis un autre modèle enregistré en v0002."""
+    import functools
+    import joblib
+    import src.model
+    from src.data_preparation import load_data
+    from src.features_engineering import FeatureEngineer
+    from src.model import build_model_pipeline
+    from src.model_registry import ModelRegistry
+
+    monkeypatch.setattr(src.model, 'load_data', functools.partial(load_data, use_cache=False))
+    train = pd.read_csv(config.TRAIN_DATA_PATH)
+    train.iloc[2000:2600].to_csv(tmp_path / 'new_sales.csv', index=False)
+    train = train.head(2000)
+    feature_engineer = FeatureEngineer()
+    X_fe = feature_engineer.fit_transform(train.drop(columns=[config.TARGET_COLUMN]))
+    paths = {'model_path': str(tmp_path / 'model.pkl'), 'feature_engineer_path': str(tmp_path / 'fe.pkl'),
+             'lean_model_dir': str(tmp_path / 'lean'), 'lineage_path': str(tmp_path / 'lineage.jsonl'),
+             'registry_dir': str(tmp_path / 'registry'), 'reference_profile_path': str(tmp_path / 'profile.json')}
+    joblib.dump(feature_engineer, paths['feature_engineer_path'])
+    registry = ModelRegistry(paths['registry_dir'])
+    for n_estimators, path in ((20, paths['model_path']), (30, str(tmp_path / 'other.pkl'))):
+        pipeline = build_model_pipeline(feature_engineer.numerical_features_, feature_engineer.categorical_features_,
+                                        xgb_params={'n_estimators': n_estimators}, mode='onehot')
+        pipeline.fit(X_fe, np.log1p(train.loc[X_fe.index, config.TARGET_COLUMN]))
+        joblib.dump(pipeline, path)
+        registry.register(path, paths['feature_engineer_path'])
+    return str(tmp_path / 'new_sales.csv'), paths
+
+
+def test_incremental_update_promoted(base_model):
+    import joblib
+    from src.model import update_model
+    from src.model_registry import ModelRegistry
+
+    new_sales, paths = base_model
+    lineage = update_model(new_sales, n_new_estimators=10, min_rmse_improvement=-1.0, **paths) # Toujours promu
+    assert lineage['promoted'] and lineage['kind'] == 'incremental'
+    assert lineage['added_trees'] == 10 and lineage['n_trees'] == 30
+    assert joblib.load(paths['model_path']).named_steps['regressor'].get_booster().num_boosted_rounds() == 30
+    registry = ModelRegistry(paths['registry_dir'])
+    manifest = registry.get_manifest(registry.latest_version())
+    assert registry.latest_version() == 'v0003'
+    assert manifest['parent_version'] == 'v0001' # Le modèle continué, pas la version active (v0002)
+    assert manifest['model_mode'] == 'onehot'
+    with open(paths['lineage_path']) as f:
+        assert [json.loads(line)['model_sha256'] for line in f] == [lineage['model_sha256']]
+
+
+def test_incremental_update_not_promoted(base_model):
+    from src.dataset_cache import file_sha256
+    from src.model import update_model
+    from src.model_registry import ModelRegistry
+
+    new_sales, paths = base_model
+    base_sha256 = file_sha256(paths['model_path'])
+    lineage = update_model(new_sales, n_new_estimators=10, min_rmse_improvement=0.99, **paths) # Jamais promu
+    assert not lineage['promoted'] and lineage['model_sha256'] is None
+    assert lineage['parent_sha256'] == base_sha256 and lineage['n_trees'] == 30
+    assert file_sha256(paths['model_path']) == base_sha256
+    assert ModelRegistry(paths['registry_dir']).latest_version() == 'v0002'
+
+
+def _failing_node(name):
+    from src.fast_features import FEATURE_GRAPH, FeatureNode
+
+    def compute(*args):
+        raise AssertionError(f"{name} ne devrait pas être calculée")
+    return FeatureNode(FEATURE_GRAPH[name].inputs, compute, FEATURE_GRAPH[name].requires)
+
+
+def test_feature_plan_prunes_the_graph(raw_houses, monkeypatch):
+    from src import fast_features
+    from src.fast_features import compute_features, feature_plan
+
+    plan = feature_plan(['house_age', 'sqft_living', 'house_age'])
+    assert plan.nodes == ('_sale_year', 'house_age')
+    assert plan.outputs == ('house_age', 'sqft_living')
+    assert plan.columns == {'date', 'yr_built', 'sqft_living'}
+
+    for name in ('days_since_ref', 'sqft_ratio_living_lot', 'sale_month'):
+        monkeypatch.setitem(fast_features.FEATURE_GRAPH, name, _failing_node(name))
+    raw_houses.loc[3, 'date'] = 'not a date'
+    columns, keep, index = compute_features(raw_houses, plan=plan)
+    expected = feature_engineer_data(raw_houses)
+    assert list(columns) == ['house_age', 'sqft_living']
+    assert not keep[3] and list(index[keep]) == list(expected.index)
+    for col in columns:
+        np.testing.assert_array_equal(columns[col], expected[col].to_numpy())
+
+
+def test_feature_engineer_only_computes_consumed_features(raw_houses, monkeypatch):
+    from src import fast_features
+    from src.features_engineering import FeatureEngineer
+    from src.predict import load_model
+
+    feature_engineer = FeatureEngineer.from_pipeline(load_model(config.MODEL_SAVE_PATH))
+    raw_houses['grade'] = 7
+    raw_houses['lat'] = 47.6
+    raw_houses['long'] = -122.3
+    expected = feature_engineer_data(raw_houses)[feature_engineer.get_feature_names_out()]
+
+    # Caractéristiques calculables mais non consommées par le modèle : jamais évaluées
+    for name in ('sqft_living_x_grade', 'lat_x_long'):
+        monkeypatch.setitem(fast_features.FEATURE_GRAPH, name, _failing_node(name))
+    pd.testing.assert_frame_equal(feature_engineer.transform(raw_houses), expected, check_dtype=False)
+    # Seules les colonnes brutes du plan sont lues
+    only_read = raw_houses[sorted(feature_engineer.feature_plan_.columns)]
+    pd.testing.assert_frame_equal(feature_engineer.transform(only_read), expected, check_dtype=False)
+
+    monkeypatch.setitem(fast_features.FEATURE_GRAPH, 'house_age', _failing_node('house_age'))
+    with pytest.raises(AssertionError, match='house_age'):
+        feature_engineer.transform(raw_houses)
@@ -0,0 +1,144 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from src import config
+from src.model_registry import MODEL_FILE, ModelRegistry, ModelServer
+from src.prediction_cache import PredictionCache
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = ModelRegistry(str(tmp_path / 'registry'))
+    registry.register(config.MODEL_SAVE_PATH, metrics={'rmse': 2.0})
+    return registry
+
+
+@pytest.fixture
+def server(registry):
+    server = ModelServer(registry, fallback_model_path=config.MODEL_SAVE_PATH)
+    server.refresh()
+    return server
+
+
+def test_register_then_refresh_swaps(registry, server):
+    assert server.version == 'v0001'
+    previous = server.current
+    assert not server.refresh() # Rien de nouveau
+
+    manifest = registry.register(config.MODEL_SAVE_PATH, metrics={'rmse': 1.0}, parent_version='v0001')
+    assert manifest['version'] == 'v0002'
+    assert server.refresh()
+    assert server.version == 'v0002'
+    assert server.current.manifest['parent_version'] == 'v0001'
+    assert previous.version == 'v0001' and previous.model is not None # Les requêtes en cours gardent l'ancien
+
+
+def test_failed_load_keeps_served_model(registry, server, tmp_path):
+    broken = tmp_path / 'broken.pkl'
+    broken.write_bytes(b'not a pickle')
+    registry.register(str(broken))
+    assert not server.refresh()
+    assert server.version == 'v0001'
+    assert server.last_error.startswith('v0002')
+
+    assert not server.refresh() # Nouvel essai au prochain cycle, même échec
+    assert server.version == 'v0001'
+    with open(os.path.join(registry.version_dir('v0002'), MODEL_FILE), 'wb') as f:
+        with open(config.MODEL_SAVE_PATH, 'rb') as model_file:
+            f.write(model_file.read()) # Version réparée : chargée au cycle suivant
+    assert server.refresh() and server.version == 'v0002' and server.last_error is None
+
+
+def test_pin_unpin_rollback(registry, server):
+    registry.register(config.MODEL_SAVE_PATH)
+    server.refresh()
+    assert server.version == 'v0002'
+
+    assert registry.rollback() == 'v0001'
+    assert server.refresh() and server.version == 'v0001'
+    with pytest.raises(ValueError):
+        registry.rollback() # Aucune version antérieure à v0001
+
+    registry.unpin()
+    assert server.refresh() and server.version == 'v0002'
+    registry.pin('v0001')
+    assert server.refresh() and server.version == 'v0001'
+    with pytest.raises(KeyError):
+        registry.pin('v0099')
+
+
+def test_shadow_version_loaded_next_to_served(registry, server):
+    registry.register(config.MODEL_SAVE_PATH)
+    registry.pin('v0001')
+    registry.set_shadow('v0002')
+    server.refresh()
+    assert server.version == 'v0001' and server.shadow.version == 'v0002'
+
+    registry.unpin() # v0002 servie : elle n'est plus évaluée en ombre
+    server.refresh()
+    assert server.version == 'v0002' and server.shadow is None
+    registry.set_shadow(None)
+    server.refresh()
+    assert server.shadow is None
+
+
+def test_prediction_cache_invalidated_on_swap(registry, server):
+    cache = PredictionCache(config.MODEL_SAVE_PATH, version_fn=lambda: server.version)
+    house = {'bedrooms': 3.0, 'city': 'Seattle'}
+    served = server.current
+    cache.set(house, 100.0, served.version)
+    assert cache.get(house, served.version) == 100.0
+
+    registry.register(config.MODEL_SAVE_PATH)
+    server.refresh()
+    assert cache.get(house, server.version) is None
+    assert cache.stats()['invalidations'] == 1
+
+    # Prix calculé par l'ancien modèle pendant l'échange : jamais mis en cache sous la nouvelle version.
+    cache.set(house, 100.0, served.version)
+    assert cache.get(house, server.version) is None
+    cache.set(house, 200.0, server.version)
+    assert cache.get(house, server.version) == 200.0
+
+
+def test_shadow_scoring_records_differences(registry, server):
+    import pandas as pd
+    import api.main as main
+    from src.metrics import SHADOW_RELATIVE_DIFF
+    from src.predict import make_batch_prediction
+
+    registry.register(config.MODEL_SAVE_PATH)
+    registry.pin('v0001')
+    registry.set_shadow('v0002')
+    server.refresh()
+    houses = pd.read_csv(config.TEST_DATA_PATH).drop(columns=[config.TARGET_COLUMN]).head(10)
+    served_predictions, _ = make_batch_prediction(server.current.model, houses,
+                                                  feature_engineer=server.current.feature_engineer)
+
+    before = SHADOW_RELATIVE_DIFF._values.get((), [None, 0.0, 0])
+    before_count, before_sum = before[2], before[1]
+    main._shadow_score(server.shadow, houses, served_predictions)
+    counts, total, count = SHADOW_RELATIVE_DIFF._values[()]
+    assert count - before_count == 10
+    assert total - before_sum == 0.0 # Même modèle en ombre : aucun écart
+
+
+def test_model_mode_comes_from_the_model(tmp_path, monkeypatch):
+    from src.lean_model import LEAN_SPEC_FILE
+    from src.model import build_model_pipeline, pipeline_mode
+
+    monkeypatch.setattr(config, 'MODEL_MODE', 'onehot')
+    native = build_model_pipeline(['sqft_living'], ['city'], xgb_params={}, mode='native_categorical')
+    assert pipeline_mode(native) == 'native_categorical'
+
+    registry = ModelRegistry(str(tmp_path / 'registry'))
+    lean_dir = tmp_path / 'lean'
+    lean_dir.mkdir()
+    (lean_dir / LEAN_SPEC_FILE).write_text('{"mode": "native_categorical"}')
+    assert registry.register(config.MODEL_SAVE_PATH, lean_model_dir=str(lean_dir))['model_mode'] == 'native_categorical'
+    assert registry.register(config.MODEL_SAVE_PATH, model_mode='native_categorical')['model_mode'] == 'native_categorical'
+    assert registry.register(config.MODEL_SAVE_PATH)['model_mode'] is None # Mode inconnu plutôt que celui de la config
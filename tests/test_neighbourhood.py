@@ -0,0 +1,77 @@
+import json
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import config
+from src.neighbourhood import NeighbourhoodIndex
+
+SMOOTHING = 20
+MIN_SALES = 5
+
+
+@pytest.fixture(scope='module')
+def sales():
+    train = pd.read_csv(config.TRAIN_DATA_PATH).head(1000)
+    keys = {level: train[level].to_numpy(dtype=object) for level in ('city', 'statezip')}
+    return keys, train[config.TARGET_COLUMN].to_numpy(dtype=np.float64), train['sqft_living'].to_numpy(dtype=np.float64)
+
+
+@pytest.fixture(scope='module')
+def index(sales):
+    return NeighbourhoodIndex.fit(*sales, SMOOTHING, MIN_SALES)
+
+
+def test_out_of_fold_features_ignore_the_sale_own_price(sales, index):
+    keys, price, sqft_living = sales
+    features = index.out_of_fold_features(keys, price, sqft_living, n_folds=5, seed=0)
+    changed_price = price.copy()
+    changed_price[0] *= 100 # Seul le prix de la vente 0 change
+    changed = index.out_of_fold_features(keys, changed_price, sqft_living, n_folds=5, seed=0)
+    for name in ('city_log_price_te', 'city_price_per_sqft', 'statezip_log_price_te', 'statezip_price_per_sqft'):
+        assert features[name][0] == changed[name][0]
+        assert not np.array_equal(features[name], index.lookup(keys)[name]) # Différent de l'index complet
+
+    # Le nombre de ventes ne dépend pas du prix : compté sur toutes les ventes, comme au service
+    np.testing.assert_array_equal(features['statezip_n_sales'], index.lookup(keys)['statezip_n_sales'])
+
+
+def test_smoothing_and_fallback_for_unseen_keys():
+    keys = {'city': np.array(['A'] * 6 + ['B'] * 2, dtype=object),
+            'statezip': np.array(['A1'] * 6 + ['B1', 'B2'], dtype=object)}
+    price = np.array([100.0, 200.0, 300.0, 400.0, 500.0, 600.0, 1000.0, 2000.0])
+    sqft_living = np.full(8, 10.0)
+    index = NeighbourhoodIndex.fit(keys, price, sqft_living, smoothing=2, min_sales=3)
+    log_price = np.log1p(price)
+    features = index.lookup({'city': np.array(['A', 'B', 'A', 'Z', None], dtype=object),
+                             'statezip': np.array(['A1', 'B1', 'Z9', 'Z9', None], dtype=object)})
+
+    # Encodage lissé vers le niveau supérieur : (somme + m * a priori) / (n + m)
+    city_a = (log_price[:6].sum() + 2 * log_price.mean()) / (6 + 2)
+    assert features['city_log_price_te'][0] == pytest.approx(city_a)
+    assert features['statezip_log_price_te'][0] == pytest.approx((log_price[:6].sum() + 2 * city_a) / (6 + 2))
+    # Ville B sous min_sales : médiane globale du prix au pied carré
+    assert features['city_price_per_sqft'][1] == index.global_price_per_sqft
+    # Code postal inconnu d'une ville connue : valeurs de la ville
+    assert features['statezip_log_price_te'][2] == features['city_log_price_te'][2]
+    assert features['statezip_price_per_sqft'][2] == features['city_price_per_sqft'][2] == 35.0
+    assert features['statezip_n_sales'][2] == 0
+    # Ville et code postal inconnus (ou manquants) : a priori global
+    for row in (3, 4):
+        assert features['statezip_log_price_te'][row] == pytest.approx(log_price.mean())
+        assert features['statezip_price_per_sqft'][row] == index.global_price_per_sqft
+
+
+def test_to_dict_from_dict_round_trip(sales, index):
+    keys = sales[0]
+    restored = NeighbourhoodIndex.from_dict(json.loads(json.dumps(index.to_dict())))
+    expected = index.lookup(keys)
+    for name, values in restored.lookup(keys).items():
+        np.testing.assert_array_equal(values, expected[name])
+    unseen = {'city': np.array(['Atlantis'], dtype=object), 'statezip': np.array(['WA 00000'], dtype=object)}
+    assert restored.lookup(unseen) == pytest.approx(index.lookup(unseen))
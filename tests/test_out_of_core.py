@@ -0,0 +1,68 @@
+import functools
+import json
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import config
+from src import out_of_core
+from src.features_engineering import FeatureEngineer
+from src.model import build_model_pipeline
+from src.model_registry import ModelRegistry
+
+
+@pytest.fixture
+def train_csv(tmp_path, monkeypatch):
+    monkeypatch.setattr(out_of_core, 'build_model_pipeline',
+                        functools.partial(build_model_pipeline, xgb_params={'n_estimators': 30}, mode='onehot'))
+    train = pd.read_csv(config.TRAIN_DATA_PATH).head(1500)
+    path = tmp_path / 'train.csv'
+    train.to_csv(path, index=False)
+    return str(path), train
+
+
+def _train(train_path, directory, chunk_size):
+    paths = {'model_path': str(directory / 'model.pkl'), 'feature_engineer_path': str(directory / 'fe.pkl'),
+             'lean_model_dir': str(directory / 'lean'), 'lineage_path': str(directory / 'lineage.jsonl'),
+             'registry_dir': str(directory / 'registry'), 'reference_profile_path': str(directory / 'profile.json')}
+    metrics = out_of_core.train_out_of_core(train_path, config.TEST_DATA_PATH, chunk_size=chunk_size,
+                                            sample_rows=5000, **paths)
+    return metrics, paths
+
+
+def test_chunked_training_matches_a_single_chunk(train_csv, tmp_path):
+    train_path, train = train_csv
+    houses = pd.read_csv(config.TEST_DATA_PATH).drop(columns=[config.TARGET_COLUMN])
+    predictions = []
+    for chunk_size in (400, 5000): # Quatre morceaux, puis le fichier entier en un seul
+        directory = tmp_path / str(chunk_size)
+        metrics, paths = _train(train_path, directory, chunk_size)
+        assert metrics is not None and np.isfinite(metrics['rmse'])
+        feature_engineer = joblib.load(paths['feature_engineer_path'])
+        predictions.append(joblib.load(paths['model_path']).predict(feature_engineer.transform(houses)))
+    np.testing.assert_array_equal(predictions[0], predictions[1])
+
+    # Le résumé de la première passe donne le même index de voisinage que l'ajustement en mémoire
+    reference = FeatureEngineer()
+    reference.fit(train.drop(columns=[config.TARGET_COLUMN]), train[config.TARGET_COLUMN])
+    assert feature_engineer.neighbourhood_index_.to_dict() == reference.neighbourhood_index_.to_dict()
+    assert feature_engineer.get_feature_names_out() == reference.get_feature_names_out()
+
+
+def test_out_of_core_model_is_saved_like_a_full_training(train_csv, tmp_path):
+    train_path, train = train_csv
+    metrics, paths = _train(train_path, tmp_path, chunk_size=400)
+    with open(paths['lineage_path']) as f:
+        lineage = json.loads(f.readline())
+    assert lineage['kind'] == 'out_of_core' and lineage['n_trees'] == 30
+    assert lineage['training_data'][0]['n_rows'] == len(train)
+    manifest = ModelRegistry(paths['registry_dir']).get_manifest('v0001')
+    assert manifest['metrics'] == metrics and manifest['model_mode'] == 'onehot'
+    assert os.path.exists(paths['reference_profile_path'])
+    assert os.listdir(paths['lean_model_dir'])
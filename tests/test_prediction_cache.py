@@ -0,0 +1,22 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.prediction_cache import PredictionCache
+
+
+def test_disk_writes_are_buffered_until_flush(tmp_path):
+    disk_path = str(tmp_path / 'cache.sqlite')
+    writer = PredictionCache('model', disk_path=disk_path, version_fn=lambda: 'v1')
+    reader = PredictionCache('model', disk_path=disk_path, version_fn=lambda: 'v1') # Un autre worker
+    house = {'sqft_living': 1340, 'city': 'Shoreline'}
+
+    writer.set(house, 313000.0)
+    assert writer.get(house) == 313000.0 # Servi par la mémoire
+    assert reader.get(house) is None
+    assert writer.stats()['disk_pending'] == 1
+
+    assert writer.flush() == 1
+    assert reader.get(house) == 313000.0
+    assert writer.stats()['disk_pending'] == 0
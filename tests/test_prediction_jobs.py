@@ -0,0 +1,226 @@
+import io
+import os
+import shutil
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+import pytest
+
+from src import config
+from src.prediction_jobs import JobStore, run_job
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / 'jobs.sqlite'), str(tmp_path))
+
+
+def _submit(store, content='a\n1\n'):
+    job_id, job_dir = store.new_job_dir()
+    input_path = os.path.join(job_dir, 'input.csv')
+    with open(input_path, 'w') as f:
+        f.write(content)
+    return store.submit(job_id, input_path)
+
+
+def test_requeue_uses_lease_not_pid(store):
+    job = _submit(store)
+    # PID réutilisé : celui du processus courant, bien vivant, mais bail expiré
+    claimed = store.claim_next('dead-worker', os.getpid())
+    assert claimed['id'] == job['id'] and claimed['status'] == 'running'
+    assert store.requeue_orphans() == 0 # Bail encore valide
+    store.update(job['id'], heartbeat=time.time() - 3600)
+    assert store.requeue_orphans(lease_seconds=30) == 1
+    assert store.get(job['id'])['status'] == 'queued'
+    assert store.get(job['id'])['worker_token'] is None
+
+    # L'ancien worker a perdu son bail : ses mises à jour sont ignorées.
+    assert store.claim_next('new-worker')['id'] == job['id']
+    assert not store.update(job['id'], 'dead-worker', rows_done=10)
+    assert not store.finish(job['id'], 'succeeded', worker_token='dead-worker')
+    assert store.get(job['id'])['status'] == 'running'
+    assert store.finish(job['id'], 'succeeded', worker_token='new-worker')
+
+
+def test_exclusive_requeue_of_tokens_not_issued(store):
+    job = _submit(store)
+    store.claim_next('previous-pool-worker')
+    assert store.requeue_orphans(live_tokens=['worker-a', 'worker-b']) == 1
+    assert store.get(job['id'])['status'] == 'queued'
+
+
+@pytest.fixture(scope='module')
+def served():
+    from src.model_registry import ServedModel
+    from src.predict import load_feature_engineer, load_model
+
+    model = load_model(config.MODEL_SAVE_PATH)
+    return ServedModel('test', model, load_feature_engineer(model=model))
+
+
+@pytest.fixture
+def houses_csv(tmp_path):
+    path = tmp_path / 'houses.csv'
+    df = pd.read_csv(config.TEST_DATA_PATH).head(250)
+    df['grade'] = 7 # Champs de HouseFeatures absents du jeu de test
+    df['lat'] = 47.6
+    df['long'] = -122.3
+    df['zipcode'] = '98101'
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def _submit_file(store, source_path):
+    job_id, job_dir = store.new_job_dir()
+    input_path = os.path.join(job_dir, 'input.csv')
+    shutil.copy(source_path, input_path)
+    return store.submit(job_id, input_path)
+
+
+def test_claim_next_is_exclusive(store):
+    job_ids = {_submit(store)['id'] for _ in range(30)}
+    claimed = []
+
+    def claim(token):
+        while (job := store.claim_next(token)) is not None:
+            claimed.append(job['id'])
+
+    threads = [threading.Thread(target=claim, args=(f"worker-{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == sorted(job_ids) # Chaque tâche réservée une seule fois
+    assert store.claim_next('late-worker') is None
+
+
+def test_cancel_queued_and_running_jobs(store, served, houses_csv, monkeypatch):
+    monkeypatch.setattr(config, 'JOBS_CHUNK_SIZE', 50)
+    queued = _submit_file(store, houses_csv)
+    running = _submit_file(store, houses_csv)
+    assert store.claim_next('worker')['id'] == queued['id']
+    store.update(queued['id'], status='queued', worker_token=None) # Replacée en tête de file
+    assert store.cancel(queued['id'])['status'] == 'cancelled'
+
+    job = store.claim_next('worker')
+    assert job['id'] == running['id']
+    assert store.cancel(running['id'])['cancel_requested'] == 1 # Arrêt au prochain morceau
+    run_job(store, job, served)
+    job = store.get(running['id'])
+    assert job['status'] == 'cancelled' and job['rows_done'] == 50
+    assert not os.path.exists(store.job_dir(running['id']))
+
+
+def test_orphaned_job_resumes_from_checkpoint(store, served, houses_csv, monkeypatch):
+    from src import batch_scoring
+
+    monkeypatch.setattr(config, 'JOBS_CHUNK_SIZE', 50)
+    expected_path = os.path.join(os.path.dirname(houses_csv), 'expected.csv')
+    batch_scoring.score_file(houses_csv, expected_path, model=served.model, feature_engineer=served.feature_engineer,
+                             chunk_size=50, resume=False)
+
+    job = _submit_file(store, houses_csv)
+    score_chunk = batch_scoring.score_chunk
+    calls = []
+    crash_at = [100] # Troisième morceau : lignes 100 à 149
+
+    def crash_on_third_chunk(*args):
+        calls.append(args[-1])
+        if args[-1] in crash_at:
+            raise SystemExit("worker tué") # Non interceptée par run_job, comme un arrêt brutal
+        return score_chunk(*args)
+
+    monkeypatch.setattr(batch_scoring, 'score_chunk', crash_on_third_chunk)
+    with pytest.raises(SystemExit):
+        run_job(store, store.claim_next('dead-worker'), served)
+    assert store.get(job['id'])['status'] == 'running' and store.get(job['id'])['rows_done'] == 100
+
+    store.update(job['id'], heartbeat=time.time() - 3600)
+    assert store.requeue_orphans() == 1
+    calls.clear()
+    crash_at.clear()
+    run_job(store, store.claim_next('new-worker'), served)
+    job = store.get(job['id'])
+    assert job['status'] == 'succeeded' and job['rows_done'] == 250
+    assert calls == [100, 150, 200] # Reprise au morceau suivant le dernier point de reprise
+    with open(job['output_path'], 'rb') as result, open(expected_path, 'rb') as expected:
+        assert result.read() == expected.read()
+
+
+def test_job_resumed_by_another_model_version_restarts(store, served, houses_csv, monkeypatch):
+    from src import batch_scoring
+    from src.model_registry import ServedModel
+
+    monkeypatch.setattr(config, 'JOBS_CHUNK_SIZE', 50)
+    job = _submit_file(store, houses_csv)
+    previous = ServedModel('previous', served.model, served.feature_engineer)
+
+    def stop_after_two_chunks(checkpoint):
+        if checkpoint['chunks_done'] == 2:
+            raise SystemExit("worker tué")
+    score_file = batch_scoring.score_file
+    monkeypatch.setattr(batch_scoring, 'score_file',
+                        lambda *args, **kwargs: score_file(*args, **{**kwargs, 'on_chunk': stop_after_two_chunks}))
+    with pytest.raises(SystemExit):
+        run_job(store, store.claim_next('dead-worker'), previous)
+    monkeypatch.setattr(batch_scoring, 'score_file', score_file)
+    assert store.get(job['id'])['model_version'] == 'previous'
+
+    store.update(job['id'], heartbeat=time.time() - 3600)
+    store.requeue_orphans()
+    calls = []
+    score_chunk = batch_scoring.score_chunk
+    monkeypatch.setattr(batch_scoring, 'score_chunk', lambda *args: calls.append(args[-1]) or score_chunk(*args))
+    run_job(store, store.claim_next('new-worker'), served)
+    job = store.get(job['id'])
+    assert job['status'] == 'succeeded' and job['model_version'] == 'test'
+    assert calls == [0, 50, 100, 150, 200] # Aucune prédiction de l'ancienne version n'est gardée
+
+
+def test_jobs_endpoints(store, served, houses_csv, monkeypatch):
+    from fastapi.testclient import TestClient
+    import api.main as main
+
+    monkeypatch.setattr(main, 'job_store', store)
+    monkeypatch.setattr(config, 'JOBS_WORKERS', 0)
+    monkeypatch.setattr(config, 'MODEL_POLL_INTERVAL_SECONDS', 0)
+    with TestClient(main.app) as client:
+        with open(houses_csv, 'rb') as f:
+            response = client.post('/jobs', content=f.read(), headers={'content-type': 'text/csv'})
+        assert response.status_code == 202
+        job_id = response.json()['id']
+        assert response.json()['status'] == 'queued'
+        assert client.get(f'/jobs/{job_id}/result').status_code == 409
+        assert client.get('/jobs/unknown').status_code == 404
+
+        run_job(store, store.claim_next('worker'), served) # Le worker, ici dans le processus du test
+        status = client.get(f'/jobs/{job_id}').json()
+        assert status['status'] == 'succeeded' and status['progress'] == 1.0 and status['rows_total'] == 250
+        assert 'input_path' not in status and 'worker_token' not in status
+        result = pd.read_csv(io.BytesIO(client.get(status['result_url']).content))
+        assert len(result) == 250 and result['predicted_price'].notna().all()
+        assert client.delete(f'/jobs/{job_id}').status_code == 409
+        assert [job['id'] for job in client.get('/jobs').json()['jobs']] == [job_id]
+
+        response = client.post('/jobs', json={'not': 'a batch'})
+        assert response.status_code == 422
+
+        # Colonne mal orthographiée ou de mauvais type : refusée à la soumission, pas en échec ligne par ligne
+        df = pd.read_csv(houses_csv)
+        response = client.post('/jobs', content=df.rename(columns={'sqft_living': 'sqft_livng'}).to_csv(index=False),
+                               headers={'content-type': 'text/csv'})
+        assert response.status_code == 422 and 'sqft_living' in response.json()['detail']
+        response = client.post('/jobs', json=df.assign(bedrooms='three').to_dict(orient='records'))
+        assert response.status_code == 422 and 'bedrooms' in response.json()['detail']
+        pa = pytest.importorskip('pyarrow')
+        import pyarrow.parquet as pq
+        sink = pa.BufferOutputStream()
+        pq.write_table(pa.Table.from_pandas(df.drop(columns=['yr_built']), preserve_index=False), sink)
+        response = client.post('/jobs', content=sink.getvalue().to_pybytes(),
+                               headers={'content-type': 'application/vnd.apache.parquet'})
+        assert response.status_code == 422 and 'yr_built' in response.json()['detail']
+        assert [job['id'] for job in client.get('/jobs').json()['jobs']] == [job_id]
@@ -0,0 +1,112 @@
+import json
+import os
+import sys
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from src import config
+from src import traffic_capture
+from src.traffic_capture import TrafficRecorder, read_captured
+import api.main as main
+
+
+@pytest.fixture
+def capture_path(tmp_path):
+    return str(tmp_path / 'captured_requests.jsonl')
+
+
+def _house(i):
+    return {'sqft_living': 1000 + i, 'city': 'Seattle'}
+
+
+def test_sampling(capture_path, monkeypatch):
+    assert not any(TrafficRecorder(capture_path, sample_rate=0).record('/predict/', _house(i)) for i in range(10))
+    assert all(TrafficRecorder(capture_path, sample_rate=1).record('/predict/', _house(i)) for i in range(10))
+
+    draws = iter([0.05, 0.5, 0.09, 0.1, 0.99])
+    monkeypatch.setattr(traffic_capture.random, 'random', lambda: next(draws))
+    recorder = TrafficRecorder(capture_path, sample_rate=0.1)
+    assert [recorder.record('/predict/', _house(i)) for i in range(5)] == [True, False, True, False, False]
+    assert recorder.stats()['pending'] == 2 and recorder.stats()['dropped'] == 0 # Non tirées : ni gardées ni comptées
+
+
+def test_buffer_is_bounded_under_concurrency(capture_path):
+    recorder = TrafficRecorder(capture_path, sample_rate=1, max_buffer=100)
+    start = threading.Barrier(8)
+
+    def record_many():
+        start.wait()
+        for i in range(50):
+            recorder.record('/predict/', _house(i))
+
+    threads = [threading.Thread(target=record_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert recorder.stats()['pending'] == 100
+    assert recorder.stats()['dropped'] == 8 * 50 - 100
+
+
+def test_capture_file_is_bounded(capture_path):
+    recorder = TrafficRecorder(capture_path, sample_rate=1, max_bytes=1000)
+    for i in range(5):
+        recorder.record('/predict/', _house(i), 300000.0 + i, 'v0001')
+    assert recorder.flush() == 5
+    size = os.path.getsize(capture_path)
+    assert size < 1000
+
+    for i in range(20): # Lot qui ferait dépasser max_bytes : ignoré en entier
+        recorder.record('/predict/', _house(i))
+    assert recorder.flush() == 0
+    assert os.path.getsize(capture_path) == size
+    assert not recorder.record('/predict/', _house(0)) # Capture suspendue
+    assert recorder.stats() == {'path': capture_path, 'sample_rate': 1, 'captured': 5, 'pending': 0,
+                                'dropped': 21, 'full': True}
+
+
+def test_read_captured(capture_path):
+    recorder = TrafficRecorder(capture_path, sample_rate=1)
+    for i in range(3):
+        recorder.record('/predict/', _house(i), 300000.0 + i, 'v0001')
+    recorder.record('/predict/batch/', _house(9))
+    recorder.flush()
+    with open(capture_path, 'a', encoding='utf-8') as f:
+        f.write('{"endpoint": "/predict/"}\n') # Ligne sans payload
+        f.write('{"ts": 1, "endpoint": "/predict/", "pay') # Ligne coupée par un arrêt brutal
+
+    entries = read_captured(capture_path, endpoint='/predict/')
+    assert [entry['payload'] for entry in entries] == [_house(i) for i in range(3)]
+    assert [entry['predicted_price'] for entry in entries] == [300000.0, 300001.0, 300002.0]
+    assert len(read_captured(capture_path)) == 4
+    assert len(read_captured(capture_path, endpoint='/predict/', limit=2)) == 2
+
+
+def test_captured_traffic_replays_through_the_api(capture_path, monkeypatch):
+    from benchmarks import replay_traffic
+
+    monkeypatch.setattr(main, 'prediction_cache', None)
+    monkeypatch.setattr(main, 'traffic_recorder', TrafficRecorder(capture_path, sample_rate=1))
+    monkeypatch.setattr(config, 'MODEL_POLL_INTERVAL_SECONDS', 0)
+    monkeypatch.setattr(config, 'DRIFT_MONITORING_ENABLED', False)
+    monkeypatch.setattr(config, 'JOBS_WORKERS', 0)
+    houses = pd.read_csv(config.TEST_DATA_PATH).drop(columns=[config.TARGET_COLUMN]).head(10)
+    houses = houses.assign(grade=7, lat=47.6, long=-122.3, zipcode='98101')
+    payloads = json.loads(houses.to_json(orient='records'))
+    with TestClient(main.app) as client: # Le tampon est vidé à l'arrêt de l'application
+        prices = [client.post('/predict/', json=house).json()['predicted_price'] for house in payloads]
+
+    entries = read_captured(capture_path)
+    assert [entry['payload'] for entry in entries] == [{**house, 'country': None} for house in payloads] # Maisons validées
+    assert [entry['predicted_price'] for entry in entries] == prices
+
+    monkeypatch.setattr(main, 'traffic_recorder', None)
+    results = replay_traffic.run(capture_path, concurrency=4)
+    assert results['replay']['error_rate'] == 0.0
+    assert results['diff_vs_capture']['n_compared'] == 10
+    assert results['diff_vs_capture']['n_different'] == 0